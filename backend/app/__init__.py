@@ -21,7 +21,11 @@ def create_app() -> Flask:
     # SPA client-side routes (for example, refreshing "/online").
     app = Flask(__name__, static_folder=None)
 
-    CORS(app, resources={r"/*": {"origins": settings.cors_allowed_origins}})
+    CORS(
+        app,
+        resources={r"/*": {"origins": settings.cors_allowed_origins}},
+        expose_headers=["X-State-Version", "Idempotent-Replayed"],
+    )
 
     @app.before_request
     def _track_request_start() -> None:
@@ -58,7 +62,16 @@ def create_app() -> Flask:
 
     register_blueprints(app)
     app.register_blueprint(auth_bp)
-    socketio.init_app(app, async_mode="eventlet")
+    socketio_options = {}
+    if settings.socketio_message_queue == "postgres":
+        from app.socketio_postgres import PostgresManager
+
+        socketio_options["client_manager"] = PostgresManager(
+            settings.database_url,
+            channel=settings.socketio_channel,
+            batch_window_seconds=settings.socketio_notify_batch_ms / 1000,
+        )
+    socketio.init_app(app, async_mode="eventlet", **socketio_options)
 
     def _is_api_request(path: str) -> bool:
         return path.startswith(
@@ -123,7 +136,25 @@ def create_app() -> Flask:
 
         return send_from_directory(frontend_dist_dir, "index.html")
 
+    from app.availability import availability_ledger
+    from app.expiration_schedule import expiration_schedule
+    from app.idempotency import idempotency_cache
+    from app.invalidation_bus import reset_invalidation_state, start_invalidation_bus
+    from app.metrics import reset_counters
+    from app.recipe_matrix import recipe_matrix_cache
     from app.reservation_expiration import start_reservation_expiration_job
-
+    from app.snapshot_cache import snapshot_cache
+    from app.state_changes import reset_state_changes
+
+    # Reloaded from the database on first read against this app's schema.
+    availability_ledger.reset()
+    reset_state_changes()
+    snapshot_cache.clear()
+    recipe_matrix_cache.clear()
+    idempotency_cache.clear()
+    expiration_schedule.clear()
+    reset_counters()
+    reset_invalidation_state()
     start_reservation_expiration_job()
+    start_invalidation_bus()
     return app
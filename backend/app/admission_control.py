@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from collections import deque
+import logging
+import math
+from threading import Lock
+from time import monotonic
+from typing import Any
+
+from flask import Response, g
+
+from app import socketio
+from app.error_responses import error_response
+from app.metrics import increment_counter
+from config import settings
+
+logger = logging.getLogger("kitchensync.admission_control")
+
+
+class AdmissionLimiter:
+    """Caps concurrent requests, queueing a bounded number in FIFO order.
+
+    Each queued request waits on its own event from the Socket.IO async
+    driver, so eventlet greenlets park on the hub instead of polling it.
+    ``release`` hands its slot straight to the oldest waiter.
+    """
+
+    def __init__(self, max_in_flight: int, max_queued: int, queue_timeout_seconds: float) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._lock = Lock()
+        self._in_flight = 0
+        self._queue: deque[Any] = deque()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    def acquire(self) -> float | None:
+        """Wait for a slot; return seconds spent queued, or ``None`` if rejected."""
+        started = monotonic()
+        with self._lock:
+            # Waiters are served first, in FIFO order.
+            if self._in_flight < self.max_in_flight and not self._queue:
+                self._in_flight += 1
+                return 0.0
+            if len(self._queue) >= self.max_queued:
+                return None
+            ticket = socketio.server.eio.create_event()
+            self._queue.append(ticket)
+
+        if not ticket.wait(self.queue_timeout_seconds):
+            with self._lock:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    return None
+            # Handed a slot between the timeout and taking the lock.
+        return monotonic() - started
+
+    def release(self) -> None:
+        with self._lock:
+            if self._queue:
+                # The slot passes to the oldest waiter; in-flight count is unchanged.
+                self._queue.popleft().set()
+            else:
+                self._in_flight -= 1
+
+
+reservation_limiter = AdmissionLimiter(
+    max_in_flight=settings.reservation_max_in_flight,
+    max_queued=settings.reservation_max_queued,
+    queue_timeout_seconds=settings.reservation_queue_timeout_ms / 1000,
+)
+
+
+def _retry_after_seconds(limiter: AdmissionLimiter) -> int:
+    return max(1, math.ceil(limiter.queue_timeout_seconds))
+
+
+def admit_reservation_request() -> tuple[Response, int] | None:
+    """``before_request`` hook: hold a slot or answer 429 with ``Retry-After``."""
+    limiter = reservation_limiter
+    if not limiter.enabled:
+        return None
+
+    waited_seconds = limiter.acquire()
+    if waited_seconds is None:
+        increment_counter("reservation_admission_control.rejected")
+        logger.warning("reservation request rejected max_in_flight=%s", limiter.max_in_flight)
+        response, status_code = error_response(
+            "Too many reservation requests in flight; retry shortly",
+            429,
+            code="RESERVATION_BUSY",
+        )
+        response.headers["Retry-After"] = str(_retry_after_seconds(limiter))
+        return response, status_code
+
+    g.reservation_limiter = limiter
+    increment_counter("reservation_admission_control.admitted")
+    if waited_seconds > 0:
+        increment_counter("reservation_admission_control.queued")
+        increment_counter("reservation_admission_control.queue_wait_ms", round(waited_seconds * 1000))
+    return None
+
+
+def release_reservation_request(_exc: BaseException | None) -> None:
+    """``teardown_request`` hook: free the slot taken by ``admit_reservation_request``."""
+    limiter = g.pop("reservation_limiter", None)
+    if limiter is not None:
+        limiter.release()
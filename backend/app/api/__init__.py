@@ -4,6 +4,7 @@ from app.api.admin import admin_bp
 from app.api.internal import internal_bp
 from app.api.ingredients import ingredients_bp
 from app.api.menu import menu_bp
+from app.api.reservation_history import reservation_history_bp
 from app.api.reservations import reservations_bp
 
 
@@ -12,4 +13,5 @@ def register_blueprints(app: Flask) -> None:
     app.register_blueprint(internal_bp)
     app.register_blueprint(ingredients_bp)
     app.register_blueprint(menu_bp)
+    app.register_blueprint(reservation_history_bp)
     app.register_blueprint(reservations_bp)
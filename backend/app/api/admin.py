@@ -5,9 +5,9 @@ from typing import Any
 
 from flask import Blueprint, g, jsonify, request
 
-from app import socketio
 from app.auth import require_any_role, require_role
 from app.error_responses import error_response
+from app.invalidation_bus import TOPIC_RUNTIME_SETTINGS, publish_invalidation_async
 from app.runtime_reservation_ttl import (
     MAX_TTL_SECONDS,
     MIN_TTL_SECONDS,
@@ -20,6 +20,8 @@ from app.runtime_reservation_warning import (
     get_runtime_warning_info,
     set_runtime_warning_threshold_seconds,
 )
+from app.socket_rooms import RESERVATION_SETTINGS_ROOMS
+from app.state_changes import notify_state_changed
 
 admin_bp = Blueprint("admin", __name__)
 logger = logging.getLogger("kitchensync.api.admin")
@@ -125,7 +127,16 @@ def update_reservation_ttl() -> tuple[dict[str, Any], int]:
         updated_warning_seconds,
     )
     if old_ttl != updated_ttl_seconds or old_warning != updated_warning_seconds:
-        socketio.emit("stateChanged")
+        # Runtime reservation settings do not move ingredient availability and
+        # only matter to roles that place orders.
+        notify_state_changed([], rooms=RESERVATION_SETTINGS_ROOMS)
+        publish_invalidation_async(
+            TOPIC_RUNTIME_SETTINGS,
+            payload={
+                "ttl_seconds": updated_ttl_seconds,
+                "warning_threshold_seconds": updated_warning_seconds,
+            },
+        )
     return jsonify(
         _serialize_ttl_payload(updated_ttl_seconds, updated_warning_seconds)
     ), 200
@@ -1,28 +1,42 @@
 import logging
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 from sqlalchemy import select
 
-from app import socketio
 from app.auth import require_role
-from app.availability import get_active_reserved_qty_by_ingredient, serialize_ingredients
+from app.availability import availability_ledger, serialize_ingredients
+from app.availability_patch import build_changed_ingredient_rows
 from app.error_responses import error_response
 from app.models import Ingredient
+from app.recipe_matrix import recipe_matrix_cache
+from app.snapshot_cache import delta_response, snapshot_response
+from app.socket_rooms import AVAILABILITY_ROOMS, INVENTORY_ROOMS
+from app.state_changes import notify_state_changed
 from db import SessionLocal
 
 ingredients_bp = Blueprint("ingredients", __name__)
 logger = logging.getLogger("kitchensync.api.ingredients")
 
 
-@ingredients_bp.get("/ingredients")
-def get_ingredients() -> tuple[list[dict[str, int | str | bool]], int]:
+def _build_ingredients_payload() -> list[dict[str, int | str | bool]]:
     with SessionLocal() as session:
         ingredients = session.execute(select(Ingredient).order_by(Ingredient.id.asc())).scalars().all()
-        active_reserved_qty_by_ingredient = get_active_reserved_qty_by_ingredient(session)
+        active_reserved_qty_by_ingredient = availability_ledger.reserved_qty_by_ingredient(session)
 
-    response_body = serialize_ingredients(ingredients, active_reserved_qty_by_ingredient)
-    logger.info("get_ingredients success count=%s", len(response_body))
-    return jsonify(response_body), 200
+    return serialize_ingredients(ingredients, active_reserved_qty_by_ingredient)
+
+
+@ingredients_bp.get("/ingredients")
+def get_ingredients() -> Response:
+    since = request.args.get("since")
+    if since is not None:
+        response = delta_response(since, _build_ingredients_payload, build_changed_ingredient_rows)
+        logger.info("get_ingredients delta success since=%s", since)
+        return response
+
+    response = snapshot_response("ingredients", _build_ingredients_payload)
+    logger.info("get_ingredients success status=%s", response.status_code)
+    return response
 
 
 @ingredients_bp.patch("/ingredients/<int:ingredient_id>")
@@ -72,7 +86,8 @@ def update_ingredient(ingredient_id: int) -> tuple[dict[str, int | str | bool],
             "low_stock_threshold_qty": ingredient.low_stock_threshold_qty,
             "is_out": ingredient.is_out,
         }
+        used_by_menu = bool(recipe_matrix_cache.get(session).rows_for_ingredients([ingredient_id]))
 
-    socketio.emit("stateChanged")
+    notify_state_changed([ingredient_id], rooms=AVAILABILITY_ROOMS if used_by_menu else INVENTORY_ROOMS)
     logger.info("update_ingredient success ingredient_id=%s", ingredient_id)
     return jsonify(response_body), 200
@@ -1,24 +1,144 @@
 from __future__ import annotations
 
 import logging
+from typing import Any
 
 from flask import Blueprint, jsonify, request
 
+from app.availability import availability_ledger
 from app.error_responses import error_response
-from app.reservation_expiration import expire_reservations_once_and_emit
-from config import settings
+from app.metrics import get_counters
+from app.reservation_archive import archive_reservations
+from app.reservation_expiration import run_expiration_sweep
+from config import MAX_ARCHIVE_BATCH_SIZE, MAX_EXPIRATION_BATCH_SIZE, settings
+from db import SessionLocal
 
 internal_bp = Blueprint("internal", __name__)
 logger = logging.getLogger("kitchensync.api.internal")
 
 
-@internal_bp.post("/internal/expire_once")
-def expire_once() -> tuple[dict[str, int | str], int]:
+def _is_internal_request_authorized() -> bool:
     provided_secret = request.headers.get("X-Internal-Secret", "")
-    if provided_secret != settings.internal_expire_secret:
+    return provided_secret == settings.internal_expire_secret
+
+
+def _read_optional_int(payload: dict[str, Any], name: str, *, minimum: int, maximum: int) -> tuple[int | None, bool]:
+    value = payload.get(name)
+    if value is None:
+        return None, True
+    if not isinstance(value, int) or isinstance(value, bool) or not minimum <= value <= maximum:
+        return None, False
+    return value, True
+
+
+@internal_bp.post("/internal/expire_once")
+def expire_once() -> tuple[dict[str, Any], int]:
+    if not _is_internal_request_authorized():
         logger.warning("expire_once unauthorized")
         return error_response("Unauthorized", 401, code="INTERNAL_UNAUTHORIZED")
 
-    expired_count = expire_reservations_once_and_emit()
-    logger.info("expire_once executed expired_count=%s", expired_count)
-    return jsonify({"status": "ok", "expired_count": expired_count}), 200
+    payload = request.get_json(silent=True) or {}
+    batch_size, batch_size_valid = _read_optional_int(
+        payload, "batch_size", minimum=1, maximum=MAX_EXPIRATION_BATCH_SIZE
+    )
+    if not batch_size_valid:
+        return error_response(
+            f"batch_size must be an integer between 1 and {MAX_EXPIRATION_BATCH_SIZE}",
+            400,
+            code="EXPIRATION_BATCH_SIZE_INVALID",
+        )
+    budget_ms, budget_ms_valid = _read_optional_int(payload, "budget_ms", minimum=0, maximum=60000)
+    if not budget_ms_valid:
+        return error_response(
+            "budget_ms must be an integer between 0 and 60000",
+            400,
+            code="EXPIRATION_BUDGET_INVALID",
+        )
+
+    sweep = run_expiration_sweep(batch_size=batch_size, budget_ms=budget_ms)
+    logger.info(
+        "expire_once executed expired_count=%s complete=%s", len(sweep.reservation_ids), sweep.complete
+    )
+    return jsonify(
+        {
+            "status": "ok",
+            "expired_count": len(sweep.reservation_ids),
+            "chunks": sweep.chunks,
+            "complete": sweep.complete,
+        }
+    ), 200
+
+
+@internal_bp.post("/internal/archive_reservations")
+def archive_settled_reservations() -> tuple[dict[str, Any], int]:
+    if not _is_internal_request_authorized():
+        logger.warning("archive_reservations unauthorized")
+        return error_response("Unauthorized", 401, code="INTERNAL_UNAUTHORIZED")
+
+    payload = request.get_json(silent=True) or {}
+    batch_size, batch_size_valid = _read_optional_int(
+        payload, "batch_size", minimum=1, maximum=MAX_ARCHIVE_BATCH_SIZE
+    )
+    if not batch_size_valid:
+        return error_response(
+            f"batch_size must be an integer between 1 and {MAX_ARCHIVE_BATCH_SIZE}",
+            400,
+            code="ARCHIVE_BATCH_SIZE_INVALID",
+        )
+    budget_ms, budget_ms_valid = _read_optional_int(payload, "budget_ms", minimum=0, maximum=60000)
+    if not budget_ms_valid:
+        return error_response(
+            "budget_ms must be an integer between 0 and 60000",
+            400,
+            code="ARCHIVE_BUDGET_INVALID",
+        )
+
+    run = archive_reservations(batch_size=batch_size, budget_ms=budget_ms)
+    return jsonify(
+        {
+            "status": "ok",
+            "archived_count": run.archived_count,
+            "batches": run.batches,
+            "complete": run.complete,
+        }
+    ), 200
+
+
+@internal_bp.post("/internal/verify_availability")
+def verify_availability() -> tuple[dict[str, Any], int]:
+    if not _is_internal_request_authorized():
+        logger.warning("verify_availability unauthorized")
+        return error_response("Unauthorized", 401, code="INTERNAL_UNAUTHORIZED")
+
+    with SessionLocal() as session:
+        mismatches = availability_ledger.verify(session)
+        if mismatches:
+            logger.warning("verify_availability mismatch ingredient_ids=%s", sorted(mismatches))
+            availability_ledger.rebuild(session)
+
+    logger.info("verify_availability executed mismatch_count=%s", len(mismatches))
+    return (
+        jsonify(
+            {
+                "status": "ok" if not mismatches else "rebuilt",
+                "mismatches": [
+                    {
+                        "ingredient_id": ingredient_id,
+                        "ledger_qty": ledger_qty,
+                        "database_qty": database_qty,
+                    }
+                    for ingredient_id, (ledger_qty, database_qty) in mismatches.items()
+                ],
+            }
+        ),
+        200,
+    )
+
+
+@internal_bp.get("/internal/metrics")
+def get_metrics() -> tuple[dict[str, Any], int]:
+    if not _is_internal_request_authorized():
+        logger.warning("get_metrics unauthorized")
+        return error_response("Unauthorized", 401, code="INTERNAL_UNAUTHORIZED")
+
+    return jsonify({"counters": get_counters()}), 200
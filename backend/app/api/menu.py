@@ -1,30 +1,37 @@
 import logging
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, request
 from sqlalchemy import select
 
-from app.availability import get_active_reserved_qty_by_ingredient, serialize_menu
-from app.models import Ingredient, MenuItem, Recipe
+from app.availability import availability_ledger
+from app.availability_patch import build_changed_menu_rows
+from app.models import Ingredient
+from app.recipe_matrix import recipe_matrix_cache
+from app.snapshot_cache import delta_response, snapshot_response
 from db import SessionLocal
 
 menu_bp = Blueprint("menu", __name__)
 logger = logging.getLogger("kitchensync.api.menu")
 
 
-@menu_bp.get("/menu")
-def get_menu() -> tuple[list[dict[str, int | str | bool | None]], int]:
+def _build_menu_payload() -> list[dict[str, int | str | bool | None | list[str]]]:
     with SessionLocal() as session:
-        menu_items = session.execute(select(MenuItem).order_by(MenuItem.id.asc())).scalars().all()
-        recipes = session.execute(select(Recipe)).scalars().all()
+        recipe_matrix = recipe_matrix_cache.get(session)
         ingredients = session.execute(select(Ingredient)).scalars().all()
-        active_reserved_qty_by_ingredient = get_active_reserved_qty_by_ingredient(session)
+        active_reserved_qty_by_ingredient = availability_ledger.reserved_qty_by_ingredient(session)
 
     ingredients_by_id = {ingredient.id: ingredient for ingredient in ingredients}
-    menu_payload = serialize_menu(
-        menu_items=menu_items,
-        recipes=recipes,
-        ingredients_by_id=ingredients_by_id,
-        active_reserved_qty_by_ingredient=active_reserved_qty_by_ingredient,
-    )
-    logger.info("get_menu success count=%s", len(menu_payload))
-    return jsonify(menu_payload), 200
+    return recipe_matrix.evaluate(ingredients_by_id, active_reserved_qty_by_ingredient)
+
+
+@menu_bp.get("/menu")
+def get_menu() -> Response:
+    since = request.args.get("since")
+    if since is not None:
+        response = delta_response(since, _build_menu_payload, build_changed_menu_rows)
+        logger.info("get_menu delta success since=%s", since)
+        return response
+
+    response = snapshot_response("menu", _build_menu_payload)
+    logger.info("get_menu success status=%s", response.status_code)
+    return response
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from flask import Blueprint, g, jsonify, request
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.auth import require_any_role
+from app.error_responses import error_response
+from app.models import ReservationHistory, ReservationItemHistory
+from db import SessionLocal
+
+# Archived reservations are read here, away from the hot reservation
+# blueprint and its admission limiter.
+reservation_history_bp = Blueprint("reservation_history", __name__)
+logger = logging.getLogger("kitchensync.api.reservation_history")
+
+DEFAULT_HISTORY_PAGE_SIZE = 20
+MAX_HISTORY_PAGE_SIZE = 100
+
+
+def _read_user_id() -> int | None:
+    claims = getattr(g, "jwt_claims", {})
+    try:
+        return int(claims.get("sub"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _serialize_history(
+    reservation: ReservationHistory,
+    items: list[ReservationItemHistory],
+) -> dict[str, Any]:
+    return {
+        "id": reservation.id,
+        "status": reservation.status,
+        "created_at": reservation.created_at.isoformat(),
+        "expires_at": reservation.expires_at.isoformat(),
+        "archived_at": reservation.archived_at.isoformat(),
+        "items": [
+            {
+                "menu_item_id": item.menu_item_id,
+                "qty": item.qty,
+                "notes": item.notes,
+            }
+            for item in sorted(items, key=lambda item: item.menu_item_id)
+        ],
+    }
+
+
+def _items_by_reservation(
+    session: Session,
+    reservation_ids: list[int],
+) -> dict[int, list[ReservationItemHistory]]:
+    items_by_reservation: dict[int, list[ReservationItemHistory]] = {
+        reservation_id: [] for reservation_id in reservation_ids
+    }
+    if not reservation_ids:
+        return items_by_reservation
+    for item in session.execute(
+        select(ReservationItemHistory).where(ReservationItemHistory.reservation_id.in_(reservation_ids))
+    ).scalars():
+        items_by_reservation[item.reservation_id].append(item)
+    return items_by_reservation
+
+
+@reservation_history_bp.get("/reservations/history")
+@require_any_role("online", "foh")
+def list_reservation_history() -> tuple[dict[str, Any], int]:
+    user_id = _read_user_id()
+    if user_id is None:
+        return error_response("Invalid access token subject", 401, code="AUTH_INVALID_SUBJECT")
+
+    limit = request.args.get("limit", DEFAULT_HISTORY_PAGE_SIZE, type=int)
+    before_id = request.args.get("before_id", type=int)
+    if limit is None or not 1 <= limit <= MAX_HISTORY_PAGE_SIZE:
+        return error_response(
+            f"limit must be an integer between 1 and {MAX_HISTORY_PAGE_SIZE}",
+            400,
+            code="HISTORY_LIMIT_INVALID",
+        )
+
+    query = select(ReservationHistory).where(ReservationHistory.user_id == user_id)
+    if before_id is not None:
+        query = query.where(ReservationHistory.id < before_id)
+    with SessionLocal() as session:
+        reservations = session.execute(
+            query.order_by(ReservationHistory.id.desc()).limit(limit)
+        ).scalars().all()
+        items_by_reservation = _items_by_reservation(
+            session, [reservation.id for reservation in reservations]
+        )
+
+    return (
+        jsonify(
+            {
+                "reservations": [
+                    _serialize_history(reservation, items_by_reservation[reservation.id])
+                    for reservation in reservations
+                ],
+                # Pass as before_id to read the next page; null on the last one.
+                "next_before_id": reservations[-1].id if len(reservations) == limit else None,
+            }
+        ),
+        200,
+    )
+
+
+@reservation_history_bp.get("/reservations/history/<int:reservation_id>")
+@require_any_role("online", "foh")
+def get_reservation_history(reservation_id: int) -> tuple[dict[str, Any], int]:
+    user_id = _read_user_id()
+    if user_id is None:
+        return error_response("Invalid access token subject", 401, code="AUTH_INVALID_SUBJECT")
+
+    with SessionLocal() as session:
+        reservation = session.execute(
+            select(ReservationHistory).where(
+                ReservationHistory.id == reservation_id,
+                ReservationHistory.user_id == user_id,
+            )
+        ).scalar_one_or_none()
+        items_by_reservation = _items_by_reservation(session, [reservation_id] if reservation else [])
+
+    # Someone else's archive reads as missing, like the list endpoint.
+    if reservation is None:
+        return error_response("Archived reservation not found", 404, code="RESERVATION_HISTORY_NOT_FOUND")
+
+    return jsonify(_serialize_history(reservation, items_by_reservation[reservation_id])), 200
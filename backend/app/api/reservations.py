@@ -1,31 +1,66 @@
 from __future__ import annotations
 
-from collections import defaultdict
+from collections.abc import Callable
 from datetime import datetime, timedelta, timezone
 import logging
 from typing import Any
 
 from flask import Blueprint, g, jsonify, request
-from sqlalchemy import delete, func, select
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 
-from app import socketio
+from app.admission_control import admit_reservation_request, release_reservation_request
 from app.auth import require_any_role
+from app.availability import (
+    SettledHolds,
+    adjust_reserved_qty,
+    availability_ledger,
+    commit_reserved_qty,
+    lock_ingredients_settling_overdue,
+    release_reserved_qty,
+)
+from app.db_retry import retry_transient_db_errors
 from app.error_responses import error_response
-from app.models import Ingredient, MenuItem, Recipe, Reservation, ReservationIngredient, ReservationItem
+from app.expiration_schedule import expiration_schedule
+from app.idempotency import idempotent
+from app.models import Ingredient, Reservation, ReservationIngredient, ReservationItem
+from app.recipe_matrix import recipe_matrix_cache
+from app.reservation_admission import (
+    InsufficientIngredient,
+    ReservationAdmission,
+    admit_reservation,
+    admit_reservation_batch,
+    sync_reservation_rows,
+)
 from app.runtime_reservation_ttl import get_runtime_ttl_seconds
+from app.state_changes import notify_state_changed
 from db import SessionLocal
 
 reservations_bp = Blueprint("reservations", __name__)
+reservations_bp.before_request(admit_reservation_request)
+reservations_bp.teardown_request(release_reservation_request)
 logger = logging.getLogger("kitchensync.api.reservations")
 
+MAX_BATCH_CARTS = 50
+MAX_BULK_RESERVATION_IDS = 100
+BATCH_MODES = ("per_cart", "all_or_nothing")
+
 
 def _utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def _publish_settled_holds(settled: SettledHolds) -> list[int]:
+    """Drop overdue holds an admission expired; return the ingredients to broadcast."""
+    if settled.reservation_ids:
+        availability_ledger.drop_holds(settled.reservation_ids)
+        expiration_schedule.discard(settled.reservation_ids)
+    return settled.ingredient_ids
+
+
 def _build_insufficient_error(
     *,
-    ingredient: Ingredient,
+    ingredient: Ingredient | InsufficientIngredient,
     required_qty: int,
     available_qty: int,
 ) -> dict[str, Any]:
@@ -39,6 +74,17 @@ def _build_insufficient_error(
     }
 
 
+def _build_shortage_errors(admission: ReservationAdmission) -> list[dict[str, Any]]:
+    return [
+        _build_insufficient_error(
+            ingredient=shortage,
+            required_qty=shortage.required_qty,
+            available_qty=shortage.available_qty,
+        )
+        for shortage in admission.insufficient
+    ]
+
+
 def _read_online_user_id() -> int | None:
     claims = getattr(g, "jwt_claims", {})
     raw_user_id = claims.get("sub")
@@ -83,6 +129,8 @@ def _normalize_reservation_items(payload_items: object) -> tuple[list[dict[str,
 
 @reservations_bp.post("/reservations")
 @require_any_role("online", "foh")
+@idempotent
+@retry_transient_db_errors
 def create_reservation() -> tuple[dict[str, Any], int]:
     payload = request.get_json(silent=True) or {}
     normalized_items, validation_error = _normalize_reservation_items(payload.get("items"))
@@ -98,131 +146,56 @@ def create_reservation() -> tuple[dict[str, Any], int]:
 
     now = _utc_now()
     expires_at = now + timedelta(seconds=get_runtime_ttl_seconds())
-    menu_item_ids = [item["menu_item_id"] for item in normalized_items]
-    requested_qty_by_menu_item = {
-        item["menu_item_id"]: item["qty"] for item in normalized_items
-    }
 
     with SessionLocal() as session:
         with session.begin():
-            menu_items = session.execute(
-                select(MenuItem).where(MenuItem.id.in_(menu_item_ids))
-            ).scalars().all()
-            found_menu_item_ids = {menu_item.id for menu_item in menu_items}
-            missing_menu_item_ids = sorted(set(menu_item_ids) - found_menu_item_ids)
-            if missing_menu_item_ids:
-                logger.warning(
-                    "create_reservation failed unknown_menu_items=%s",
-                    missing_menu_item_ids,
-                )
-                return (
-                    error_response(
-                        f"Unknown menu_item_id values: {missing_menu_item_ids}",
-                        400,
-                        code="MENU_ITEM_UNKNOWN",
-                    )
-                )
-
-            recipes = session.execute(
-                select(Recipe).where(Recipe.menu_item_id.in_(menu_item_ids))
-            ).scalars().all()
-
-            required_qty_by_ingredient: dict[int, int] = defaultdict(int)
-            for recipe in recipes:
-                required_qty_by_ingredient[recipe.ingredient_id] += (
-                    recipe.qty_required * requested_qty_by_menu_item[recipe.menu_item_id]
-                )
-
-            ingredient_ids = sorted(required_qty_by_ingredient.keys())
-            ingredients = session.execute(
-                select(Ingredient)
-                .where(Ingredient.id.in_(ingredient_ids))
-                .order_by(Ingredient.id.asc())
-                .with_for_update()
-            ).scalars().all()
-            ingredients_by_id = {ingredient.id: ingredient for ingredient in ingredients}
-
-            active_reserved_rows = session.execute(
-                select(
-                    ReservationIngredient.ingredient_id,
-                    func.coalesce(func.sum(ReservationIngredient.qty_reserved), 0),
-                )
-                .join(Reservation, Reservation.id == ReservationIngredient.reservation_id)
-                .where(
-                    ReservationIngredient.ingredient_id.in_(ingredient_ids),
-                    Reservation.status == "active",
-                    Reservation.expires_at > now,
-                )
-                .group_by(ReservationIngredient.ingredient_id)
-            ).all()
-            active_reserved_qty_by_ingredient = {
-                ingredient_id: int(total_qty)
-                for ingredient_id, total_qty in active_reserved_rows
-            }
-
-            insufficient_errors: list[dict[str, Any]] = []
-            for ingredient_id in ingredient_ids:
-                ingredient = ingredients_by_id[ingredient_id]
-                required_qty = required_qty_by_ingredient[ingredient_id]
-                active_reserved_qty = active_reserved_qty_by_ingredient.get(ingredient_id, 0)
-                available_qty = 0 if ingredient.is_out else ingredient.on_hand_qty - active_reserved_qty
-
-                if available_qty < required_qty:
-                    insufficient_errors.append(
-                        _build_insufficient_error(
-                            ingredient=ingredient,
-                            required_qty=required_qty,
-                            available_qty=available_qty,
-                        )
-                    )
-
-            if insufficient_errors:
-                logger.warning(
-                    "create_reservation conflict user_id=%s insufficient_count=%s",
-                    user_id,
-                    len(insufficient_errors),
-                )
-                return (
-                    jsonify(
-                        {
-                            "code": "INSUFFICIENT_INGREDIENTS",
-                            "errors": insufficient_errors,
-                            "request_id": getattr(g, "request_id", "unknown"),
-                        }
-                    ),
-                    409,
-                )
-
-            reservation = Reservation(
+            admission = admit_reservation(
+                session,
                 user_id=user_id,
-                status="active",
+                items=normalized_items,
+                now=now,
                 expires_at=expires_at,
             )
-            session.add(reservation)
-            session.flush()
-
-            for item in normalized_items:
-                session.add(
-                    ReservationItem(
-                        reservation_id=reservation.id,
-                        menu_item_id=item["menu_item_id"],
-                        qty=item["qty"],
-                        notes=item["notes"],
-                    )
-                )
-
-            for ingredient_id in ingredient_ids:
-                session.add(
-                    ReservationIngredient(
-                        reservation_id=reservation.id,
-                        ingredient_id=ingredient_id,
-                        qty_reserved=required_qty_by_ingredient[ingredient_id],
-                    )
-                )
 
-            reservation_id = reservation.id
-
-    socketio.emit("stateChanged")
+    settled_ingredient_ids = _publish_settled_holds(admission.settled)
+    if admission.missing_menu_item_ids:
+        logger.warning(
+            "create_reservation failed unknown_menu_items=%s",
+            admission.missing_menu_item_ids,
+        )
+        return (
+            error_response(
+                f"Unknown menu_item_id values: {admission.missing_menu_item_ids}",
+                400,
+                code="MENU_ITEM_UNKNOWN",
+            )
+        )
+
+    if admission.insufficient:
+        if settled_ingredient_ids:
+            notify_state_changed(settled_ingredient_ids)
+        logger.warning(
+            "create_reservation conflict user_id=%s insufficient_count=%s",
+            user_id,
+            len(admission.insufficient),
+        )
+        return (
+            jsonify(
+                {
+                    "code": "INSUFFICIENT_INGREDIENTS",
+                    "errors": _build_shortage_errors(admission),
+                    "request_id": getattr(g, "request_id", "unknown"),
+                }
+            ),
+            409,
+        )
+
+    reservation_id = admission.reservation_id
+    required_qty_by_ingredient = admission.required_qty_by_ingredient
+    ingredient_ids = sorted(set(required_qty_by_ingredient).union(settled_ingredient_ids))
+    availability_ledger.record_hold(reservation_id, expires_at, required_qty_by_ingredient)
+    expiration_schedule.schedule(reservation_id, expires_at)
+    notify_state_changed(ingredient_ids)
     logger.info(
         "create_reservation success reservation_id=%s user_id=%s expires_at=%s",
         reservation_id,
@@ -241,8 +214,146 @@ def create_reservation() -> tuple[dict[str, Any], int]:
     )
 
 
+@reservations_bp.post("/reservations/batch")
+@require_any_role("online", "foh")
+@idempotent
+@retry_transient_db_errors
+def create_reservation_batch() -> tuple[dict[str, Any], int]:
+    payload = request.get_json(silent=True) or {}
+    mode = payload.get("mode", "per_cart")
+    if mode not in BATCH_MODES:
+        return error_response(
+            "mode must be 'per_cart' or 'all_or_nothing'",
+            400,
+            code="RESERVATION_BATCH_MODE_INVALID",
+        )
+
+    carts = payload.get("carts")
+    if not isinstance(carts, list) or not carts or len(carts) > MAX_BATCH_CARTS:
+        return error_response(
+            f"carts must be a non-empty list of at most {MAX_BATCH_CARTS} carts",
+            400,
+            code="RESERVATION_BATCH_INVALID",
+        )
+
+    normalized_carts: list[list[dict[str, Any]]] = []
+    for index, cart in enumerate(carts):
+        if not isinstance(cart, dict):
+            return error_response(
+                f"carts[{index}]: each cart must be an object",
+                400,
+                code="RESERVATION_BATCH_INVALID",
+            )
+        normalized_items, validation_error = _normalize_reservation_items(cart.get("items"))
+        if validation_error is not None:
+            body, status_code = validation_error
+            return error_response(f"carts[{index}]: {body['error']}", status_code, code=body.get("code"))
+        normalized_carts.append(normalized_items)
+
+    user_id = _read_online_user_id()
+    if user_id is None:
+        logger.warning("create_reservation_batch failed invalid_token_subject")
+        return error_response("Invalid access token subject", 401, code="AUTH_INVALID_SUBJECT")
+    logger.info(
+        "create_reservation_batch start user_id=%s cart_count=%s mode=%s",
+        user_id,
+        len(normalized_carts),
+        mode,
+    )
+
+    now = _utc_now()
+    expires_at = now + timedelta(seconds=get_runtime_ttl_seconds())
+
+    with SessionLocal() as session:
+        with session.begin():
+            admissions, settled = admit_reservation_batch(
+                session,
+                user_id=user_id,
+                carts=normalized_carts,
+                now=now,
+                expires_at=expires_at,
+                all_or_nothing=mode == "all_or_nothing",
+            )
+
+    results: list[dict[str, Any]] = []
+    changed_ingredient_ids = set(_publish_settled_holds(settled))
+    for index, admission in enumerate(admissions):
+        if admission.missing_menu_item_ids:
+            results.append(
+                {
+                    "index": index,
+                    "status_code": 400,
+                    "error": f"Unknown menu_item_id values: {admission.missing_menu_item_ids}",
+                    "code": "MENU_ITEM_UNKNOWN",
+                }
+            )
+        elif admission.insufficient:
+            results.append(
+                {
+                    "index": index,
+                    "status_code": 409,
+                    "code": "INSUFFICIENT_INGREDIENTS",
+                    "errors": _build_shortage_errors(admission),
+                }
+            )
+        elif admission.reservation_id is None:
+            results.append(
+                {
+                    "index": index,
+                    "status_code": 409,
+                    "error": "Another cart in the batch was rejected",
+                    "code": "RESERVATION_BATCH_ABORTED",
+                }
+            )
+        else:
+            availability_ledger.record_hold(
+                admission.reservation_id, expires_at, admission.required_qty_by_ingredient
+            )
+            expiration_schedule.schedule(admission.reservation_id, expires_at)
+            changed_ingredient_ids.update(admission.required_qty_by_ingredient)
+            results.append(
+                {
+                    "index": index,
+                    "status_code": 201,
+                    "id": admission.reservation_id,
+                    "status": "active",
+                    "expires_at": expires_at.isoformat(),
+                }
+            )
+
+    admitted_count = sum(1 for result in results if result["status_code"] == 201)
+    if changed_ingredient_ids:
+        # One broadcast for the whole batch.
+        notify_state_changed(sorted(changed_ingredient_ids))
+    logger.info(
+        "create_reservation_batch done user_id=%s admitted=%s rejected=%s",
+        user_id,
+        admitted_count,
+        len(results) - admitted_count,
+    )
+
+    if mode == "all_or_nothing" and admitted_count < len(results):
+        return (
+            jsonify(
+                {
+                    "code": "RESERVATION_BATCH_REJECTED",
+                    "mode": mode,
+                    "results": results,
+                    "request_id": getattr(g, "request_id", "unknown"),
+                }
+            ),
+            409,
+        )
+    return (
+        jsonify({"mode": mode, "results": results}),
+        201 if mode == "all_or_nothing" else 200,
+    )
+
+
 @reservations_bp.patch("/reservations/<int:reservation_id>")
 @require_any_role("online", "foh")
+@idempotent
+@retry_transient_db_errors
 def update_reservation(reservation_id: int) -> tuple[dict[str, Any], int]:
     payload = request.get_json(silent=True) or {}
     normalized_items, validation_error = _normalize_reservation_items(payload.get("items"))
@@ -258,6 +369,8 @@ def update_reservation(reservation_id: int) -> tuple[dict[str, Any], int]:
     }
 
     state_changed = False
+    expired = False
+    settled = SettledHolds()
     logger.info("update_reservation start reservation_id=%s item_count=%s", reservation_id, len(normalized_items))
 
     with SessionLocal() as session:
@@ -284,142 +397,123 @@ def update_reservation(reservation_id: int) -> tuple[dict[str, Any], int]:
                 )
 
             if reservation.expires_at <= now:
+                # Committed below, so the freed stock is published like any release.
                 reservation.status = "expired"
-                state_changed = True
-                logger.warning("update_reservation failed reservation_expired reservation_id=%s", reservation_id)
-                return error_response("Reservation expired", 409, code="RESERVATION_EXPIRED")
-
-            menu_items = session.execute(
-                select(MenuItem).where(MenuItem.id.in_(menu_item_ids))
-            ).scalars().all()
-            found_menu_item_ids = {menu_item.id for menu_item in menu_items}
-            missing_menu_item_ids = sorted(set(menu_item_ids) - found_menu_item_ids)
-            if missing_menu_item_ids:
-                logger.warning(
-                    "update_reservation failed reservation_id=%s unknown_menu_items=%s",
-                    reservation_id,
-                    missing_menu_item_ids,
-                )
-                return (
-                    error_response(
-                        f"Unknown menu_item_id values: {missing_menu_item_ids}",
-                        400,
-                        code="MENU_ITEM_UNKNOWN",
+                ingredient_ids = release_reserved_qty(session, [reservation_id])
+                expired = True
+            else:
+                recipe_matrix = recipe_matrix_cache.get(session)
+                missing_menu_item_ids = recipe_matrix.missing_menu_item_ids(menu_item_ids)
+                if missing_menu_item_ids:
+                    logger.warning(
+                        "update_reservation failed reservation_id=%s unknown_menu_items=%s",
+                        reservation_id,
+                        missing_menu_item_ids,
                     )
-                )
-
-            recipes = session.execute(
-                select(Recipe).where(Recipe.menu_item_id.in_(menu_item_ids))
-            ).scalars().all()
-
-            required_qty_by_ingredient: dict[int, int] = defaultdict(int)
-            for recipe in recipes:
-                required_qty_by_ingredient[recipe.ingredient_id] += (
-                    recipe.qty_required * requested_qty_by_menu_item[recipe.menu_item_id]
-                )
-
-            existing_reserved_rows = session.execute(
-                select(ReservationIngredient).where(
-                    ReservationIngredient.reservation_id == reservation_id
-                )
-            ).scalars().all()
-            existing_ingredient_ids = {
-                reserved_row.ingredient_id for reserved_row in existing_reserved_rows
-            }
-            ingredient_ids = sorted(
-                existing_ingredient_ids.union(required_qty_by_ingredient.keys())
-            )
-            ingredients = session.execute(
-                select(Ingredient)
-                .where(Ingredient.id.in_(ingredient_ids))
-                .order_by(Ingredient.id.asc())
-                .with_for_update()
-            ).scalars().all()
-            ingredients_by_id = {ingredient.id: ingredient for ingredient in ingredients}
-
-            active_reserved_rows = session.execute(
-                select(
-                    ReservationIngredient.ingredient_id,
-                    func.coalesce(func.sum(ReservationIngredient.qty_reserved), 0),
-                )
-                .join(Reservation, Reservation.id == ReservationIngredient.reservation_id)
-                .where(
-                    ReservationIngredient.ingredient_id.in_(ingredient_ids),
-                    Reservation.status == "active",
-                    Reservation.expires_at > now,
-                    Reservation.id != reservation_id,
-                )
-                .group_by(ReservationIngredient.ingredient_id)
-            ).all()
-            active_reserved_qty_by_ingredient = {
-                ingredient_id: int(total_qty)
-                for ingredient_id, total_qty in active_reserved_rows
-            }
-
-            insufficient_errors: list[dict[str, Any]] = []
-            for ingredient_id, required_qty in sorted(required_qty_by_ingredient.items()):
-                ingredient = ingredients_by_id[ingredient_id]
-                active_reserved_qty = active_reserved_qty_by_ingredient.get(ingredient_id, 0)
-                available_qty = 0 if ingredient.is_out else ingredient.on_hand_qty - active_reserved_qty
-                if available_qty < required_qty:
-                    insufficient_errors.append(
-                        _build_insufficient_error(
-                            ingredient=ingredient,
-                            required_qty=required_qty,
-                            available_qty=available_qty,
+                    return (
+                        error_response(
+                            f"Unknown menu_item_id values: {missing_menu_item_ids}",
+                            400,
+                            code="MENU_ITEM_UNKNOWN",
                         )
                     )
 
-            if insufficient_errors:
-                logger.warning(
-                    "update_reservation conflict reservation_id=%s insufficient_count=%s",
-                    reservation_id,
-                    len(insufficient_errors),
-                )
-                return (
-                    jsonify(
-                        {
-                            "code": "INSUFFICIENT_INGREDIENTS",
-                            "errors": insufficient_errors,
-                            "request_id": getattr(g, "request_id", "unknown"),
-                        }
-                    ),
-                    409,
-                )
-
-            session.execute(
-                delete(ReservationItem).where(ReservationItem.reservation_id == reservation_id)
-            )
-            session.execute(
-                delete(ReservationIngredient).where(
-                    ReservationIngredient.reservation_id == reservation_id
+                required_qty_by_ingredient = recipe_matrix.required_qty_by_ingredient(
+                    requested_qty_by_menu_item
                 )
-            )
 
-            for item in normalized_items:
-                session.add(
-                    ReservationItem(
-                        reservation_id=reservation_id,
-                        menu_item_id=item["menu_item_id"],
-                        qty=item["qty"],
-                        notes=item["notes"],
+                existing_items = session.execute(
+                    select(ReservationItem).where(ReservationItem.reservation_id == reservation_id)
+                ).scalars().all()
+                existing_reserved_rows = session.execute(
+                    select(ReservationIngredient).where(
+                        ReservationIngredient.reservation_id == reservation_id
                     )
+                ).scalars().all()
+                existing_qty_by_ingredient = {
+                    reserved_row.ingredient_id: reserved_row.qty_reserved
+                    for reserved_row in existing_reserved_rows
+                }
+                delta_by_ingredient = {
+                    ingredient_id: required_qty_by_ingredient.get(ingredient_id, 0)
+                    - existing_qty_by_ingredient.get(ingredient_id, 0)
+                    for ingredient_id in set(existing_qty_by_ingredient).union(required_qty_by_ingredient)
+                }
+                # Unchanged ingredients are neither locked nor checked, and only
+                # increases can run out of stock.
+                ingredient_ids = sorted(
+                    ingredient_id for ingredient_id, delta in delta_by_ingredient.items() if delta != 0
                 )
+                increased_ingredient_ids = [
+                    ingredient_id for ingredient_id in ingredient_ids if delta_by_ingredient[ingredient_id] > 0
+                ]
+                settled = lock_ingredients_settling_overdue(session, ingredient_ids, now=now)
+                ingredients = session.execute(
+                    select(Ingredient).where(Ingredient.id.in_(increased_ingredient_ids))
+                ).scalars().all()
+                ingredients_by_id = {ingredient.id: ingredient for ingredient in ingredients}
 
-            for ingredient_id, qty_reserved in sorted(required_qty_by_ingredient.items()):
-                session.add(
-                    ReservationIngredient(
-                        reservation_id=reservation_id,
-                        ingredient_id=ingredient_id,
-                        qty_reserved=qty_reserved,
-                    )
-                )
+                insufficient_errors: list[dict[str, Any]] = []
+                for ingredient_id in increased_ingredient_ids:
+                    ingredient = ingredients_by_id[ingredient_id]
+                    required_qty = required_qty_by_ingredient[ingredient_id]
+                    # Leave out this reservation's own current hold.
+                    active_reserved_qty = ingredient.reserved_qty - existing_qty_by_ingredient.get(ingredient_id, 0)
+                    available_qty = 0 if ingredient.is_out else ingredient.on_hand_qty - active_reserved_qty
+                    if available_qty < required_qty:
+                        insufficient_errors.append(
+                            _build_insufficient_error(
+                                ingredient=ingredient,
+                                required_qty=required_qty,
+                                available_qty=available_qty,
+                            )
+                        )
 
-            reservation.expires_at = expires_at
-            state_changed = True
+                if not insufficient_errors:
+                    sync_reservation_rows(
+                        session,
+                        reservation_id,
+                        normalized_items,
+                        required_qty_by_ingredient,
+                        existing_items=existing_items,
+                        existing_ingredients=existing_reserved_rows,
+                    )
+                    adjust_reserved_qty(session, delta_by_ingredient)
+                    reservation.expires_at = expires_at
+                    state_changed = True
+
+    if expired:
+        availability_ledger.drop_holds([reservation_id])
+        expiration_schedule.discard([reservation_id])
+        notify_state_changed(ingredient_ids)
+        logger.warning("update_reservation failed reservation_expired reservation_id=%s", reservation_id)
+        return error_response("Reservation expired", 409, code="RESERVATION_EXPIRED")
+
+    # Overdue holds settled above were committed even on a conflict.
+    settled_ingredient_ids = _publish_settled_holds(settled)
+    if insufficient_errors:
+        if settled_ingredient_ids:
+            notify_state_changed(settled_ingredient_ids)
+        logger.warning(
+            "update_reservation conflict reservation_id=%s insufficient_count=%s",
+            reservation_id,
+            len(insufficient_errors),
+        )
+        return (
+            jsonify(
+                {
+                    "code": "INSUFFICIENT_INGREDIENTS",
+                    "errors": insufficient_errors,
+                    "request_id": getattr(g, "request_id", "unknown"),
+                }
+            ),
+            409,
+        )
 
+    availability_ledger.record_hold(reservation_id, expires_at, required_qty_by_ingredient)
+    expiration_schedule.schedule(reservation_id, expires_at)
     if state_changed:
-        socketio.emit("stateChanged")
+        notify_state_changed(sorted(set(ingredient_ids).union(settled_ingredient_ids)))
     logger.info(
         "update_reservation success reservation_id=%s expires_at=%s",
         reservation_id,
@@ -437,150 +531,249 @@ def update_reservation(reservation_id: int) -> tuple[dict[str, Any], int]:
     )
 
 
+def _lock_reservations(session: Session, reservation_ids: list[int]) -> dict[int, Reservation]:
+    reservations = session.execute(
+        select(Reservation)
+        .where(Reservation.id.in_(reservation_ids))
+        .order_by(Reservation.id.asc())
+        .with_for_update()
+    ).scalars().all()
+    return {reservation.id: reservation for reservation in reservations}
+
+
+def _lock_reservation_ingredients(session: Session, reservation_ids: list[int]) -> None:
+    # One pass in id order, so releases and commits in the same transaction
+    # never take ingredient locks out of order.
+    if not reservation_ids:
+        return
+    session.execute(
+        select(Ingredient.id)
+        .where(
+            Ingredient.id.in_(
+                select(ReservationIngredient.ingredient_id).where(
+                    ReservationIngredient.reservation_id.in_(reservation_ids)
+                )
+            )
+        )
+        .order_by(Ingredient.id.asc())
+        .with_for_update()
+    )
+
+
+def _commit_reservations(
+    session: Session,
+    reservation_ids: list[int],
+    now: datetime,
+) -> tuple[dict[int, tuple[dict[str, Any], int]], list[int], list[int]]:
+    """Apply commit semantics to each reservation inside the caller's transaction.
+
+    Returns ``(outcome_by_id, changed_ingredient_ids, settled_reservation_ids)``;
+    each outcome is the ``(body, status_code)`` of the single-reservation
+    response, without ``request_id``.
+    """
+    reservations_by_id = _lock_reservations(session, reservation_ids)
+    outcome_by_id: dict[int, tuple[dict[str, Any], int]] = {}
+    expiring_ids: list[int] = []
+    committing_ids: list[int] = []
+    for reservation_id in reservation_ids:
+        reservation = reservations_by_id.get(reservation_id)
+        if reservation is None:
+            logger.warning("commit_reservation failed reservation_not_found reservation_id=%s", reservation_id)
+            outcome_by_id[reservation_id] = (
+                {"error": "Reservation not found", "code": "RESERVATION_NOT_FOUND"},
+                404,
+            )
+        elif reservation.status == "committed":
+            logger.info("commit_reservation idempotent reservation_id=%s", reservation_id)
+            outcome_by_id[reservation_id] = ({"id": reservation.id, "status": reservation.status}, 200)
+        elif reservation.status not in {"released", "expired"} and reservation.expires_at <= now:
+            reservation.status = "expired"
+            expiring_ids.append(reservation_id)
+            logger.warning("commit_reservation failed reservation_expired reservation_id=%s", reservation_id)
+            outcome_by_id[reservation_id] = (
+                {"error": "Reservation expired", "code": "RESERVATION_EXPIRED"},
+                409,
+            )
+        elif reservation.status != "active":
+            logger.warning(
+                "commit_reservation failed reservation_id=%s status=%s",
+                reservation_id,
+                reservation.status,
+            )
+            outcome_by_id[reservation_id] = (
+                {"error": f"Reservation is {reservation.status}", "code": "RESERVATION_STATE_CONFLICT"},
+                409,
+            )
+        else:
+            reservation.status = "committed"
+            committing_ids.append(reservation_id)
+            logger.info("commit_reservation success reservation_id=%s", reservation_id)
+            outcome_by_id[reservation_id] = ({"id": reservation.id, "status": reservation.status}, 200)
+
+    _lock_reservation_ingredients(session, expiring_ids + committing_ids)
+    changed_ingredient_ids = set(release_reserved_qty(session, expiring_ids))
+    changed_ingredient_ids.update(commit_reserved_qty(session, committing_ids))
+    return outcome_by_id, sorted(changed_ingredient_ids), expiring_ids + committing_ids
+
+
+def _release_reservations(
+    session: Session,
+    reservation_ids: list[int],
+    now: datetime,
+) -> tuple[dict[int, tuple[dict[str, Any], int]], list[int], list[int]]:
+    """Release counterpart of ``_commit_reservations``, with the same return shape."""
+    reservations_by_id = _lock_reservations(session, reservation_ids)
+    outcome_by_id: dict[int, tuple[dict[str, Any], int]] = {}
+    settled_ids: list[int] = []
+    for reservation_id in reservation_ids:
+        reservation = reservations_by_id.get(reservation_id)
+        if reservation is None:
+            logger.warning("release_reservation failed reservation_not_found reservation_id=%s", reservation_id)
+            outcome_by_id[reservation_id] = (
+                {"error": "Reservation not found", "code": "RESERVATION_NOT_FOUND"},
+                404,
+            )
+            continue
+        if reservation.status == "committed":
+            logger.warning("release_reservation failed reservation_committed reservation_id=%s", reservation_id)
+            outcome_by_id[reservation_id] = (
+                {"error": "Reservation is committed", "code": "RESERVATION_COMMITTED"},
+                409,
+            )
+            continue
+
+        if reservation.status in {"released", "expired"}:
+            pass
+        elif reservation.expires_at <= now:
+            reservation.status = "expired"
+            settled_ids.append(reservation_id)
+        elif reservation.status == "active":
+            reservation.status = "released"
+            settled_ids.append(reservation_id)
+        else:
+            logger.warning(
+                "release_reservation failed reservation_id=%s status=%s",
+                reservation_id,
+                reservation.status,
+            )
+            outcome_by_id[reservation_id] = (
+                {"error": f"Reservation is {reservation.status}", "code": "RESERVATION_STATE_CONFLICT"},
+                409,
+            )
+            continue
+        logger.info("release_reservation success reservation_id=%s status=%s", reservation_id, reservation.status)
+        outcome_by_id[reservation_id] = ({"id": reservation.id, "status": reservation.status}, 200)
+
+    _lock_reservation_ingredients(session, settled_ids)
+    changed_ingredient_ids = release_reserved_qty(session, settled_ids)
+    return outcome_by_id, changed_ingredient_ids, settled_ids
+
+
+def _single_outcome_response(outcome: tuple[dict[str, Any], int]) -> tuple[dict[str, Any], int]:
+    body, status_code = outcome
+    if "error" in body:
+        return error_response(body["error"], status_code, code=body["code"])
+    return jsonify(body), status_code
+
+
+def _read_reservation_ids(payload: dict[str, Any]) -> list[int] | None:
+    raw_ids = payload.get("ids")
+    if not isinstance(raw_ids, list) or not raw_ids or len(raw_ids) > MAX_BULK_RESERVATION_IDS:
+        return None
+    if any(not isinstance(raw_id, int) or isinstance(raw_id, bool) for raw_id in raw_ids):
+        return None
+    return list(dict.fromkeys(raw_ids))
+
+
+def _settle_reservations_in_bulk(
+    action: str,
+    settle: Callable[
+        [Session, list[int], datetime],
+        tuple[dict[int, tuple[dict[str, Any], int]], list[int], list[int]],
+    ],
+) -> tuple[dict[str, Any], int]:
+    reservation_ids = _read_reservation_ids(request.get_json(silent=True) or {})
+    if reservation_ids is None:
+        return error_response(
+            f"ids must be a non-empty list of at most {MAX_BULK_RESERVATION_IDS} integers",
+            400,
+            code="RESERVATION_IDS_INVALID",
+        )
+    logger.info("%s_reservations start count=%s", action, len(reservation_ids))
+
+    with SessionLocal() as session:
+        with session.begin():
+            outcome_by_id, changed_ingredient_ids, settled_ids = settle(
+                session, reservation_ids, _utc_now()
+            )
+
+    if settled_ids:
+        availability_ledger.drop_holds(settled_ids)
+        expiration_schedule.discard(settled_ids)
+        # One broadcast for every reservation in the request.
+        notify_state_changed(changed_ingredient_ids)
+    results: list[dict[str, Any]] = []
+    for reservation_id in reservation_ids:
+        body, status_code = outcome_by_id[reservation_id]
+        results.append({"id": reservation_id, "status_code": status_code, **body})
+    logger.info("%s_reservations done count=%s settled=%s", action, len(reservation_ids), len(settled_ids))
+    return jsonify({"results": results}), 200
+
+
+@reservations_bp.post("/reservations/commit")
+@require_any_role("online", "foh")
+@idempotent
+@retry_transient_db_errors
+def commit_reservations() -> tuple[dict[str, Any], int]:
+    return _settle_reservations_in_bulk("commit", _commit_reservations)
+
+
+@reservations_bp.post("/reservations/release")
+@require_any_role("online", "foh")
+@idempotent
+@retry_transient_db_errors
+def release_reservations() -> tuple[dict[str, Any], int]:
+    return _settle_reservations_in_bulk("release", _release_reservations)
+
+
 @reservations_bp.post("/reservations/<int:reservation_id>/commit")
 @require_any_role("online", "foh")
+@idempotent
+@retry_transient_db_errors
 def commit_reservation(reservation_id: int) -> tuple[dict[str, Any], int]:
-    state_changed = False
-    response_status_code = 200
-    response_body: dict[str, Any]
-    now = _utc_now()
     logger.info("commit_reservation start reservation_id=%s", reservation_id)
 
     with SessionLocal() as session:
         with session.begin():
-            reservation = session.execute(
-                select(Reservation)
-                .where(Reservation.id == reservation_id)
-                .with_for_update()
-            ).scalar_one_or_none()
-            if reservation is None:
-                logger.warning("commit_reservation failed reservation_not_found reservation_id=%s", reservation_id)
-                return error_response("Reservation not found", 404, code="RESERVATION_NOT_FOUND")
-
-            if reservation.status == "committed":
-                response_body = {"id": reservation.id, "status": reservation.status}
-                logger.info("commit_reservation idempotent reservation_id=%s", reservation_id)
-            elif reservation.status in {"released", "expired"}:
-                logger.warning(
-                    "commit_reservation failed reservation_id=%s status=%s",
-                    reservation_id,
-                    reservation.status,
-                )
-                return error_response(
-                    f"Reservation is {reservation.status}",
-                    409,
-                    code="RESERVATION_STATE_CONFLICT",
-                )
-            elif reservation.expires_at <= now:
-                reservation.status = "expired"
-                response_status_code = 409
-                response_body = {
-                    "error": "Reservation expired",
-                    "code": "RESERVATION_EXPIRED",
-                    "request_id": getattr(g, "request_id", "unknown"),
-                }
-                state_changed = True
-                logger.warning("commit_reservation failed reservation_expired reservation_id=%s", reservation_id)
-            elif reservation.status != "active":
-                logger.warning(
-                    "commit_reservation failed reservation_id=%s status=%s",
-                    reservation_id,
-                    reservation.status,
-                )
-                return error_response(
-                    f"Reservation is {reservation.status}",
-                    409,
-                    code="RESERVATION_STATE_CONFLICT",
-                )
-            else:
-                reservation_ingredients = session.execute(
-                    select(ReservationIngredient)
-                    .where(ReservationIngredient.reservation_id == reservation.id)
-                ).scalars().all()
-                ingredient_ids = sorted(
-                    {
-                        reservation_ingredient.ingredient_id
-                        for reservation_ingredient in reservation_ingredients
-                    }
-                )
-                ingredients = session.execute(
-                    select(Ingredient)
-                    .where(Ingredient.id.in_(ingredient_ids))
-                    .order_by(Ingredient.id.asc())
-                    .with_for_update()
-                ).scalars().all()
-                ingredients_by_id = {ingredient.id: ingredient for ingredient in ingredients}
-
-                for reservation_ingredient in reservation_ingredients:
-                    ingredient = ingredients_by_id[reservation_ingredient.ingredient_id]
-                    next_on_hand_qty = ingredient.on_hand_qty - reservation_ingredient.qty_reserved
-                    if next_on_hand_qty < 0:
-                        raise RuntimeError(
-                            f"Negative inventory for ingredient_id={ingredient.id} during commit"
-                        )
-                    ingredient.on_hand_qty = next_on_hand_qty
-
-                reservation.status = "committed"
-                response_body = {"id": reservation.id, "status": reservation.status}
-                state_changed = True
-                logger.info("commit_reservation success reservation_id=%s", reservation_id)
+            outcome_by_id, changed_ingredient_ids, settled_ids = _commit_reservations(
+                session, [reservation_id], _utc_now()
+            )
 
-    if state_changed:
-        socketio.emit("stateChanged")
-    return jsonify(response_body), response_status_code
+    if settled_ids:
+        availability_ledger.drop_holds(settled_ids)
+        expiration_schedule.discard(settled_ids)
+        notify_state_changed(changed_ingredient_ids)
+    return _single_outcome_response(outcome_by_id[reservation_id])
 
 
 @reservations_bp.post("/reservations/<int:reservation_id>/release")
 @require_any_role("online", "foh")
+@idempotent
+@retry_transient_db_errors
 def release_reservation(reservation_id: int) -> tuple[dict[str, Any], int]:
-    state_changed = False
-    response_body: dict[str, Any]
-    now = _utc_now()
     logger.info("release_reservation start reservation_id=%s", reservation_id)
 
     with SessionLocal() as session:
         with session.begin():
-            reservation = session.execute(
-                select(Reservation)
-                .where(Reservation.id == reservation_id)
-                .with_for_update()
-            ).scalar_one_or_none()
-            if reservation is None:
-                logger.warning("release_reservation failed reservation_not_found reservation_id=%s", reservation_id)
-                return error_response("Reservation not found", 404, code="RESERVATION_NOT_FOUND")
-
-            if reservation.status == "committed":
-                logger.warning("release_reservation failed reservation_committed reservation_id=%s", reservation_id)
-                return error_response("Reservation is committed", 409, code="RESERVATION_COMMITTED")
-
-            if reservation.status == "released":
-                response_body = {"id": reservation.id, "status": reservation.status}
-            elif reservation.status == "expired":
-                response_body = {"id": reservation.id, "status": reservation.status}
-            elif reservation.expires_at <= now:
-                reservation.status = "expired"
-                response_body = {"id": reservation.id, "status": reservation.status}
-                state_changed = True
-            elif reservation.status == "active":
-                reservation.status = "released"
-                response_body = {"id": reservation.id, "status": reservation.status}
-                state_changed = True
-            else:
-                logger.warning(
-                    "release_reservation failed reservation_id=%s status=%s",
-                    reservation_id,
-                    reservation.status,
-                )
-                return error_response(
-                    f"Reservation is {reservation.status}",
-                    409,
-                    code="RESERVATION_STATE_CONFLICT",
-                )
+            outcome_by_id, changed_ingredient_ids, settled_ids = _release_reservations(
+                session, [reservation_id], _utc_now()
+            )
 
-    if state_changed:
-        socketio.emit("stateChanged")
-    logger.info("release_reservation success reservation_id=%s status=%s", reservation_id, response_body["status"])
-    return jsonify(response_body), 200
+    if settled_ids:
+        availability_ledger.drop_holds(settled_ids)
+        expiration_schedule.discard(settled_ids)
+        notify_state_changed(changed_ingredient_ids)
+    return _single_outcome_response(outcome_by_id[reservation_id])
 
 
 @reservations_bp.get("/reservations/<int:reservation_id>")
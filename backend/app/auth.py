@@ -37,6 +37,16 @@ def _decode_access_token(token: str) -> dict[str, Any]:
     return jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
 
 
+def read_access_token_claims(token: str | None) -> dict[str, Any] | None:
+    """Claims of a valid access token, or ``None`` for a missing/invalid one."""
+    if not token:
+        return None
+    try:
+        return _decode_access_token(token)
+    except jwt.InvalidTokenError:
+        return None
+
+
 def _unauthorized(message: str) -> tuple[dict[str, str], int]:
     return error_response(message, 401)
 
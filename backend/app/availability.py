@@ -1,13 +1,19 @@
 from __future__ import annotations
 
-from collections.abc import Sequence
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+import heapq
+import logging
+from threading import Lock
 
-from sqlalchemy import func, select
+from sqlalchemy import case, func, select, update
 from sqlalchemy.orm import Session
 
 from app.models import Ingredient, MenuItem, Recipe, Reservation, ReservationIngredient
 
+logger = logging.getLogger("kitchensync.availability")
+
 
 def _utc_now() -> datetime:
     return datetime.now(timezone.utc)
@@ -34,6 +40,485 @@ def get_active_reserved_qty_by_ingredient(
     return {ingredient_id: int(total_qty) for ingredient_id, total_qty in rows}
 
 
+@dataclass(frozen=True)
+class SettledHolds:
+    """Overdue reservations ``lock_ingredients_settling_overdue`` expired."""
+
+    reservation_ids: list[int] = field(default_factory=list)
+    # Ingredients whose ``reserved_qty`` dropped.
+    ingredient_ids: list[int] = field(default_factory=list)
+
+
+def lock_ingredients_settling_overdue(
+    session: Session,
+    ingredient_ids: Sequence[int],
+    now: datetime | None = None,
+) -> SettledHolds:
+    """Lock ``ingredient_ids`` after expiring the overdue holds on them.
+
+    Reservations still ``active`` past ``expires_at`` count in ``reserved_qty``
+    until something expires them. Expiring the ones holding these ingredients
+    here, in the caller's transaction, lets availability checks read
+    ``on_hand_qty - reserved_qty`` alone. They are found through the partial
+    index on active ``expires_at``, so with the expiration job keeping up
+    this is one empty index probe. Rows a concurrent writer holds are
+    skipped; it settles them itself. Every ingredient row touched is locked
+    once, in id order. Publish the result after commit.
+    """
+    if not ingredient_ids:
+        return SettledHolds()
+
+    effective_now = now or _utc_now()
+    overdue_ids = session.execute(
+        select(Reservation.id)
+        .where(
+            Reservation.status == "active",
+            Reservation.expires_at <= effective_now,
+            select(ReservationIngredient.id)
+            .where(
+                ReservationIngredient.reservation_id == Reservation.id,
+                ReservationIngredient.ingredient_id.in_(ingredient_ids),
+            )
+            .exists(),
+        )
+        .order_by(Reservation.id.asc())
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+    released_qty_by_ingredient: dict[int, int] = {}
+    if overdue_ids:
+        rows = session.execute(
+            select(
+                ReservationIngredient.ingredient_id,
+                func.sum(ReservationIngredient.qty_reserved),
+            )
+            .where(ReservationIngredient.reservation_id.in_(overdue_ids))
+            .group_by(ReservationIngredient.ingredient_id)
+        ).all()
+        released_qty_by_ingredient = {ingredient_id: int(total_qty) for ingredient_id, total_qty in rows}
+
+    # Lock in id order first so this never deadlocks against reservation writers.
+    session.execute(
+        select(Ingredient.id)
+        .where(Ingredient.id.in_(sorted(set(ingredient_ids) | set(released_qty_by_ingredient))))
+        .order_by(Ingredient.id.asc())
+        .with_for_update()
+    )
+    if not overdue_ids:
+        return SettledHolds()
+
+    session.execute(
+        update(Reservation)
+        .where(Reservation.id.in_(overdue_ids))
+        .values(status="expired", updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    adjust_reserved_qty(
+        session,
+        {ingredient_id: -qty for ingredient_id, qty in released_qty_by_ingredient.items()},
+    )
+    return SettledHolds(
+        reservation_ids=list(overdue_ids),
+        ingredient_ids=sorted(released_qty_by_ingredient),
+    )
+
+
+def adjust_reserved_qty(session: Session, delta_by_ingredient: Mapping[int, int]) -> None:
+    """Apply signed deltas to ``Ingredient.reserved_qty`` inside the caller's transaction."""
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in delta_by_ingredient.items()
+        if delta != 0
+    }
+    if not deltas:
+        return
+
+    ingredient_ids = sorted(deltas)
+    # Lock in id order first so this never deadlocks against reservation writers.
+    session.execute(
+        select(Ingredient.id)
+        .where(Ingredient.id.in_(ingredient_ids))
+        .order_by(Ingredient.id.asc())
+        .with_for_update()
+    )
+    session.execute(
+        update(Ingredient)
+        .where(Ingredient.id.in_(ingredient_ids))
+        .values(reserved_qty=Ingredient.reserved_qty + case(deltas, value=Ingredient.id, else_=0))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release_reserved_qty(session: Session, reservation_ids: Sequence[int]) -> list[int]:
+    """Return the holds of reservations leaving ``active`` to ``reserved_qty``.
+
+    Returns the ids of the ingredients whose totals changed.
+    """
+    if not reservation_ids:
+        return []
+
+    rows = session.execute(
+        select(
+            ReservationIngredient.ingredient_id,
+            func.sum(ReservationIngredient.qty_reserved),
+        )
+        .where(ReservationIngredient.reservation_id.in_(reservation_ids))
+        .group_by(ReservationIngredient.ingredient_id)
+    ).all()
+    adjust_reserved_qty(
+        session,
+        {ingredient_id: -int(total_qty) for ingredient_id, total_qty in rows},
+    )
+    return sorted(ingredient_id for ingredient_id, _ in rows)
+
+
+def commit_reserved_qty(session: Session, reservation_ids: Sequence[int]) -> list[int]:
+    """Consume the holds of reservations being committed.
+
+    ``on_hand_qty`` and ``reserved_qty`` both drop by each ingredient's total
+    across the reservations, in one UPDATE. Returns the ids of the changed
+    ingredients.
+    """
+    if not reservation_ids:
+        return []
+
+    rows = session.execute(
+        select(
+            ReservationIngredient.ingredient_id,
+            func.sum(ReservationIngredient.qty_reserved),
+        )
+        .where(ReservationIngredient.reservation_id.in_(reservation_ids))
+        .group_by(ReservationIngredient.ingredient_id)
+    ).all()
+    qty_by_ingredient = {ingredient_id: int(total_qty) for ingredient_id, total_qty in rows}
+    if not qty_by_ingredient:
+        return []
+
+    ingredient_ids = sorted(qty_by_ingredient)
+    on_hand_rows = session.execute(
+        select(Ingredient.id, Ingredient.on_hand_qty)
+        .where(Ingredient.id.in_(ingredient_ids))
+        .order_by(Ingredient.id.asc())
+        .with_for_update()
+    ).all()
+    for ingredient_id, on_hand_qty in on_hand_rows:
+        if on_hand_qty - qty_by_ingredient[ingredient_id] < 0:
+            raise RuntimeError(f"Negative inventory for ingredient_id={ingredient_id} during commit")
+
+    consumed_qty = case(qty_by_ingredient, value=Ingredient.id, else_=0)
+    session.execute(
+        update(Ingredient)
+        .where(Ingredient.id.in_(ingredient_ids))
+        .values(
+            on_hand_qty=Ingredient.on_hand_qty - consumed_qty,
+            reserved_qty=Ingredient.reserved_qty - consumed_qty,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return ingredient_ids
+
+
+def reconcile_reserved_qty(session: Session, *, repair: bool = False) -> dict[int, tuple[int, int]]:
+    """Recompute ``reserved_qty`` from reservation rows.
+
+    Returns ``{ingredient_id: (stored_qty, recomputed_qty)}`` for every
+    mismatch and, when ``repair`` is set, overwrites the stored totals. Run it
+    inside a transaction; ingredient rows are locked for its duration.
+    """
+    ingredients = session.execute(
+        select(Ingredient).order_by(Ingredient.id.asc()).with_for_update()
+    ).scalars().all()
+    rows = session.execute(
+        select(
+            ReservationIngredient.ingredient_id,
+            func.coalesce(func.sum(ReservationIngredient.qty_reserved), 0),
+        )
+        .join(Reservation, Reservation.id == ReservationIngredient.reservation_id)
+        .where(Reservation.status == "active")
+        .group_by(ReservationIngredient.ingredient_id)
+    ).all()
+    recomputed_by_ingredient = {ingredient_id: int(total_qty) for ingredient_id, total_qty in rows}
+
+    mismatches: dict[int, tuple[int, int]] = {}
+    for ingredient in ingredients:
+        recomputed_qty = recomputed_by_ingredient.get(ingredient.id, 0)
+        if ingredient.reserved_qty != recomputed_qty:
+            mismatches[ingredient.id] = (ingredient.reserved_qty, recomputed_qty)
+            if repair:
+                ingredient.reserved_qty = recomputed_qty
+
+    return mismatches
+
+
+@dataclass(frozen=True)
+class _ReservationHold:
+    expires_at: datetime
+    qty_by_ingredient: Mapping[int, int]
+
+
+class AvailabilityLedger:
+    """In-process mirror of ``get_active_reserved_qty_by_ingredient``.
+
+    Holds one entry per active reservation and keeps running totals per
+    ingredient, so reads cost O(ingredients) instead of an aggregate scan.
+    Writers record holds only after their transaction has committed. Holds
+    whose ``expires_at`` has passed drop out on read, matching the SQL filter
+    ``expires_at > now``. The ledger is loaded from the database on first use
+    after ``reset()`` and can be checked against the database with ``verify()``.
+
+    Changes nobody broadcast (holds passing ``expires_at``, a rebuild that
+    replaced live totals) are reported to the change listener with the
+    affected ingredient ids, or ``None`` when any ingredient may have moved.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._loaded = False
+        self._rebuilding = False
+        self._pending_ops: list[tuple[int, _ReservationHold | None]] = []
+        self._holds: dict[int, _ReservationHold] = {}
+        self._reserved_qty_by_ingredient: dict[int, int] = {}
+        self._expiry_heap: list[tuple[datetime, int]] = []
+        self._change_listener: Callable[[set[int] | None], object] | None = None
+
+    def set_change_listener(self, listener: Callable[[set[int] | None], object] | None) -> None:
+        self._change_listener = listener
+
+    def reset(self) -> None:
+        with self._lock:
+            self._clear()
+            self._loaded = False
+            self._rebuilding = False
+            self._pending_ops.clear()
+
+    def rebuild(self, session: Session, now: datetime | None = None) -> None:
+        effective_now = now or _utc_now()
+        with self._lock:
+            was_loaded = self._loaded
+            self._loaded = False
+            self._rebuilding = True
+            self._pending_ops.clear()
+
+        try:
+            rows = session.execute(
+                select(
+                    ReservationIngredient.reservation_id,
+                    ReservationIngredient.ingredient_id,
+                    ReservationIngredient.qty_reserved,
+                    Reservation.expires_at,
+                )
+                .join(Reservation, Reservation.id == ReservationIngredient.reservation_id)
+                .where(
+                    Reservation.status == "active",
+                    Reservation.expires_at > effective_now,
+                )
+            ).all()
+        except Exception:
+            with self._lock:
+                self._rebuilding = False
+                self._pending_ops.clear()
+            raise
+
+        qty_by_reservation: dict[int, dict[int, int]] = {}
+        expires_at_by_reservation: dict[int, datetime] = {}
+        for reservation_id, ingredient_id, qty_reserved, expires_at in rows:
+            qty_by_reservation.setdefault(reservation_id, {})[ingredient_id] = int(qty_reserved)
+            expires_at_by_reservation[reservation_id] = expires_at
+
+        with self._lock:
+            self._clear()
+            for reservation_id, qty_by_ingredient in qty_by_reservation.items():
+                self._add_hold(
+                    reservation_id,
+                    _ReservationHold(
+                        expires_at=expires_at_by_reservation[reservation_id],
+                        qty_by_ingredient=qty_by_ingredient,
+                    ),
+                )
+            # Replay writes that committed while the snapshot was being read.
+            for reservation_id, hold in self._pending_ops:
+                self._apply(reservation_id, hold)
+            self._pending_ops.clear()
+            self._rebuilding = False
+            self._loaded = True
+
+        logger.info("availability_ledger rebuilt reservation_count=%s", len(qty_by_reservation))
+        # The first load after reset() has nothing cached against it.
+        if was_loaded:
+            self._notify_change(None)
+
+    def record_hold(
+        self,
+        reservation_id: int,
+        expires_at: datetime,
+        qty_by_ingredient: Mapping[int, int],
+    ) -> None:
+        hold = _ReservationHold(expires_at=expires_at, qty_by_ingredient=dict(qty_by_ingredient))
+        with self._lock:
+            self._record(reservation_id, hold)
+
+    def drop_holds(self, reservation_ids: Iterable[int]) -> None:
+        with self._lock:
+            for reservation_id in reservation_ids:
+                self._record(reservation_id, None)
+
+    def refresh_ingredients(
+        self,
+        session: Session,
+        ingredient_ids: Iterable[int],
+        now: datetime | None = None,
+    ) -> None:
+        """Reload every hold touching ``ingredient_ids`` from the database.
+
+        Used when another process changed reservations: holds the database
+        no longer has are dropped and the rest are replaced with fresh rows.
+        """
+        effective_now = now or _utc_now()
+        ingredient_id_list = sorted(set(ingredient_ids))
+        if not ingredient_id_list:
+            return
+
+        touching_reservations = (
+            select(ReservationIngredient.reservation_id)
+            .where(ReservationIngredient.ingredient_id.in_(ingredient_id_list))
+            .scalar_subquery()
+        )
+        rows = session.execute(
+            select(
+                ReservationIngredient.reservation_id,
+                ReservationIngredient.ingredient_id,
+                ReservationIngredient.qty_reserved,
+                Reservation.expires_at,
+            )
+            .join(Reservation, Reservation.id == ReservationIngredient.reservation_id)
+            .where(
+                Reservation.id.in_(touching_reservations),
+                Reservation.status == "active",
+                Reservation.expires_at > effective_now,
+            )
+        ).all()
+
+        qty_by_reservation: dict[int, dict[int, int]] = {}
+        expires_at_by_reservation: dict[int, datetime] = {}
+        for reservation_id, ingredient_id, qty_reserved, expires_at in rows:
+            qty_by_reservation.setdefault(reservation_id, {})[ingredient_id] = int(qty_reserved)
+            expires_at_by_reservation[reservation_id] = expires_at
+
+        wanted = set(ingredient_id_list)
+        with self._lock:
+            stale_reservation_ids = [
+                reservation_id
+                for reservation_id, hold in self._holds.items()
+                if reservation_id not in qty_by_reservation and wanted.intersection(hold.qty_by_ingredient)
+            ]
+            for reservation_id in stale_reservation_ids:
+                self._record(reservation_id, None)
+            for reservation_id, qty_by_ingredient in qty_by_reservation.items():
+                self._record(
+                    reservation_id,
+                    _ReservationHold(
+                        expires_at=expires_at_by_reservation[reservation_id],
+                        qty_by_ingredient=qty_by_ingredient,
+                    ),
+                )
+
+    def reserved_qty_by_ingredient(
+        self,
+        session: Session,
+        now: datetime | None = None,
+    ) -> dict[int, int]:
+        effective_now = now or _utc_now()
+        with self._lock:
+            loaded = self._loaded
+        if not loaded:
+            self.rebuild(session, now=effective_now)
+
+        with self._lock:
+            expired_ingredient_ids = self._prune_expired(effective_now)
+            reserved_qty_by_ingredient = dict(self._reserved_qty_by_ingredient)
+        if expired_ingredient_ids:
+            self._notify_change(expired_ingredient_ids)
+        return reserved_qty_by_ingredient
+
+    def prune_expired(self, now: datetime | None = None) -> set[int]:
+        """Drop holds past ``expires_at`` and return the ingredient ids they touched."""
+        effective_now = now or _utc_now()
+        with self._lock:
+            expired_ingredient_ids = self._prune_expired(effective_now)
+        if expired_ingredient_ids:
+            self._notify_change(expired_ingredient_ids)
+        return expired_ingredient_ids
+
+    def verify(self, session: Session, now: datetime | None = None) -> dict[int, tuple[int, int]]:
+        """Return ``{ingredient_id: (ledger_qty, database_qty)}`` for every mismatch."""
+        effective_now = now or _utc_now()
+        expected = get_active_reserved_qty_by_ingredient(session, now=effective_now)
+        actual = self.reserved_qty_by_ingredient(session, now=effective_now)
+
+        mismatches: dict[int, tuple[int, int]] = {}
+        for ingredient_id in sorted(set(expected).union(actual)):
+            ledger_qty = actual.get(ingredient_id, 0)
+            database_qty = expected.get(ingredient_id, 0)
+            if ledger_qty != database_qty:
+                mismatches[ingredient_id] = (ledger_qty, database_qty)
+        return mismatches
+
+    def _record(self, reservation_id: int, hold: _ReservationHold | None) -> None:
+        if self._loaded:
+            self._apply(reservation_id, hold)
+        elif self._rebuilding:
+            self._pending_ops.append((reservation_id, hold))
+        # Otherwise the next read rebuilds from the database, which already
+        # includes this committed change.
+
+    def _notify_change(self, ingredient_ids: set[int] | None) -> None:
+        if self._change_listener is not None:
+            self._change_listener(ingredient_ids)
+
+    def _apply(self, reservation_id: int, hold: _ReservationHold | None) -> None:
+        self._remove_hold(reservation_id)
+        if hold is not None:
+            self._add_hold(reservation_id, hold)
+
+    def _clear(self) -> None:
+        self._holds.clear()
+        self._reserved_qty_by_ingredient.clear()
+        self._expiry_heap.clear()
+
+    def _add_hold(self, reservation_id: int, hold: _ReservationHold) -> None:
+        self._holds[reservation_id] = hold
+        heapq.heappush(self._expiry_heap, (hold.expires_at, reservation_id))
+        for ingredient_id, qty in hold.qty_by_ingredient.items():
+            self._reserved_qty_by_ingredient[ingredient_id] = (
+                self._reserved_qty_by_ingredient.get(ingredient_id, 0) + qty
+            )
+
+    def _remove_hold(self, reservation_id: int) -> None:
+        hold = self._holds.pop(reservation_id, None)
+        if hold is None:
+            return
+        for ingredient_id, qty in hold.qty_by_ingredient.items():
+            remaining_qty = self._reserved_qty_by_ingredient.get(ingredient_id, 0) - qty
+            if remaining_qty > 0:
+                self._reserved_qty_by_ingredient[ingredient_id] = remaining_qty
+            else:
+                self._reserved_qty_by_ingredient.pop(ingredient_id, None)
+
+    def _prune_expired(self, now: datetime) -> set[int]:
+        expired_ingredient_ids: set[int] = set()
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, reservation_id = heapq.heappop(self._expiry_heap)
+            hold = self._holds.get(reservation_id)
+            # Heap entries are not removed on update; skip superseded ones.
+            if hold is not None and hold.expires_at == expires_at:
+                expired_ingredient_ids.update(hold.qty_by_ingredient)
+                self._remove_hold(reservation_id)
+        return expired_ingredient_ids
+
+
+availability_ledger = AvailabilityLedger()
+
+
 def ingredient_available_qty(ingredient: Ingredient, active_reserved_qty: int) -> int:
     if ingredient.is_out:
         return 0
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+import logging
+from typing import Any
+
+from eventlet.semaphore import Semaphore
+from sqlalchemy import select
+
+from app import socketio
+from app.availability import availability_ledger, serialize_ingredients
+from app.models import Ingredient
+from app.recipe_matrix import recipe_matrix_cache
+from config import settings
+from db import SessionLocal
+
+logger = logging.getLogger("kitchensync.availability_patch")
+
+AVAILABILITY_PATCH_EVENT = "availabilityPatch"
+AVAILABILITY_ROOM_PREFIX = "availability:"
+
+# Builds and emits happen under one lock so patches leave this process in the
+# order their rows were read and a later patch never carries older rows. A
+# green semaphore: a greenlet waiting on it parks instead of blocking the hub.
+_patch_lock = Semaphore()
+
+
+def availability_room(room: str) -> str:
+    """Room of the subscribers among the members of audience room ``room``."""
+    return f"{AVAILABILITY_ROOM_PREFIX}{room}"
+
+
+def is_availability_room(room: str) -> bool:
+    return room.startswith(AVAILABILITY_ROOM_PREFIX)
+
+
+def _has_subscribers(patch_rooms: list[str]) -> bool:
+    if settings.socketio_message_queue:
+        # Subscribers on other instances are not visible from here.
+        return True
+    participants = socketio.server.manager.get_participants("/", patch_rooms)
+    return next(participants, None) is not None
+
+
+def build_changed_menu_rows(changed_ingredient_ids: Iterable[int]) -> list[dict[str, Any]]:
+    """Menu rows whose recipe uses any of ``changed_ingredient_ids``."""
+    with SessionLocal() as session:
+        recipe_matrix = recipe_matrix_cache.get(session)
+        rows = recipe_matrix.rows_for_ingredients(changed_ingredient_ids)
+        if not rows:
+            return []
+        ingredients = session.execute(
+            select(Ingredient).where(Ingredient.id.in_(recipe_matrix.ingredient_ids_for_rows(rows)))
+        ).scalars().all()
+        active_reserved_qty_by_ingredient = availability_ledger.reserved_qty_by_ingredient(session)
+
+    ingredients_by_id = {ingredient.id: ingredient for ingredient in ingredients}
+    return recipe_matrix.evaluate(ingredients_by_id, active_reserved_qty_by_ingredient, rows=rows)
+
+
+def build_changed_ingredient_rows(changed_ingredient_ids: Iterable[int]) -> list[dict[str, Any]]:
+    with SessionLocal() as session:
+        ingredients = session.execute(
+            select(Ingredient)
+            .where(Ingredient.id.in_(sorted(changed_ingredient_ids)))
+            .order_by(Ingredient.id.asc())
+        ).scalars().all()
+        active_reserved_qty_by_ingredient = availability_ledger.reserved_qty_by_ingredient(session)
+
+    return serialize_ingredients(ingredients, active_reserved_qty_by_ingredient)
+
+
+def build_availability_patch(state_key: str, ingredient_ids: list[int] | None) -> dict[str, Any]:
+    """Rows a subscriber needs to catch up to ``state_key``.
+
+    Rows carry absolute values, not increments, so applying a patch twice is
+    harmless. ``full`` tells the client to refetch instead: the change could
+    not be narrowed to ingredients.
+    """
+    if ingredient_ids is None:
+        return {"version": state_key, "full": True, "ingredients": [], "menu": []}
+    return {
+        "version": state_key,
+        "full": False,
+        "ingredients": build_changed_ingredient_rows(ingredient_ids),
+        "menu": build_changed_menu_rows(ingredient_ids),
+    }
+
+
+def emit_availability_patch(
+    state_key: str,
+    ingredient_ids: list[int] | None,
+    *,
+    rooms: tuple[str, ...],
+) -> None:
+    """Compute one patch and send it to the subscribers among ``rooms``.
+
+    ``rooms`` is the audience of the state change, so a patch never reaches a
+    socket its ``stateChanged`` skipped. Nothing is built when none of them
+    subscribed. Called after the write has committed, so a failure here is
+    logged and degraded to a ``full`` patch rather than failing the request.
+    """
+    if ingredient_ids is not None and not ingredient_ids:
+        return
+    patch_rooms = [availability_room(room) for room in rooms]
+    if not _has_subscribers(patch_rooms):
+        return
+
+    with _patch_lock:
+        try:
+            patch = build_availability_patch(state_key, ingredient_ids)
+        except Exception:
+            logger.exception("availability_patch build failed version=%s", state_key)
+            patch = build_availability_patch(state_key, None)
+        socketio.emit(AVAILABILITY_PATCH_EVENT, patch, to=patch_rooms)
+
+    logger.debug(
+        "availability_patch emitted version=%s full=%s ingredient_count=%s menu_count=%s",
+        state_key,
+        patch["full"],
+        len(patch["ingredients"]),
+        len(patch["menu"]),
+    )
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+import logging
+from threading import Lock
+
+from app import socketio
+from app.metrics import increment_counter
+
+logger = logging.getLogger("kitchensync.coalescing_emitter")
+
+
+class CoalescingEmitter:
+    """Collapses change notifications that land within one window.
+
+    The first ``submit`` of a window schedules a background flush after
+    ``window_seconds``; later submits only merge into the pending change set,
+    so callers never wait on fanout. A ``None`` id set means "anything may
+    have changed" and absorbs everything merged with it. With a window of
+    zero every submit is flushed inline.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush: Callable[[list[int] | None], None],
+        *,
+        window_seconds: float,
+    ) -> None:
+        self._name = name
+        self._flush = flush
+        self._window_seconds = window_seconds
+        self._lock = Lock()
+        self._has_pending = False
+        self._pending_ids: set[int] | None = set()
+        self._flush_scheduled = False
+
+    def submit(self, ingredient_ids: Iterable[int] | None) -> None:
+        increment_counter(f"{self._name}.raw")
+        with self._lock:
+            if ingredient_ids is None or self._pending_ids is None:
+                self._pending_ids = None
+            else:
+                self._pending_ids.update(ingredient_ids)
+            self._has_pending = True
+            if self._flush_scheduled:
+                return
+            if self._window_seconds > 0:
+                self._flush_scheduled = True
+
+        if self._window_seconds > 0:
+            socketio.start_background_task(self._flush_after_window)
+        else:
+            self.flush()
+
+    def flush(self) -> bool:
+        """Emit the pending change set now; ``False`` when nothing was pending."""
+        with self._lock:
+            self._flush_scheduled = False
+            if not self._has_pending:
+                return False
+            pending_ids = None if self._pending_ids is None else sorted(self._pending_ids)
+            self._has_pending = False
+            self._pending_ids = set()
+
+        self._flush(pending_ids)
+        increment_counter(f"{self._name}.emitted")
+        return True
+
+    def discard(self) -> None:
+        with self._lock:
+            self._has_pending = False
+            self._pending_ids = set()
+
+    def _flush_after_window(self) -> None:
+        socketio.sleep(self._window_seconds)
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("coalesced flush failed name=%s", self._name)
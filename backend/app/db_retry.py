@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from functools import wraps
+import logging
+import random
+from time import monotonic
+from typing import Any, TypeVar
+
+from sqlalchemy.exc import DBAPIError
+
+from app import socketio
+from app.metrics import increment_counter
+from config import settings
+
+T = TypeVar("T")
+
+# serialization_failure, deadlock_detected, lock_not_available: the
+# transaction was rolled back as a whole and can simply run again.
+RETRYABLE_SQLSTATES = frozenset({"40001", "40P01", "55P03"})
+
+logger = logging.getLogger("kitchensync.db_retry")
+
+
+def _sqlstate(exc: DBAPIError) -> str | None:
+    orig = exc.orig
+    return getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, DBAPIError) and _sqlstate(exc) in RETRYABLE_SQLSTATES
+
+
+def _backoff_seconds(attempt: int) -> float:
+    # Full jitter: uniform over [0, base * 2^attempt], capped by the budget.
+    ceiling = settings.db_retry_base_ms * (2 ** attempt) / 1000
+    return random.uniform(0, min(ceiling, settings.db_retry_budget_ms / 1000))
+
+
+def run_with_retry(name: str, body: Callable[[], T]) -> T:
+    """Run ``body``, rerunning it after a retryable SQLSTATE.
+
+    ``body`` must own its whole transaction so a rerun starts clean. Stops
+    after ``DB_RETRY_MAX_ATTEMPTS`` attempts or once the next backoff would
+    overrun ``DB_RETRY_BUDGET_MS``, re-raising the last error.
+    """
+    started = monotonic()
+    attempt = 0
+    while True:
+        try:
+            return body()
+        except DBAPIError as exc:
+            if not is_retryable(exc):
+                raise
+            attempt += 1
+            delay = _backoff_seconds(attempt)
+            elapsed = monotonic() - started
+            if (
+                attempt >= settings.db_retry_max_attempts
+                or elapsed + delay > settings.db_retry_budget_ms / 1000
+            ):
+                increment_counter(f"db_retry.{name}.exhausted")
+                logger.warning(
+                    "db_retry exhausted name=%s attempts=%s sqlstate=%s", name, attempt, _sqlstate(exc)
+                )
+                raise
+            increment_counter(f"db_retry.{name}.retries")
+            logger.info(
+                "db_retry retrying name=%s attempt=%s sqlstate=%s delay_ms=%.1f",
+                name,
+                attempt,
+                _sqlstate(exc),
+                delay * 1000,
+            )
+            socketio.sleep(delay)
+
+
+def retry_transient_db_errors(handler: Callable[..., Any]) -> Callable[..., Any]:
+    """Rerun a view whose transaction hit a retryable SQLSTATE.
+
+    Views only publish ledger updates and ``stateChanged`` after commit, so
+    rerunning the whole view repeats nothing the client can observe. Apply
+    below ``idempotent`` so retries keep the same claim.
+    """
+
+    @wraps(handler)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return run_with_retry(handler.__name__, lambda: handler(*args, **kwargs))
+
+    return wrapper
@@ -1,13 +1,51 @@
 import logging
 
-from flask_socketio import emit
+from flask import request
+from flask_socketio import ConnectionRefusedError, emit, join_room, leave_room, rooms
 
 from app import socketio
+from app.auth import read_access_token_claims
+from app.availability_patch import availability_room, is_availability_room
+from app.socket_rooms import SOCKET_VIEWS, role_room, view_room
 
 logger = logging.getLogger("kitchensync.events")
 
 
+@socketio.on("connect")
+def handle_connect(auth: dict | None = None) -> None:
+    auth = auth if isinstance(auth, dict) else {}
+    claims = read_access_token_claims(auth.get("token"))
+    if claims is None:
+        logger.warning("socket connect rejected invalid_token sid=%s", request.sid)
+        raise ConnectionRefusedError("unauthorized")
+
+    role = claims.get("role")
+    join_room(role_room(role))
+    view = auth.get("view")
+    if view in SOCKET_VIEWS:
+        join_room(view_room(view))
+    logger.debug("socket connected sid=%s role=%s view=%s", request.sid, role, view)
+
+
 @socketio.on("ping")
 def handle_ping(data: dict | None = None) -> None:
     logger.debug("socket ping received")
     emit("pong", data or {})
+
+
+@socketio.on("subscribeAvailability")
+def handle_subscribe_availability(data: dict | None = None) -> None:
+    # One availability room per role/view room, so patches follow the same
+    # audiences as stateChanged.
+    for room in rooms():
+        if room != request.sid and not is_availability_room(room):
+            join_room(availability_room(room))
+    logger.debug("socket availability subscribed")
+
+
+@socketio.on("unsubscribeAvailability")
+def handle_unsubscribe_availability(data: dict | None = None) -> None:
+    for room in rooms():
+        if is_availability_room(room):
+            leave_room(room)
+    logger.debug("socket availability unsubscribed")
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import datetime
+import heapq
+import logging
+from threading import Lock
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Reservation
+
+logger = logging.getLogger("kitchensync.expiration_schedule")
+
+
+class ExpirationSchedule:
+    """Min-heap of upcoming ``expires_at`` values for active reservations.
+
+    Lets the in-process expiration job expire exactly the reservations that
+    are due instead of scanning the table on a fixed interval. Entries are
+    cancelled lazily: a heap entry counts only while it matches the latest
+    ``expires_at`` recorded for its reservation. Writers call ``schedule``
+    and ``discard`` after commit; both are no-ops until ``load`` has run, so
+    processes without the job keep nothing.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._enabled = False
+        self._heap: list[tuple[datetime, int]] = []
+        self._expires_at_by_id: dict[int, datetime] = {}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._enabled = False
+            self._heap.clear()
+            self._expires_at_by_id.clear()
+
+    def load(self, session: Session) -> int:
+        rows = session.execute(
+            select(Reservation.id, Reservation.expires_at).where(Reservation.status == "active")
+        ).all()
+        with self._lock:
+            self._expires_at_by_id = {reservation_id: expires_at for reservation_id, expires_at in rows}
+            self._heap = [(expires_at, reservation_id) for reservation_id, expires_at in rows]
+            heapq.heapify(self._heap)
+            self._enabled = True
+        logger.info("expiration_schedule loaded reservation_count=%s", len(rows))
+        return len(rows)
+
+    def schedule(self, reservation_id: int, expires_at: datetime) -> None:
+        with self._lock:
+            if not self._enabled:
+                return
+            self._expires_at_by_id[reservation_id] = expires_at
+            heapq.heappush(self._heap, (expires_at, reservation_id))
+
+    def discard(self, reservation_ids: Iterable[int]) -> None:
+        with self._lock:
+            for reservation_id in reservation_ids:
+                self._expires_at_by_id.pop(reservation_id, None)
+
+    def _drop_stale_head(self) -> None:
+        while self._heap:
+            expires_at, reservation_id = self._heap[0]
+            if self._expires_at_by_id.get(reservation_id) == expires_at:
+                return
+            heapq.heappop(self._heap)
+
+    def next_expires_at(self) -> datetime | None:
+        with self._lock:
+            self._drop_stale_head()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> list[int]:
+        """Remove and return reservations whose ``expires_at`` is before ``now``."""
+        due: list[int] = []
+        with self._lock:
+            self._drop_stale_head()
+            while self._heap and self._heap[0][0] < now:
+                _, reservation_id = heapq.heappop(self._heap)
+                del self._expires_at_by_id[reservation_id]
+                due.append(reservation_id)
+                self._drop_stale_head()
+        return sorted(due)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._expires_at_by_id)
+
+
+expiration_schedule = ExpirationSchedule()
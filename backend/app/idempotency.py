@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+import hashlib
+import logging
+from threading import Lock
+from typing import Any
+
+from flask import Response, g, make_response, request
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from app.error_responses import error_response
+from app.models import IdempotencyKey
+from config import settings
+from db import SessionLocal
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+# How long an unfinished claim blocks its key; a process that dies
+# mid-request must not lock the client out for the whole TTL.
+CLAIM_TIMEOUT_SECONDS = 60
+
+logger = logging.getLogger("kitchensync.idempotency")
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    body: str
+    expires_at: datetime
+
+
+class IdempotencyCache:
+    """Bounded LRU of completed responses keyed by ``(user_id, key)``.
+
+    Sits in front of the ``idempotency_keys`` table so retries that land on
+    the same process replay without a database round trip.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self._lock = Lock()
+        self._max_entries = max_entries
+        self._entries: OrderedDict[tuple[int, str], StoredResponse] = OrderedDict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, user_id: int, key: str, now: datetime) -> StoredResponse | None:
+        with self._lock:
+            stored = self._entries.get((user_id, key))
+            if stored is None:
+                return None
+            if stored.expires_at <= now:
+                del self._entries[(user_id, key)]
+                return None
+            self._entries.move_to_end((user_id, key))
+            return stored
+
+    def put(self, user_id: int, key: str, stored: StoredResponse) -> None:
+        if self._max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[(user_id, key)] = stored
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+idempotency_cache = IdempotencyCache(settings.idempotency_cache_size)
+
+
+def _read_user_id() -> int | None:
+    claims = getattr(g, "jwt_claims", {})
+    try:
+        return int(claims.get("sub"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _request_hash() -> str:
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode("utf-8"))
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _claim_key(
+    user_id: int, key: str, request_hash: str, now: datetime
+) -> tuple[bool, StoredResponse | None]:
+    """Claim ``key`` for this request, or return the response already stored.
+
+    Returns ``(True, None)`` when claimed, ``(False, stored)`` for a completed
+    key and ``(False, None)`` while another request holds the claim.
+    """
+    try:
+        with SessionLocal() as session, session.begin():
+            row = session.execute(
+                select(IdempotencyKey).where(
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.key == key,
+                )
+            ).scalar_one_or_none()
+            if row is not None and row.expires_at <= now:
+                session.delete(row)
+                session.flush()
+                row = None
+
+            if row is None:
+                session.add(
+                    IdempotencyKey(
+                        user_id=user_id,
+                        key=key,
+                        request_hash=request_hash,
+                        expires_at=now + timedelta(seconds=CLAIM_TIMEOUT_SECONDS),
+                    )
+                )
+                session.flush()
+                return True, None
+
+            if row.status_code is None:
+                return False, None
+            return False, StoredResponse(
+                request_hash=row.request_hash,
+                status_code=row.status_code,
+                body=row.response_body or "",
+                expires_at=row.expires_at,
+            )
+    except IntegrityError:
+        # A concurrent retry inserted the claim first.
+        return False, None
+
+
+def _complete_key(user_id: int, key: str, stored: StoredResponse) -> None:
+    with SessionLocal() as session, session.begin():
+        row = session.execute(
+            select(IdempotencyKey).where(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.key == key,
+            )
+        ).scalar_one_or_none()
+        if row is None:
+            return
+        row.status_code = stored.status_code
+        row.response_body = stored.body
+        row.expires_at = stored.expires_at
+
+
+def _drop_claim(user_id: int, key: str) -> None:
+    with SessionLocal() as session, session.begin():
+        session.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status_code.is_(None),
+            )
+        )
+
+
+def _replay(stored: StoredResponse) -> Response:
+    response = Response(stored.body, status=stored.status_code, mimetype="application/json")
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def idempotent(handler: Callable[..., Any]) -> Callable[..., Any]:
+    """Replay the stored response for a repeated ``Idempotency-Key``.
+
+    Apply below ``require_any_role`` so the caller is known. Requests
+    without the header run unchanged. Keys are scoped per user and must be
+    reused with the same method, path and body; 5xx responses are not
+    stored so the client can retry them.
+    """
+
+    @wraps(handler)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if key is None:
+            return handler(*args, **kwargs)
+        if not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return error_response(
+                f"{IDEMPOTENCY_KEY_HEADER} must be 1-{MAX_IDEMPOTENCY_KEY_LENGTH} characters",
+                400,
+                code="IDEMPOTENCY_KEY_INVALID",
+            )
+
+        user_id = _read_user_id()
+        if user_id is None:
+            return handler(*args, **kwargs)
+
+        now = _utc_now()
+        request_hash = _request_hash()
+        stored = idempotency_cache.get(user_id, key, now)
+        claimed = False
+        if stored is None:
+            claimed, stored = _claim_key(user_id, key, request_hash, now)
+
+        if stored is not None:
+            if stored.request_hash != request_hash:
+                logger.info("idempotency key_reused user_id=%s", user_id)
+                return error_response(
+                    f"{IDEMPOTENCY_KEY_HEADER} was already used for a different request",
+                    422,
+                    code="IDEMPOTENCY_KEY_REUSED",
+                )
+            idempotency_cache.put(user_id, key, stored)
+            logger.info("idempotency replay user_id=%s status=%s", user_id, stored.status_code)
+            return _replay(stored)
+
+        if not claimed:
+            return error_response(
+                f"A request with this {IDEMPOTENCY_KEY_HEADER} is still in progress",
+                409,
+                code="IDEMPOTENCY_KEY_IN_PROGRESS",
+            )
+
+        try:
+            response = make_response(handler(*args, **kwargs))
+        except Exception:
+            _drop_claim(user_id, key)
+            raise
+
+        if response.status_code >= 500:
+            _drop_claim(user_id, key)
+            return response
+
+        stored = StoredResponse(
+            request_hash=request_hash,
+            status_code=response.status_code,
+            body=response.get_data(as_text=True),
+            expires_at=now + timedelta(seconds=settings.idempotency_ttl_seconds),
+        )
+        _complete_key(user_id, key, stored)
+        idempotency_cache.put(user_id, key, stored)
+        return response
+
+    return wrapper
+
+
+def purge_expired_idempotency_keys(now: datetime | None = None) -> int:
+    with SessionLocal() as session, session.begin():
+        result = session.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= (now or _utc_now()))
+        )
+    return result.rowcount or 0
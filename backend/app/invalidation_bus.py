@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import json
+import logging
+from threading import Lock
+from typing import Any
+from uuid import uuid4
+
+from sqlalchemy import select as sql_select, text, update
+from sqlalchemy.exc import IntegrityError
+
+from app import socketio
+from app.availability import availability_ledger
+from app.models import CacheVersion
+from app.runtime_reservation_ttl import set_runtime_ttl_seconds
+from app.runtime_reservation_warning import set_runtime_warning_threshold_seconds
+from app.socketio_postgres import connect_listener, libpq_dsn, wait_readable
+from app.state_changes import notify_state_changed, record_menu_change, record_state_change
+from config import settings
+from db import SessionLocal
+
+logger = logging.getLogger("kitchensync.invalidation_bus")
+
+TOPIC_MENU = "menu"
+TOPIC_INGREDIENTS = "ingredients"
+TOPIC_RUNTIME_SETTINGS = "runtime_settings"
+TOPICS = (TOPIC_MENU, TOPIC_INGREDIENTS, TOPIC_RUNTIME_SETTINGS)
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+MAX_NOTIFY_PAYLOAD_BYTES = 7900
+
+# Identifies this process in published messages; its own messages only
+# advance the seen versions because its caches were updated locally.
+_origin_id = uuid4().hex
+_seen_lock = Lock()
+_seen_versions: dict[str, int] = {}
+_bus_started = False
+
+
+def _publish_once(
+    topic: str,
+    ingredient_ids: list[int] | None,
+    payload: dict[str, Any] | None,
+) -> int:
+    encoded_payload = None if payload is None else json.dumps(payload)
+    with SessionLocal() as session, session.begin():
+        values: dict[str, Any] = {"version": CacheVersion.version + 1}
+        if encoded_payload is not None:
+            values["payload"] = encoded_payload
+        version = session.execute(
+            update(CacheVersion)
+            .where(CacheVersion.name == topic)
+            .values(**values)
+            .returning(CacheVersion.version)
+        ).scalar_one_or_none()
+        if version is None:
+            session.add(CacheVersion(name=topic, version=1, payload=encoded_payload))
+            session.flush()
+            version = 1
+
+        if session.get_bind().dialect.name == "postgresql":
+            message = {
+                "origin": _origin_id,
+                "topic": topic,
+                "version": version,
+                "ingredient_ids": ingredient_ids,
+                "payload": payload,
+            }
+            encoded_message = json.dumps(message)
+            if len(encoded_message) >= MAX_NOTIFY_PAYLOAD_BYTES:
+                # Too many ids to list; receivers evict every ingredient.
+                encoded_message = json.dumps({**message, "ingredient_ids": None})
+            # Delivered on commit, together with the version bump.
+            session.execute(
+                text("SELECT pg_notify(:channel, :message)"),
+                {"channel": settings.invalidation_channel, "message": encoded_message},
+            )
+        return version
+
+
+def publish_invalidation(
+    topic: str,
+    *,
+    ingredient_ids: list[int] | None = None,
+    payload: dict[str, Any] | None = None,
+) -> int:
+    """Bump ``topic`` in ``cache_versions`` and tell other processes.
+
+    The version bump and ``NOTIFY`` share one transaction, so a receiver
+    never sees one without the other. ``ingredient_ids`` narrows an
+    ``ingredients`` invalidation; ``None`` means any ingredient.
+    """
+    try:
+        version = _publish_once(topic, ingredient_ids, payload)
+    except IntegrityError:
+        # Another process created the topic row first; retrying updates it.
+        version = _publish_once(topic, ingredient_ids, payload)
+
+    with _seen_lock:
+        # Only skip ahead when nothing from other processes is outstanding.
+        if _seen_versions.get(topic, 0) == version - 1:
+            _seen_versions[topic] = version
+    logger.debug("invalidation published topic=%s version=%s", topic, version)
+    return version
+
+
+def publish_invalidation_async(topic: str, **kwargs: Any) -> None:
+    """``publish_invalidation`` off the request path when the bus is enabled."""
+    if not settings.enable_invalidation_bus:
+        return
+    socketio.start_background_task(_publish_logged, topic, **kwargs)
+
+
+def _publish_logged(topic: str, **kwargs: Any) -> None:
+    try:
+        publish_invalidation(topic, **kwargs)
+    except Exception:
+        # Peers still catch up through the version-table poll.
+        logger.exception("invalidation publish failed topic=%s", topic)
+
+
+def _refresh_state(ingredient_ids: list[int] | None) -> None:
+    if settings.socketio_message_queue:
+        # The writer's broadcast already reached this process's clients.
+        record_state_change(ingredient_ids)
+    else:
+        notify_state_changed(ingredient_ids, publish=False)
+
+
+def _evict(topic: str, ingredient_ids: list[int] | None, payload: dict[str, Any] | None) -> None:
+    if topic == TOPIC_MENU:
+        record_menu_change()
+        _refresh_state(None)
+    elif topic == TOPIC_INGREDIENTS:
+        if ingredient_ids is None:
+            availability_ledger.reset()
+        else:
+            with SessionLocal() as session:
+                availability_ledger.refresh_ingredients(session, ingredient_ids)
+        _refresh_state(ingredient_ids)
+    elif topic == TOPIC_RUNTIME_SETTINGS and payload is not None:
+        set_runtime_ttl_seconds(payload["ttl_seconds"])
+        set_runtime_warning_threshold_seconds(payload["warning_threshold_seconds"])
+        _refresh_state([])
+
+
+def apply_invalidation(message: dict[str, Any]) -> None:
+    """Evict what ``message`` says changed in another process.
+
+    A version gap means messages were missed, so the whole topic is evicted
+    instead of just the named ingredients.
+    """
+    topic = message.get("topic")
+    version = message.get("version")
+    if topic not in TOPICS or not isinstance(version, int):
+        logger.warning("invalidation ignored malformed message topic=%s", topic)
+        return
+
+    with _seen_lock:
+        seen_version = _seen_versions.get(topic, 0)
+        if version <= seen_version:
+            return
+        _seen_versions[topic] = version
+    if message.get("origin") == _origin_id and version == seen_version + 1:
+        return
+
+    ingredient_ids = message.get("ingredient_ids") if version == seen_version + 1 else None
+    logger.info(
+        "invalidation received topic=%s version=%s gap=%s",
+        topic,
+        version,
+        version - seen_version - 1,
+    )
+    _evict(topic, ingredient_ids, message.get("payload"))
+
+
+def check_versions() -> list[str]:
+    """Fallback for missed messages: evict topics whose version moved unseen."""
+    with SessionLocal() as session:
+        rows = session.execute(sql_select(CacheVersion)).scalars().all()
+
+    evicted: list[str] = []
+    for row in rows:
+        if row.name not in TOPICS:
+            continue
+        with _seen_lock:
+            if row.version <= _seen_versions.get(row.name, 0):
+                continue
+            _seen_versions[row.name] = row.version
+        payload = json.loads(row.payload) if row.payload else None
+        logger.warning("invalidation missed topic=%s version=%s", row.name, row.version)
+        _evict(row.name, None, payload)
+        evicted.append(row.name)
+    return evicted
+
+
+def reset_invalidation_state() -> None:
+    with _seen_lock:
+        _seen_versions.clear()
+
+
+def sync_seen_versions() -> None:
+    """Adopt the current versions at startup, including runtime settings."""
+    with SessionLocal() as session:
+        rows = session.execute(sql_select(CacheVersion)).scalars().all()
+
+    with _seen_lock:
+        _seen_versions.clear()
+        for row in rows:
+            _seen_versions[row.name] = row.version
+    for row in rows:
+        if row.name == TOPIC_RUNTIME_SETTINGS and row.payload:
+            payload = json.loads(row.payload)
+            set_runtime_ttl_seconds(payload["ttl_seconds"])
+            set_runtime_warning_threshold_seconds(payload["warning_threshold_seconds"])
+
+
+def _listen_loop() -> None:
+    poll_seconds = settings.invalidation_poll_seconds
+    while True:
+        connection = None
+        try:
+            with SessionLocal() as session:
+                listens = session.get_bind().dialect.name == "postgresql"
+            if listens:
+                # Connects, LISTENs and waits on green select, so the hub keeps running.
+                connection = connect_listener(
+                    libpq_dsn(settings.database_url), settings.invalidation_channel
+                )
+            # Catch anything published before LISTEN took effect.
+            check_versions()
+
+            while True:
+                if connection is None:
+                    socketio.sleep(poll_seconds)
+                    check_versions()
+                    continue
+                if not wait_readable(connection, poll_seconds):
+                    check_versions()
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    apply_invalidation(json.loads(notify.payload))
+        except Exception:
+            logger.exception("invalidation listener failed; restarting")
+            socketio.sleep(poll_seconds)
+        finally:
+            if connection is not None:
+                connection.close()
+
+
+def start_invalidation_bus() -> None:
+    global _bus_started
+
+    if _bus_started or settings.app_env == "test" or not settings.enable_invalidation_bus:
+        logger.debug(
+            "invalidation_bus skipped started=%s enabled=%s",
+            _bus_started,
+            settings.enable_invalidation_bus,
+        )
+        return
+
+    _bus_started = True
+    sync_seen_versions()
+    socketio.start_background_task(_listen_loop)
+    logger.info(
+        "invalidation_bus started channel=%s poll_seconds=%s",
+        settings.invalidation_channel,
+        settings.invalidation_poll_seconds,
+    )
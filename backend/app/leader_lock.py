@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger("kitchensync.leader_lock")
+
+# A bigint advisory key is stored split across classid (high) and objid (low).
+_HELD_BY_THIS_BACKEND = text(
+    """
+    SELECT EXISTS (
+        SELECT 1 FROM pg_locks
+        WHERE locktype = 'advisory'
+          AND objsubid = 1
+          AND granted
+          AND pid = pg_backend_pid()
+          AND ((classid::bigint << 32) | objid::bigint) = :key
+    )
+    """
+)
+
+
+class AdvisoryLeaderLock:
+    """Leadership held as a session-level Postgres advisory lock.
+
+    The lock lives on a dedicated connection, so it is released by Postgres
+    when the holding process exits or its connection drops, and another
+    instance's next ``try_acquire`` takes over. On other databases there is
+    only ever one process, so the caller is always the leader.
+    """
+
+    def __init__(self, engine: Engine, key: int) -> None:
+        self._engine = engine
+        self._key = key
+        self._connection: Connection | None = None
+        self._held = False
+
+    @property
+    def held(self) -> bool:
+        return self._held
+
+    def try_acquire(self) -> bool:
+        if self._held:
+            return True
+        if self._engine.dialect.name != "postgresql":
+            self._held = True
+            return True
+
+        connection = self._engine.connect()
+        # Never hand a connection that may still hold the lock back to the
+        # pool: closing a detached connection closes the session, and with it
+        # the lock.
+        connection.detach()
+        try:
+            acquired = bool(
+                connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self._key}).scalar()
+            )
+            # Session-level lock: it outlives this transaction.
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+
+        self._connection = connection
+        self._held = True
+        logger.info("leader_lock acquired key=%s", self._key)
+        return True
+
+    def still_held(self) -> bool:
+        """Check the lock connection is alive; step down if it is not."""
+        if not self._held:
+            return False
+        if self._connection is None:
+            return True
+        try:
+            # Asks pg_locks rather than pinging, since a silently reconnected
+            # connection would answer a ping without holding the lock.
+            held = bool(self._connection.execute(_HELD_BY_THIS_BACKEND, {"key": self._key}).scalar())
+            self._connection.commit()
+        except Exception:
+            logger.warning("leader_lock connection lost key=%s", self._key, exc_info=True)
+            held = False
+        if not held:
+            self._drop_connection()
+        return held
+
+    def release(self) -> None:
+        if self._connection is not None:
+            try:
+                self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self._key})
+                self._connection.commit()
+            except Exception:
+                logger.warning("leader_lock unlock failed key=%s", self._key, exc_info=True)
+        self._drop_connection()
+
+    def _drop_connection(self) -> None:
+        if self._connection is not None:
+            try:
+                self._connection.invalidate()
+                self._connection.close()
+            except Exception:
+                pass
+        self._connection = None
+        self._held = False
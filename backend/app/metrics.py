@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from threading import Lock
+
+_metrics_lock = Lock()
+_counters: dict[str, int] = {}
+
+
+def increment_counter(name: str, amount: int = 1) -> None:
+    with _metrics_lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def get_counters() -> dict[str, int]:
+    with _metrics_lock:
+        return dict(sorted(_counters.items()))
+
+
+def reset_counters() -> None:
+    with _metrics_lock:
+        _counters.clear()
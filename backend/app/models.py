@@ -2,7 +2,19 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, UniqueConstraint, func
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    func,
+    text,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -33,6 +45,9 @@ class Ingredient(Base):
     on_hand_qty: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     low_stock_threshold_qty: Mapped[int] = mapped_column(Integer, nullable=False, default=5)
     is_out: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    # Sum of qty_reserved over reservations with status "active", maintained in
+    # the same transaction as every reservation status change.
+    reserved_qty: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     recipes: Mapped[list[Recipe]] = relationship(back_populates="ingredient")
     reservation_ingredients: Mapped[list[ReservationIngredient]] = relationship(
@@ -68,6 +83,21 @@ class Recipe(Base):
 
 class Reservation(Base):
     __tablename__ = "reservations"
+    __table_args__ = (
+        # Expiry sweep and the active-hold aggregates only ever read active rows.
+        Index(
+            "ix_reservations_active_expires_at",
+            "expires_at",
+            "id",
+            postgresql_where=text("status = 'active'"),
+        ),
+        # Archival picks settled reservations by age.
+        Index(
+            "ix_reservations_settled_updated_at",
+            "updated_at",
+            postgresql_where=text("status <> 'active'"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -93,6 +123,18 @@ class ReservationIngredient(Base):
             "ingredient_id",
             name="uq_reservation_ingredient",
         ),
+        # Covering indexes so hold aggregates by ingredient or by reservation
+        # are index-only scans.
+        Index(
+            "ix_reservation_ingredients_ingredient_cover",
+            "ingredient_id",
+            postgresql_include=["reservation_id", "qty_reserved"],
+        ),
+        Index(
+            "ix_reservation_ingredients_reservation_cover",
+            "reservation_id",
+            postgresql_include=["ingredient_id", "qty_reserved"],
+        ),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -106,7 +148,16 @@ class ReservationIngredient(Base):
 
 class ReservationItem(Base):
     __tablename__ = "reservation_items"
-    __table_args__ = (UniqueConstraint("reservation_id", "menu_item_id", name="uq_reservation_item"),)
+    __table_args__ = (
+        UniqueConstraint("reservation_id", "menu_item_id", name="uq_reservation_item"),
+        # Covers GET /reservations/:id without visiting the heap.
+        Index(
+            "ix_reservation_items_reservation_cover",
+            "reservation_id",
+            "menu_item_id",
+            postgresql_include=["qty", "notes"],
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     reservation_id: Mapped[int] = mapped_column(ForeignKey("reservations.id"), nullable=False)
@@ -116,3 +167,88 @@ class ReservationItem(Base):
 
     reservation: Mapped[Reservation] = relationship(back_populates="items")
     menu_item: Mapped[MenuItem] = relationship(back_populates="reservation_items")
+
+
+class CacheVersion(Base):
+    """Per-topic version counter behind the cache invalidation bus.
+
+    Every published invalidation bumps its topic's row, so a process that
+    missed the ``NOTIFY`` still sees the version move on its next poll.
+    """
+
+    __tablename__ = "cache_versions"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    # Latest value for topics that carry one (runtime settings), as JSON.
+    payload: Mapped[str | None] = mapped_column(Text, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+
+class IdempotencyKey(Base):
+    """Stored outcome of a reservation write sent with an ``Idempotency-Key``.
+
+    A row with no ``status_code`` is a claim held by a request still running.
+    """
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_user_key"),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    key: Mapped[str] = mapped_column(String(255), nullable=False)
+    # sha256 of method, path and body; a reused key must match it.
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    response_body: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class ReservationHistory(Base):
+    """A settled reservation moved out of ``reservations`` by the archival job.
+
+    History rows keep the original ids but no foreign keys, so archived
+    reservations outlive menu and ingredient edits.
+    """
+
+    __tablename__ = "reservation_history"
+    __table_args__ = (Index("ix_reservation_history_user_id", "user_id", "id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class ReservationItemHistory(Base):
+    __tablename__ = "reservation_item_history"
+    __table_args__ = (Index("ix_reservation_item_history_reservation_id", "reservation_id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    reservation_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    menu_item_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    qty: Mapped[int] = mapped_column(Integer, nullable=False)
+    notes: Mapped[str | None] = mapped_column(String, nullable=True)
+
+
+class ReservationIngredientHistory(Base):
+    __tablename__ = "reservation_ingredient_history"
+    __table_args__ = (Index("ix_reservation_ingredient_history_reservation_id", "reservation_id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    reservation_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    ingredient_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    qty_reserved: Mapped[int] = mapped_column(Integer, nullable=False)
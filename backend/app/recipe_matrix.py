@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from dataclasses import dataclass
+import logging
+from threading import Lock
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.availability import ingredient_available_qty
+from app.models import Ingredient, MenuItem, Recipe
+from app.state_changes import get_menu_version
+
+logger = logging.getLogger("kitchensync.recipe_matrix")
+
+MenuPayload = list[dict[str, int | str | bool | None | list[str]]]
+
+
+@dataclass(frozen=True)
+class RecipeMatrix:
+    """Sparse menu item x ingredient matrix of ``qty_required`` in CSR layout.
+
+    Row ``r`` covers ``columns[row_offsets[r]:row_offsets[r + 1]]``, already
+    ordered by ``(ingredient_id, recipe.id)`` so the first failing entry is
+    the ingredient ``serialize_menu`` would report. Only stock levels change
+    between evaluations, so they are gathered once per ingredient column and
+    every row reduces over precomputed vectors.
+    """
+
+    menu_version: int
+    item_fields: tuple[tuple[int, str, int, str | None, str | None], ...]
+    ingredient_ids: tuple[int, ...]
+    row_offsets: tuple[int, ...]
+    columns: tuple[int, ...]
+    qty_required: tuple[int, ...]
+    ingredient_names_by_row: tuple[tuple[str, ...], ...]
+    reasons_by_column: tuple[str, ...]
+    rows_by_ingredient_id: Mapping[int, tuple[int, ...]]
+    # menu_item_id -> ((ingredient_id, qty_required), ...) for every menu item,
+    # so reservation writes never need to read recipes.
+    bill_of_materials: Mapping[int, tuple[tuple[int, int], ...]]
+
+    @classmethod
+    def compile(
+        cls,
+        menu_items: Sequence[MenuItem],
+        recipes: Sequence[Recipe],
+        ingredients_by_id: Mapping[int, Ingredient],
+        *,
+        menu_version: int = 0,
+    ) -> RecipeMatrix:
+        recipes_by_menu_item: dict[int, list[Recipe]] = {}
+        for recipe in recipes:
+            recipes_by_menu_item.setdefault(recipe.menu_item_id, []).append(recipe)
+
+        ingredient_ids = tuple(sorted({recipe.ingredient_id for recipe in recipes}))
+        column_by_ingredient_id = {
+            ingredient_id: column for column, ingredient_id in enumerate(ingredient_ids)
+        }
+
+        row_offsets = [0]
+        columns: list[int] = []
+        qty_required: list[int] = []
+        ingredient_names_by_row: list[tuple[str, ...]] = []
+        rows_by_ingredient_id: dict[int, list[int]] = {}
+        bill_of_materials: dict[int, tuple[tuple[int, int], ...]] = {}
+        for row, menu_item in enumerate(menu_items):
+            ordered_recipes = sorted(
+                recipes_by_menu_item.get(menu_item.id, []),
+                key=lambda recipe: (recipe.ingredient_id, recipe.id),
+            )
+            for recipe in ordered_recipes:
+                columns.append(column_by_ingredient_id[recipe.ingredient_id])
+                qty_required.append(recipe.qty_required)
+                rows_by_ingredient_id.setdefault(recipe.ingredient_id, []).append(row)
+            row_offsets.append(len(columns))
+            bill_of_materials[menu_item.id] = tuple(
+                (recipe.ingredient_id, recipe.qty_required) for recipe in ordered_recipes
+            )
+            ingredient_names_by_row.append(
+                tuple(ingredients_by_id[recipe.ingredient_id].name for recipe in ordered_recipes)
+            )
+
+        return cls(
+            menu_version=menu_version,
+            item_fields=tuple(
+                (item.id, item.name, item.price_cents, item.category, item.allergens)
+                for item in menu_items
+            ),
+            ingredient_ids=ingredient_ids,
+            row_offsets=tuple(row_offsets),
+            columns=tuple(columns),
+            qty_required=tuple(qty_required),
+            ingredient_names_by_row=tuple(ingredient_names_by_row),
+            reasons_by_column=tuple(
+                f"Insufficient {ingredients_by_id[ingredient_id].name}"
+                for ingredient_id in ingredient_ids
+            ),
+            rows_by_ingredient_id={
+                ingredient_id: tuple(rows) for ingredient_id, rows in rows_by_ingredient_id.items()
+            },
+            bill_of_materials=bill_of_materials,
+        )
+
+    def missing_menu_item_ids(self, menu_item_ids: Iterable[int]) -> list[int]:
+        return sorted(set(menu_item_ids) - self.bill_of_materials.keys())
+
+    def required_qty_by_ingredient(self, qty_by_menu_item: Mapping[int, int]) -> dict[int, int]:
+        """Ingredient totals for an order of known menu items, keyed in id order."""
+        required: dict[int, int] = {}
+        for menu_item_id, qty in qty_by_menu_item.items():
+            for ingredient_id, qty_required in self.bill_of_materials[menu_item_id]:
+                required[ingredient_id] = required.get(ingredient_id, 0) + qty_required * qty
+        return dict(sorted(required.items()))
+
+    def rows_for_ingredients(self, ingredient_ids: Iterable[int]) -> list[int]:
+        """Rows whose recipe uses any of ``ingredient_ids``, in menu order."""
+        rows: set[int] = set()
+        for ingredient_id in ingredient_ids:
+            rows.update(self.rows_by_ingredient_id.get(ingredient_id, ()))
+        return sorted(rows)
+
+    def ingredient_ids_for_rows(self, rows: Iterable[int]) -> set[int]:
+        return {
+            self.ingredient_ids[column]
+            for row in rows
+            for column in self.columns[self.row_offsets[row] : self.row_offsets[row + 1]]
+        }
+
+    def evaluate(
+        self,
+        ingredients_by_id: Mapping[int, Ingredient],
+        active_reserved_qty_by_ingredient: Mapping[int, int],
+        rows: Sequence[int] | None = None,
+    ) -> MenuPayload:
+        """Produce exactly what ``serialize_menu`` returns for the same inputs.
+
+        With ``rows``, only those rows are returned and ``ingredients_by_id``
+        only needs the ingredients they use.
+        """
+        if rows is not None:
+            return self._evaluate_rows(ingredients_by_id, active_reserved_qty_by_ingredient, rows)
+
+        available_by_column: list[int] = []
+        low_stock_by_column: list[bool] = []
+        for ingredient_id in self.ingredient_ids:
+            ingredient = ingredients_by_id[ingredient_id]
+            available_qty = ingredient_available_qty(
+                ingredient, active_reserved_qty_by_ingredient.get(ingredient_id, 0)
+            )
+            available_by_column.append(available_qty)
+            low_stock_by_column.append(available_qty <= ingredient.low_stock_threshold_qty)
+
+        # One pass over the non-zero entries: capacity and shortfall per entry.
+        capacity_by_entry = [
+            available_by_column[column] // qty
+            for column, qty in zip(self.columns, self.qty_required)
+        ]
+        short_by_entry = [
+            available_by_column[column] < qty
+            for column, qty in zip(self.columns, self.qty_required)
+        ]
+
+        payload: MenuPayload = []
+        offsets = self.row_offsets
+        for row, (item_id, name, price_cents, category, allergens) in enumerate(self.item_fields):
+            start = offsets[row]
+            end = offsets[row + 1]
+            reason: str | None = None
+            if start == end:
+                max_qty_available = 0
+                low_stock = False
+            else:
+                max_qty_available = max(0, min(capacity_by_entry[start:end]))
+                low_stock = any(low_stock_by_column[column] for column in self.columns[start:end])
+                if True in short_by_entry[start:end]:
+                    first_short = short_by_entry.index(True, start, end)
+                    reason = self.reasons_by_column[self.columns[first_short]]
+
+            payload.append(
+                {
+                    "id": item_id,
+                    "name": name,
+                    "price_cents": price_cents,
+                    "category": category,
+                    "allergens": allergens,
+                    "available": reason is None,
+                    "low_stock": low_stock,
+                    "reason": reason,
+                    "max_qty_available": max_qty_available,
+                    "ingredients": list(self.ingredient_names_by_row[row]),
+                }
+            )
+
+        return payload
+
+    def _evaluate_rows(
+        self,
+        ingredients_by_id: Mapping[int, Ingredient],
+        active_reserved_qty_by_ingredient: Mapping[int, int],
+        rows: Sequence[int],
+    ) -> MenuPayload:
+        payload: MenuPayload = []
+        for row in rows:
+            item_id, name, price_cents, category, allergens = self.item_fields[row]
+            reason: str | None = None
+            low_stock = False
+            capacities: list[int] = []
+            for entry in range(self.row_offsets[row], self.row_offsets[row + 1]):
+                column = self.columns[entry]
+                qty = self.qty_required[entry]
+                ingredient = ingredients_by_id[self.ingredient_ids[column]]
+                available_qty = ingredient_available_qty(
+                    ingredient, active_reserved_qty_by_ingredient.get(ingredient.id, 0)
+                )
+                capacities.append(available_qty // qty)
+                low_stock = low_stock or available_qty <= ingredient.low_stock_threshold_qty
+                if reason is None and available_qty < qty:
+                    reason = self.reasons_by_column[column]
+
+            payload.append(
+                {
+                    "id": item_id,
+                    "name": name,
+                    "price_cents": price_cents,
+                    "category": category,
+                    "allergens": allergens,
+                    "available": reason is None,
+                    "low_stock": low_stock,
+                    "reason": reason,
+                    "max_qty_available": max(0, min(capacities, default=0)),
+                    "ingredients": list(self.ingredient_names_by_row[row]),
+                }
+            )
+
+        return payload
+
+
+def load_recipe_matrix(session: Session, *, menu_version: int = 0) -> RecipeMatrix:
+    menu_items = session.execute(select(MenuItem).order_by(MenuItem.id.asc())).scalars().all()
+    recipes = session.execute(select(Recipe)).scalars().all()
+    ingredients = session.execute(select(Ingredient)).scalars().all()
+    return RecipeMatrix.compile(
+        menu_items,
+        recipes,
+        {ingredient.id: ingredient for ingredient in ingredients},
+        menu_version=menu_version,
+    )
+
+
+class RecipeMatrixCache:
+    """Holds the matrix for the current menu version; recompiles when it moves."""
+
+    def __init__(self, loader: Callable[..., RecipeMatrix] = load_recipe_matrix) -> None:
+        self._lock = Lock()
+        self._loader = loader
+        self._matrix: RecipeMatrix | None = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matrix = None
+
+    def get(self, session: Session) -> RecipeMatrix:
+        menu_version = get_menu_version()
+        with self._lock:
+            matrix = self._matrix
+        if matrix is not None and matrix.menu_version == menu_version:
+            return matrix
+
+        matrix = self._loader(session, menu_version=menu_version)
+        with self._lock:
+            self._matrix = matrix
+        logger.info(
+            "recipe_matrix compiled menu_version=%s items=%s entries=%s",
+            menu_version,
+            len(matrix.item_fields),
+            len(matrix.columns),
+        )
+        return matrix
+
+
+recipe_matrix_cache = RecipeMatrixCache()
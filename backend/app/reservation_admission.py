@@ -0,0 +1,578 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+import logging
+from typing import Any
+
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.availability import SettledHolds, adjust_reserved_qty, lock_ingredients_settling_overdue
+from app.metrics import increment_counter
+from app.models import Ingredient, Reservation, ReservationIngredient, ReservationItem
+from app.recipe_matrix import recipe_matrix_cache
+from config import settings
+
+logger = logging.getLogger("kitchensync.reservation_admission")
+
+
+@dataclass(frozen=True)
+class InsufficientIngredient:
+    id: int
+    name: str
+    is_out: bool
+    required_qty: int
+    available_qty: int
+
+
+@dataclass(frozen=True)
+class ReservationAdmission:
+    """Outcome of one admission attempt inside the caller's transaction.
+
+    Exactly one of these holds: ``missing_menu_item_ids`` is non-empty (400),
+    ``insufficient`` is non-empty (409), or ``reservation_id`` is set (201).
+    The one exception is a rejected all-or-nothing batch, where carts that
+    would have been admitted have none of them set.
+    """
+
+    reservation_id: int | None = None
+    missing_menu_item_ids: list[int] = field(default_factory=list)
+    # In ingredient id order, matching the order of the 409 ``errors``.
+    insufficient: list[InsufficientIngredient] = field(default_factory=list)
+    required_qty_by_ingredient: dict[int, int] = field(default_factory=dict)
+    # Overdue holds expired to admit this one, for the caller to publish
+    # after commit whatever the outcome.
+    settled: SettledHolds = field(default_factory=SettledHolds)
+
+
+# Runs once the ingredient rows are locked and their overdue holds settled, so under READ COMMITTED its
+# snapshot already includes every write that committed before the locks
+# were granted. Required quantities come from the cached bill of materials.
+# Data-modifying CTEs all run; they only insert when the ``admitted`` row is
+# true.
+_ADMIT_RESERVATION_SQL = text(
+    """
+    WITH requested(menu_item_id, qty, notes) AS (
+        SELECT * FROM unnest(
+            CAST(:menu_item_ids AS integer[]),
+            CAST(:qtys AS integer[]),
+            CAST(:notes AS text[])
+        )
+    ),
+    required(ingredient_id, required_qty) AS (
+        SELECT * FROM unnest(
+            CAST(:ingredient_ids AS integer[]),
+            CAST(:required_qtys AS integer[])
+        )
+    ),
+    insufficient AS (
+        SELECT
+            i.id AS ingredient_id,
+            i.name AS ingredient_name,
+            req.required_qty,
+            CASE
+                WHEN i.is_out THEN 0
+                ELSE i.on_hand_qty - i.reserved_qty
+            END AS available_qty,
+            i.is_out
+        FROM required req
+        JOIN ingredients i ON i.id = req.ingredient_id
+    ),
+    admitted AS (
+        SELECT NOT EXISTS (SELECT 1 FROM insufficient WHERE available_qty < required_qty) AS ok
+    ),
+    new_reservation AS (
+        INSERT INTO reservations (user_id, status, expires_at)
+        SELECT :user_id, 'active', :expires_at
+        FROM admitted
+        WHERE ok
+        RETURNING id
+    ),
+    new_items AS (
+        INSERT INTO reservation_items (reservation_id, menu_item_id, qty, notes)
+        SELECT nr.id, r.menu_item_id, r.qty, r.notes
+        FROM new_reservation nr CROSS JOIN requested r
+    ),
+    new_ingredients AS (
+        INSERT INTO reservation_ingredients (reservation_id, ingredient_id, qty_reserved)
+        SELECT nr.id, req.ingredient_id, req.required_qty
+        FROM new_reservation nr CROSS JOIN required req
+    ),
+    reserved_counters AS (
+        UPDATE ingredients i
+        SET reserved_qty = i.reserved_qty + req.required_qty
+        FROM required req, new_reservation nr
+        WHERE i.id = req.ingredient_id
+    )
+    SELECT
+        (SELECT id FROM new_reservation) AS reservation_id,
+        COALESCE(
+            (
+                SELECT json_agg(
+                    json_build_array(ingredient_id, ingredient_name, required_qty, available_qty, is_out)
+                    ORDER BY ingredient_id
+                )
+                FROM insufficient
+                WHERE available_qty < required_qty
+            ),
+            '[]'
+        ) AS insufficient
+    """
+)
+
+
+# Optimistic mode takes no locks up front: each counter is bumped only if
+# the stock still covers it, and the reservation is inserted only if every
+# counter was. A concurrent writer makes the UPDATE wait for that row and
+# recheck the condition against the committed value. Rows are updated in
+# the order of ``required`` (ingredient id order in practice); a deadlock is
+# rolled back and rerun like any other.
+_ADMIT_IF_AVAILABLE_SQL = text(
+    """
+    WITH requested(menu_item_id, qty, notes) AS (
+        SELECT * FROM unnest(
+            CAST(:menu_item_ids AS integer[]),
+            CAST(:qtys AS integer[]),
+            CAST(:notes AS text[])
+        )
+    ),
+    required(ingredient_id, required_qty) AS (
+        SELECT * FROM unnest(
+            CAST(:ingredient_ids AS integer[]),
+            CAST(:required_qtys AS integer[])
+        )
+    ),
+    reserved_counters AS (
+        UPDATE ingredients i
+        SET reserved_qty = i.reserved_qty + req.required_qty
+        FROM required req
+        WHERE i.id = req.ingredient_id
+          AND NOT i.is_out
+          AND i.on_hand_qty - i.reserved_qty >= req.required_qty
+        RETURNING i.id
+    ),
+    admitted AS (
+        SELECT (SELECT count(*) FROM reserved_counters) = :ingredient_count AS ok
+    ),
+    new_reservation AS (
+        INSERT INTO reservations (user_id, status, expires_at)
+        SELECT :user_id, 'active', :expires_at
+        FROM admitted
+        WHERE ok
+        RETURNING id
+    ),
+    new_items AS (
+        INSERT INTO reservation_items (reservation_id, menu_item_id, qty, notes)
+        SELECT nr.id, r.menu_item_id, r.qty, r.notes
+        FROM new_reservation nr CROSS JOIN requested r
+    ),
+    new_ingredients AS (
+        INSERT INTO reservation_ingredients (reservation_id, ingredient_id, qty_reserved)
+        SELECT nr.id, req.ingredient_id, req.required_qty
+        FROM new_reservation nr CROSS JOIN required req
+    )
+    SELECT
+        (SELECT id FROM new_reservation) AS reservation_id,
+        ARRAY(SELECT id FROM reserved_counters) AS reserved_ingredient_ids
+    """
+)
+
+
+def _insert_rows(
+    session: Session,
+    item_rows: list[dict[str, Any]],
+    ingredient_rows: list[dict[str, Any]],
+) -> None:
+    if item_rows:
+        session.execute(insert(ReservationItem).values(item_rows))
+    if ingredient_rows:
+        session.execute(insert(ReservationIngredient).values(ingredient_rows))
+
+
+def _item_rows(reservation_id: int, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return [
+        {
+            "reservation_id": reservation_id,
+            "menu_item_id": item["menu_item_id"],
+            "qty": item["qty"],
+            "notes": item["notes"],
+        }
+        for item in items
+    ]
+
+
+def _ingredient_rows(
+    reservation_id: int,
+    qty_reserved_by_ingredient: dict[int, int],
+) -> list[dict[str, Any]]:
+    return [
+        {
+            "reservation_id": reservation_id,
+            "ingredient_id": ingredient_id,
+            "qty_reserved": qty_reserved,
+        }
+        for ingredient_id, qty_reserved in sorted(qty_reserved_by_ingredient.items())
+    ]
+
+
+def insert_reservation_rows(
+    session: Session,
+    reservation_id: int,
+    items: list[dict[str, Any]],
+    qty_reserved_by_ingredient: dict[int, int],
+) -> None:
+    """Write a reservation's items and ingredient holds as one INSERT per table."""
+    _insert_rows(
+        session,
+        _item_rows(reservation_id, items),
+        _ingredient_rows(reservation_id, qty_reserved_by_ingredient),
+    )
+
+
+def sync_reservation_rows(
+    session: Session,
+    reservation_id: int,
+    items: list[dict[str, Any]],
+    qty_reserved_by_ingredient: dict[int, int],
+    *,
+    existing_items: list[ReservationItem],
+    existing_ingredients: list[ReservationIngredient],
+) -> None:
+    """Bring a reservation's rows to the requested state, touching only rows that differ.
+
+    Changed rows are updated through the session; removed rows are deleted
+    and new rows inserted with one statement per table.
+    """
+    new_items = {item["menu_item_id"]: item for item in items}
+    stale_item_ids: list[int] = []
+    for row in existing_items:
+        item = new_items.pop(row.menu_item_id, None)
+        if item is None:
+            stale_item_ids.append(row.id)
+        elif (row.qty, row.notes) != (item["qty"], item["notes"]):
+            row.qty = item["qty"]
+            row.notes = item["notes"]
+
+    new_qty_by_ingredient = dict(qty_reserved_by_ingredient)
+    stale_ingredient_row_ids: list[int] = []
+    for row in existing_ingredients:
+        qty_reserved = new_qty_by_ingredient.pop(row.ingredient_id, None)
+        if qty_reserved is None:
+            stale_ingredient_row_ids.append(row.id)
+        elif row.qty_reserved != qty_reserved:
+            row.qty_reserved = qty_reserved
+
+    if stale_item_ids:
+        session.execute(
+            delete(ReservationItem)
+            .where(ReservationItem.id.in_(stale_item_ids))
+            .execution_options(synchronize_session=False)
+        )
+    if stale_ingredient_row_ids:
+        session.execute(
+            delete(ReservationIngredient)
+            .where(ReservationIngredient.id.in_(stale_ingredient_row_ids))
+            .execution_options(synchronize_session=False)
+        )
+    insert_reservation_rows(session, reservation_id, list(new_items.values()), new_qty_by_ingredient)
+
+
+def _admit_with_statement(
+    session: Session,
+    *,
+    user_id: int,
+    items: list[dict[str, Any]],
+    required_qty_by_ingredient: dict[int, int],
+    now: datetime,
+    expires_at: datetime,
+) -> ReservationAdmission:
+    settled = lock_ingredients_settling_overdue(session, list(required_qty_by_ingredient), now=now)
+    row = session.execute(
+        _ADMIT_RESERVATION_SQL,
+        {
+            "menu_item_ids": [item["menu_item_id"] for item in items],
+            "qtys": [item["qty"] for item in items],
+            "notes": [item["notes"] for item in items],
+            "ingredient_ids": list(required_qty_by_ingredient),
+            "required_qtys": list(required_qty_by_ingredient.values()),
+            "user_id": user_id,
+            "expires_at": expires_at,
+        },
+    ).one()
+
+    return ReservationAdmission(
+        reservation_id=row.reservation_id,
+        insufficient=[
+            InsufficientIngredient(
+                id=ingredient_id,
+                name=ingredient_name,
+                is_out=is_out,
+                required_qty=int(required_qty),
+                available_qty=int(available_qty),
+            )
+            for ingredient_id, ingredient_name, required_qty, available_qty, is_out in row.insufficient
+        ],
+        required_qty_by_ingredient=required_qty_by_ingredient,
+        settled=settled,
+    )
+
+
+def _admit_optimistically(
+    session: Session,
+    *,
+    user_id: int,
+    items: list[dict[str, Any]],
+    required_qty_by_ingredient: dict[int, int],
+    now: datetime,
+    expires_at: datetime,
+) -> ReservationAdmission:
+    row = session.execute(
+        _ADMIT_IF_AVAILABLE_SQL,
+        {
+            "menu_item_ids": [item["menu_item_id"] for item in items],
+            "qtys": [item["qty"] for item in items],
+            "notes": [item["notes"] for item in items],
+            "ingredient_ids": list(required_qty_by_ingredient),
+            "required_qtys": list(required_qty_by_ingredient.values()),
+            "ingredient_count": len(required_qty_by_ingredient),
+            "user_id": user_id,
+            "expires_at": expires_at,
+        },
+    ).one()
+    if row.reservation_id is not None:
+        return ReservationAdmission(
+            reservation_id=row.reservation_id,
+            required_qty_by_ingredient=required_qty_by_ingredient,
+        )
+
+    # Short on stock, or on counters still holding overdue reservations. Undo
+    # the counters that were bumped and let the locking path settle overdue
+    # holds and report exactly what is short.
+    adjust_reserved_qty(
+        session,
+        {
+            ingredient_id: -required_qty_by_ingredient[ingredient_id]
+            for ingredient_id in row.reserved_ingredient_ids
+        },
+    )
+    increment_counter("reservation_admission.optimistic_fallbacks")
+    return _admit_with_statement(
+        session,
+        user_id=user_id,
+        items=items,
+        required_qty_by_ingredient=required_qty_by_ingredient,
+        now=now,
+        expires_at=expires_at,
+    )
+
+
+def _admit_with_orm(
+    session: Session,
+    *,
+    user_id: int,
+    items: list[dict[str, Any]],
+    required_qty_by_ingredient: dict[int, int],
+    now: datetime,
+    expires_at: datetime,
+) -> ReservationAdmission:
+    ingredient_ids = list(required_qty_by_ingredient)
+    settled = lock_ingredients_settling_overdue(session, ingredient_ids, now=now)
+    ingredients = session.execute(
+        select(Ingredient).where(Ingredient.id.in_(ingredient_ids))
+    ).scalars().all()
+    ingredients_by_id = {ingredient.id: ingredient for ingredient in ingredients}
+
+    insufficient: list[InsufficientIngredient] = []
+    for ingredient_id in ingredient_ids:
+        ingredient = ingredients_by_id[ingredient_id]
+        required_qty = required_qty_by_ingredient[ingredient_id]
+        available_qty = 0 if ingredient.is_out else ingredient.on_hand_qty - ingredient.reserved_qty
+        if available_qty < required_qty:
+            insufficient.append(
+                InsufficientIngredient(
+                    id=ingredient.id,
+                    name=ingredient.name,
+                    is_out=ingredient.is_out,
+                    required_qty=required_qty,
+                    available_qty=available_qty,
+                )
+            )
+    if insufficient:
+        return ReservationAdmission(
+            insufficient=insufficient,
+            required_qty_by_ingredient=required_qty_by_ingredient,
+            settled=settled,
+        )
+
+    reservation_id = session.execute(
+        insert(Reservation)
+        .values(user_id=user_id, status="active", expires_at=expires_at)
+        .returning(Reservation.id)
+    ).scalar_one()
+    insert_reservation_rows(session, reservation_id, items, required_qty_by_ingredient)
+    adjust_reserved_qty(session, required_qty_by_ingredient)
+    return ReservationAdmission(
+        reservation_id=reservation_id,
+        required_qty_by_ingredient=required_qty_by_ingredient,
+        settled=settled,
+    )
+
+
+def admit_reservation(
+    session: Session,
+    *,
+    user_id: int,
+    items: list[dict[str, Any]],
+    now: datetime,
+    expires_at: datetime,
+    mode: str | None = None,
+) -> ReservationAdmission:
+    """Validate, check locked availability and insert a new reservation.
+
+    Menu items and recipes come from the cached recipe matrix. On Postgres
+    the rest is: settle overdue holds on the ingredients and lock their rows
+    (``lock_ingredients_settling_overdue``), then one CTE that checks
+    ``on_hand_qty - reserved_qty`` and inserts with ``RETURNING``. With
+    ``RESERVATION_ADMISSION_MODE=optimistic`` it is a single statement that
+    bumps each counter only while stock covers it and inserts only if all of
+    them were bumped, falling back to locking otherwise; ``mode`` overrides
+    the setting. Other databases take the
+    equivalent ORM path. ``items`` is the output of the handler's
+    normalization (unique, sorted ``menu_item_id``).
+    """
+    recipe_matrix = recipe_matrix_cache.get(session)
+    missing_menu_item_ids = recipe_matrix.missing_menu_item_ids(
+        item["menu_item_id"] for item in items
+    )
+    if missing_menu_item_ids:
+        return ReservationAdmission(missing_menu_item_ids=missing_menu_item_ids)
+
+    required_qty_by_ingredient = recipe_matrix.required_qty_by_ingredient(
+        {item["menu_item_id"]: item["qty"] for item in items}
+    )
+    if session.get_bind().dialect.name != "postgresql":
+        admit = _admit_with_orm
+    elif (mode or settings.reservation_admission_mode) == "optimistic":
+        admit = _admit_optimistically
+    else:
+        admit = _admit_with_statement
+    return admit(
+        session,
+        user_id=user_id,
+        items=items,
+        required_qty_by_ingredient=required_qty_by_ingredient,
+        now=now,
+        expires_at=expires_at,
+    )
+
+
+def admit_reservation_batch(
+    session: Session,
+    *,
+    user_id: int,
+    carts: list[list[dict[str, Any]]],
+    now: datetime,
+    expires_at: datetime,
+    all_or_nothing: bool,
+) -> tuple[list[ReservationAdmission], SettledHolds]:
+    """Admit several carts in one transaction, one result per cart.
+
+    The union of ingredients is locked once in id order, then carts are
+    checked in request order against stock less the carts admitted before
+    them. With ``all_or_nothing`` a single rejected cart means nothing is
+    written. Each cart's items are normalized like ``admit_reservation``.
+    Also returns the overdue holds settled on the way, to publish after commit.
+    """
+    recipe_matrix = recipe_matrix_cache.get(session)
+    required_by_cart: list[dict[int, int] | None] = []
+    for items in carts:
+        if recipe_matrix.missing_menu_item_ids(item["menu_item_id"] for item in items):
+            required_by_cart.append(None)
+        else:
+            required_by_cart.append(
+                recipe_matrix.required_qty_by_ingredient(
+                    {item["menu_item_id"]: item["qty"] for item in items}
+                )
+            )
+
+    ingredient_ids = sorted(
+        {ingredient_id for required in required_by_cart if required for ingredient_id in required}
+    )
+    settled = lock_ingredients_settling_overdue(session, ingredient_ids, now=now)
+    ingredients = session.execute(
+        select(Ingredient).where(Ingredient.id.in_(ingredient_ids))
+    ).scalars().all()
+    ingredients_by_id = {ingredient.id: ingredient for ingredient in ingredients}
+
+    admitted_qty_by_ingredient: dict[int, int] = {}
+    admissions: list[ReservationAdmission] = []
+    for items, required_qty_by_ingredient in zip(carts, required_by_cart):
+        if required_qty_by_ingredient is None:
+            admissions.append(
+                ReservationAdmission(
+                    missing_menu_item_ids=recipe_matrix.missing_menu_item_ids(
+                        item["menu_item_id"] for item in items
+                    )
+                )
+            )
+            continue
+
+        insufficient: list[InsufficientIngredient] = []
+        for ingredient_id, required_qty in required_qty_by_ingredient.items():
+            ingredient = ingredients_by_id[ingredient_id]
+            active_reserved_qty = ingredient.reserved_qty + admitted_qty_by_ingredient.get(ingredient_id, 0)
+            available_qty = 0 if ingredient.is_out else ingredient.on_hand_qty - active_reserved_qty
+            if available_qty < required_qty:
+                insufficient.append(
+                    InsufficientIngredient(
+                        id=ingredient.id,
+                        name=ingredient.name,
+                        is_out=ingredient.is_out,
+                        required_qty=required_qty,
+                        available_qty=available_qty,
+                    )
+                )
+        if insufficient:
+            admissions.append(
+                ReservationAdmission(
+                    insufficient=insufficient,
+                    required_qty_by_ingredient=required_qty_by_ingredient,
+                )
+            )
+            continue
+
+        for ingredient_id, required_qty in required_qty_by_ingredient.items():
+            admitted_qty_by_ingredient[ingredient_id] = (
+                admitted_qty_by_ingredient.get(ingredient_id, 0) + required_qty
+            )
+        admissions.append(ReservationAdmission(required_qty_by_ingredient=required_qty_by_ingredient))
+
+    admitted_indexes = [
+        index
+        for index, admission in enumerate(admissions)
+        if not admission.missing_menu_item_ids and not admission.insufficient
+    ]
+    if not admitted_indexes or (all_or_nothing and len(admitted_indexes) < len(carts)):
+        return admissions, settled
+
+    reservation_ids = session.execute(
+        insert(Reservation).returning(Reservation.id, sort_by_parameter_order=True),
+        [
+            {"user_id": user_id, "status": "active", "expires_at": expires_at}
+            for _ in admitted_indexes
+        ],
+    ).scalars().all()
+    item_rows: list[dict[str, Any]] = []
+    ingredient_rows: list[dict[str, Any]] = []
+    for index, reservation_id in zip(admitted_indexes, reservation_ids):
+        required_qty_by_ingredient = admissions[index].required_qty_by_ingredient
+        item_rows.extend(_item_rows(reservation_id, carts[index]))
+        ingredient_rows.extend(_ingredient_rows(reservation_id, required_qty_by_ingredient))
+        admissions[index] = ReservationAdmission(
+            reservation_id=reservation_id,
+            required_qty_by_ingredient=required_qty_by_ingredient,
+        )
+    _insert_rows(session, item_rows, ingredient_rows)
+    adjust_reserved_qty(session, admitted_qty_by_ingredient)
+    return admissions, settled
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import logging
+from time import monotonic
+
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.db_retry import run_with_retry
+from app.models import (
+    Reservation,
+    ReservationHistory,
+    ReservationIngredient,
+    ReservationIngredientHistory,
+    ReservationItem,
+    ReservationItemHistory,
+)
+from config import settings
+from db import SessionLocal
+
+SETTLED_STATUSES = ("committed", "released", "expired")
+
+logger = logging.getLogger("kitchensync.reservation_archive")
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass(frozen=True)
+class ArchiveRun:
+    archived_count: int
+    batches: int
+    # False when the budget ran out with eligible reservations possibly left.
+    complete: bool
+
+
+def _archive_batch(session: Session, cutoff: datetime, batch_size: int, archived_at: datetime) -> int:
+    """Copy up to ``batch_size`` settled reservations to history and delete them."""
+    reservation_ids = session.execute(
+        select(Reservation.id)
+        .where(
+            Reservation.status.in_(SETTLED_STATUSES),
+            Reservation.updated_at < cutoff,
+        )
+        .order_by(Reservation.id.asc())
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not reservation_ids:
+        return 0
+
+    session.execute(
+        insert(ReservationHistory).from_select(
+            ["id", "user_id", "status", "created_at", "expires_at", "updated_at", "archived_at"],
+            select(
+                Reservation.id,
+                Reservation.user_id,
+                Reservation.status,
+                Reservation.created_at,
+                Reservation.expires_at,
+                Reservation.updated_at,
+                literal(archived_at, ReservationHistory.archived_at.type),
+            ).where(Reservation.id.in_(reservation_ids)),
+        )
+    )
+    session.execute(
+        insert(ReservationItemHistory).from_select(
+            ["id", "reservation_id", "menu_item_id", "qty", "notes"],
+            select(
+                ReservationItem.id,
+                ReservationItem.reservation_id,
+                ReservationItem.menu_item_id,
+                ReservationItem.qty,
+                ReservationItem.notes,
+            ).where(ReservationItem.reservation_id.in_(reservation_ids)),
+        )
+    )
+    session.execute(
+        insert(ReservationIngredientHistory).from_select(
+            ["id", "reservation_id", "ingredient_id", "qty_reserved"],
+            select(
+                ReservationIngredient.id,
+                ReservationIngredient.reservation_id,
+                ReservationIngredient.ingredient_id,
+                ReservationIngredient.qty_reserved,
+            ).where(ReservationIngredient.reservation_id.in_(reservation_ids)),
+        )
+    )
+    session.execute(delete(ReservationItem).where(ReservationItem.reservation_id.in_(reservation_ids)))
+    session.execute(
+        delete(ReservationIngredient).where(ReservationIngredient.reservation_id.in_(reservation_ids))
+    )
+    session.execute(delete(Reservation).where(Reservation.id.in_(reservation_ids)))
+    return len(reservation_ids)
+
+
+def _archive_batch_in_transaction(cutoff: datetime, batch_size: int, archived_at: datetime) -> int:
+    with SessionLocal() as session:
+        with session.begin():
+            return _archive_batch(session, cutoff, batch_size, archived_at)
+
+
+def archive_reservations(
+    now: datetime | None = None,
+    *,
+    older_than_seconds: int | None = None,
+    batch_size: int | None = None,
+    budget_ms: int | None = None,
+) -> ArchiveRun:
+    """Move settled reservations older than the cutoff into the history tables.
+
+    Each batch copies and deletes one set of reservations with their items
+    and holds in its own transaction. Stops once a batch comes back short or
+    the budget is spent. Active reservations are never touched, so the
+    ledger and ``reserved_qty`` are unaffected.
+    """
+    effective_now = now or _utc_now()
+    age_seconds = (
+        older_than_seconds if older_than_seconds is not None else settings.reservation_archive_after_seconds
+    )
+    cutoff = effective_now - timedelta(seconds=age_seconds)
+    chunk_size = batch_size or settings.reservation_archive_batch_size
+    budget_seconds = (
+        budget_ms if budget_ms is not None else settings.reservation_archive_budget_ms
+    ) / 1000
+    started = monotonic()
+
+    archived_count = 0
+    batches = 0
+    while True:
+        batch_count = run_with_retry(
+            "archive_reservations",
+            lambda: _archive_batch_in_transaction(cutoff, chunk_size, effective_now),
+        )
+        batches += 1
+        archived_count += batch_count
+        if batch_count < chunk_size:
+            complete = True
+            break
+        if monotonic() - started >= budget_seconds:
+            complete = False
+            break
+
+    logger.info(
+        "archive_reservations completed archived_count=%s batches=%s complete=%s cutoff=%s",
+        archived_count,
+        batches,
+        complete,
+        cutoff.isoformat(),
+    )
+    return ArchiveRun(archived_count=archived_count, batches=batches, complete=complete)
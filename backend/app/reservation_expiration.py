@@ -1,19 +1,39 @@
 from __future__ import annotations
 
+import atexit
 import os
+from collections.abc import Sequence
+from dataclasses import dataclass
 from datetime import datetime, timezone
 import logging
+from time import monotonic
 
 import eventlet
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 
 from app import socketio
+from app.availability import availability_ledger, release_reserved_qty
+from app.db_retry import run_with_retry
+from app.expiration_schedule import expiration_schedule
+from app.idempotency import purge_expired_idempotency_keys
+from app.leader_lock import AdvisoryLeaderLock
+from app.metrics import increment_counter
 from app.models import Reservation
+from app.state_changes import notify_state_changed
 from config import settings
-from db import SessionLocal
+from db import SessionLocal, engine
 
 EXPIRATION_INTERVAL_SECONDS = settings.expiration_interval_seconds
+# The job wakes at least this often so reservations scheduled after it went
+# to sleep still expire within about a second.
+MAX_TICK_SECONDS = 1.0
+MIN_TICK_SECONDS = 0.05
+MAX_OVERDUE_BACKOFF_SECONDS = 30.0
+# Only the instance holding this advisory lock runs the expiration job.
+EXPIRATION_LEADER_LOCK_KEY = 727_002
+EXPIRATION_LEADER_RETRY_SECONDS = settings.expiration_leader_retry_seconds
 _expiration_job_started = False
+_expiration_leader_lock = AdvisoryLeaderLock(engine, EXPIRATION_LEADER_LOCK_KEY)
 logger = logging.getLogger("kitchensync.reservation_expiration")
 
 
@@ -21,32 +41,164 @@ def _utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
 
-def expire_reservations_once(now: datetime | None = None) -> int:
-    effective_now = now or _utc_now()
+@dataclass(frozen=True)
+class ExpirationSweep:
+    reservation_ids: list[int]
+    ingredient_ids: list[int]
+    chunks: int
+    # False when the budget ran out with overdue reservations possibly left.
+    complete: bool
+
 
+def _expire_chunk(
+    now: datetime,
+    batch_size: int,
+    reservation_ids: Sequence[int] | None = None,
+) -> tuple[list[int], list[int]]:
+    """Expire up to ``batch_size`` overdue reservations in one transaction.
+
+    ``reservation_ids`` limits the chunk to those reservations. Rows another
+    transaction holds (a concurrent commit/release) are skipped and picked
+    up by a later sweep if still overdue.
+    """
+    overdue_ids = select(Reservation.id).where(
+        Reservation.status == "active",
+        Reservation.expires_at < now,
+    )
+    if reservation_ids is not None:
+        overdue_ids = overdue_ids.where(Reservation.id.in_(reservation_ids))
+    overdue_ids = (
+        overdue_ids.order_by(Reservation.id.asc())
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
     with SessionLocal() as session:
         with session.begin():
-            expired_reservations = session.execute(
-                select(Reservation)
-                .where(
-                    Reservation.status == "active",
-                    Reservation.expires_at < effective_now,
-                )
-                .with_for_update()
-            ).scalars().all()
+            expired_reservation_ids = sorted(
+                session.execute(
+                    update(Reservation)
+                    .where(Reservation.id.in_(overdue_ids.scalar_subquery()))
+                    .values(status="expired", updated_at=func.now())
+                    .returning(Reservation.id)
+                    .execution_options(synchronize_session=False)
+                ).scalars()
+            )
+            changed_ingredient_ids = release_reserved_qty(session, expired_reservation_ids)
+
+    availability_ledger.drop_holds(expired_reservation_ids)
+    expiration_schedule.discard(expired_reservation_ids)
+    return expired_reservation_ids, changed_ingredient_ids
+
+
+def sweep_expired_reservations(
+    now: datetime | None = None,
+    *,
+    batch_size: int | None = None,
+    budget_ms: int | None = None,
+) -> ExpirationSweep:
+    """Expire overdue reservations in chunks until none are left or the budget is spent.
+
+    Each chunk is its own short transaction, so a large backlog never holds
+    row locks for the whole sweep.
+    """
+    effective_now = now or _utc_now()
+    chunk_size = batch_size or settings.expiration_batch_size
+    budget_seconds = (budget_ms if budget_ms is not None else settings.expiration_budget_ms) / 1000
+    started = monotonic()
+
+    reservation_ids: list[int] = []
+    ingredient_ids: set[int] = set()
+    chunks = 0
+    while True:
+        chunk_reservation_ids, chunk_ingredient_ids = run_with_retry(
+            "expire_reservations", lambda: _expire_chunk(effective_now, chunk_size)
+        )
+        chunks += 1
+        reservation_ids.extend(chunk_reservation_ids)
+        ingredient_ids.update(chunk_ingredient_ids)
+        if len(chunk_reservation_ids) < chunk_size:
+            complete = True
+            break
+        if monotonic() - started >= budget_seconds:
+            complete = False
+            break
 
-            for reservation in expired_reservations:
-                reservation.status = "expired"
+    return ExpirationSweep(
+        reservation_ids=reservation_ids,
+        ingredient_ids=sorted(ingredient_ids),
+        chunks=chunks,
+        complete=complete,
+    )
 
-            return len(expired_reservations)
+
+def expire_reservations_once(now: datetime | None = None) -> int:
+    return len(sweep_expired_reservations(now=now).reservation_ids)
+
+
+def _sweep_and_emit(
+    now: datetime | None = None,
+    *,
+    batch_size: int | None = None,
+    budget_ms: int | None = None,
+) -> ExpirationSweep:
+    sweep = sweep_expired_reservations(now=now, batch_size=batch_size, budget_ms=budget_ms)
+    if sweep.reservation_ids:
+        notify_state_changed(sweep.ingredient_ids)
+    return sweep
+
+
+def run_expiration_sweep(
+    now: datetime | None = None,
+    *,
+    batch_size: int | None = None,
+    budget_ms: int | None = None,
+) -> ExpirationSweep:
+    """Sweep, emit one ``stateChanged`` for the affected ingredients, purge idempotency keys."""
+    sweep = _sweep_and_emit(now=now, batch_size=batch_size, budget_ms=budget_ms)
+    purged_key_count = purge_expired_idempotency_keys(now=now)
+    logger.info(
+        "expire_reservations_once completed expired_count=%s chunks=%s complete=%s "
+        "purged_idempotency_keys=%s",
+        len(sweep.reservation_ids),
+        sweep.chunks,
+        sweep.complete,
+        purged_key_count,
+    )
+    return sweep
 
 
 def expire_reservations_once_and_emit(now: datetime | None = None) -> int:
-    expired_count = expire_reservations_once(now=now)
-    if expired_count > 0:
-        socketio.emit("stateChanged")
-    logger.info("expire_reservations_once completed expired_count=%s", expired_count)
-    return expired_count
+    return len(run_expiration_sweep(now=now).reservation_ids)
+
+
+def expire_due_reservations(now: datetime | None = None) -> list[int]:
+    """Expire the reservations ``expiration_schedule`` reports as due, then emit.
+
+    Returns the ids actually expired; due ids already committed, released or
+    extended by another writer are left alone by the ``UPDATE`` filter.
+    """
+    effective_now = now or _utc_now()
+    due_ids = expiration_schedule.pop_due(effective_now)
+    chunk_size = settings.expiration_batch_size
+    reservation_ids: list[int] = []
+    ingredient_ids: set[int] = set()
+    for start in range(0, len(due_ids), chunk_size):
+        chunk_ids = due_ids[start : start + chunk_size]
+        chunk_reservation_ids, chunk_ingredient_ids = run_with_retry(
+            "expire_reservations",
+            lambda: _expire_chunk(effective_now, chunk_size, chunk_ids),
+        )
+        reservation_ids.extend(chunk_reservation_ids)
+        ingredient_ids.update(chunk_ingredient_ids)
+
+    if reservation_ids:
+        notify_state_changed(sorted(ingredient_ids))
+        logger.info(
+            "expire_due_reservations completed due_count=%s expired_count=%s",
+            len(due_ids),
+            len(reservation_ids),
+        )
+    return reservation_ids
 
 
 def _should_start_expiration_job() -> bool:
@@ -59,10 +211,112 @@ def _should_start_expiration_job() -> bool:
     return True
 
 
-def _reservation_expiration_loop() -> None:
-    while True:
+def _earliest_active_expires_at() -> datetime | None:
+    # One probe of ix_reservations_active_expires_at; sees every instance's writes.
+    with SessionLocal() as session:
+        return session.scalar(
+            select(func.min(Reservation.expires_at)).where(Reservation.status == "active")
+        )
+
+
+@dataclass
+class _TickState:
+    next_reconcile_at: float = 0.0
+    # Earliest active expires_at in the database at the last probe.
+    earliest_expires_at: datetime | None = None
+    # Overdue rows a sweep could not expire (locked by another writer) are
+    # retried with backoff, not on every tick.
+    overdue_retry_at: float = 0.0
+    overdue_backoff_seconds: float = MAX_TICK_SECONDS
+
+
+def _seconds_until_next_tick(state: _TickState) -> float:
+    delay = min(MAX_TICK_SECONDS, state.next_reconcile_at - monotonic())
+    now = _utc_now()
+    for expires_at in (expiration_schedule.next_expires_at(), state.earliest_expires_at):
+        # A deadline already past is waiting on its backoff, not the clock.
+        if expires_at is not None and expires_at > now:
+            delay = min(delay, (expires_at - now).total_seconds())
+    return max(MIN_TICK_SECONDS, delay)
+
+
+def _sweep_overdue_with_backoff(state: _TickState) -> bool:
+    """Sweep unless backing off; return whether a sweep ran."""
+    if monotonic() < state.overdue_retry_at:
+        return False
+    # Due reservations this process never saw, written by other instances.
+    if _sweep_and_emit().reservation_ids:
+        state.overdue_retry_at = 0.0
+        state.overdue_backoff_seconds = MAX_TICK_SECONDS
+    else:
+        state.overdue_retry_at = monotonic() + state.overdue_backoff_seconds
+        state.overdue_backoff_seconds = min(state.overdue_backoff_seconds * 2, MAX_OVERDUE_BACKOFF_SECONDS)
+    return True
+
+
+def _run_expiration_tick(state: _TickState) -> None:
+    """Expire what is due and record when the next tick should look again."""
+    if monotonic() >= state.next_reconcile_at:
+        # Catches rows skipped while locked and anything the probe below
+        # missed; idempotency keys are purged on this interval too.
         expire_reservations_once_and_emit()
-        eventlet.sleep(EXPIRATION_INTERVAL_SECONDS)
+        state.next_reconcile_at = monotonic() + EXPIRATION_INTERVAL_SECONDS
+        state.earliest_expires_at = _earliest_active_expires_at()
+        return
+
+    expire_due_reservations()
+    earliest_expires_at = _earliest_active_expires_at()
+    if earliest_expires_at is not None and earliest_expires_at < _utc_now():
+        if _sweep_overdue_with_backoff(state):
+            earliest_expires_at = _earliest_active_expires_at()
+    else:
+        state.overdue_retry_at = 0.0
+        state.overdue_backoff_seconds = MAX_TICK_SECONDS
+    state.earliest_expires_at = earliest_expires_at
+
+
+def _lead_expiration(leader_lock: AdvisoryLeaderLock) -> None:
+    """Run expiration ticks for as long as this process holds leadership."""
+    with SessionLocal() as session:
+        expiration_schedule.load(session)
+
+    state = _TickState()
+    next_leader_check_at = monotonic() + EXPIRATION_LEADER_RETRY_SECONDS
+    try:
+        while True:
+            try:
+                _run_expiration_tick(state)
+            except Exception:
+                logger.exception("expiration_job tick failed")
+            if monotonic() >= next_leader_check_at:
+                if not leader_lock.still_held():
+                    increment_counter("expiration_leader.lost")
+                    logger.warning("expiration_job lost leadership")
+                    return
+                next_leader_check_at = monotonic() + EXPIRATION_LEADER_RETRY_SECONDS
+            eventlet.sleep(_seconds_until_next_tick(state))
+    finally:
+        # Writers stop feeding the schedule until leadership comes back.
+        expiration_schedule.clear()
+
+
+def _reservation_expiration_loop() -> None:
+    leader_lock = _expiration_leader_lock
+    try:
+        while True:
+            try:
+                acquired = leader_lock.try_acquire()
+            except Exception:
+                logger.exception("expiration_job leader election failed")
+                acquired = False
+            if acquired:
+                increment_counter("expiration_leader.acquired")
+                logger.info("expiration_job leading")
+                _lead_expiration(leader_lock)
+            eventlet.sleep(EXPIRATION_LEADER_RETRY_SECONDS)
+    finally:
+        # Hand leadership over now rather than when the connection is reaped.
+        leader_lock.release()
 
 
 def start_reservation_expiration_job() -> None:
@@ -78,5 +332,9 @@ def start_reservation_expiration_job() -> None:
         return
 
     _expiration_job_started = True
+    # Background tasks are not unwound at interpreter exit.
+    atexit.register(_expiration_leader_lock.release)
     socketio.start_background_task(_reservation_expiration_loop)
-    logger.info("expiration_job started interval_seconds=%s", EXPIRATION_INTERVAL_SECONDS)
+    logger.info(
+        "expiration_job started reconcile_interval_seconds=%s", EXPIRATION_INTERVAL_SECONDS
+    )
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+import logging
+from threading import Lock
+from typing import Any
+
+from flask import Response, current_app, jsonify, request
+
+from app.state_changes import changed_ingredient_ids_since, get_state_key
+
+logger = logging.getLogger("kitchensync.snapshot_cache")
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    key: str
+    body: bytes
+    count: int
+
+
+class SnapshotCache:
+    """Pre-serialized read-endpoint bodies keyed by ``get_state_key()``.
+
+    One snapshot is kept per endpoint name; a request for a newer key
+    replaces it.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._snapshots: dict[str, Snapshot] = {}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+
+    def get(self, name: str, key: str) -> Snapshot | None:
+        with self._lock:
+            snapshot = self._snapshots.get(name)
+        if snapshot is None or snapshot.key != key:
+            return None
+        return snapshot
+
+    def put(self, name: str, key: str, payload: list[dict[str, Any]]) -> Snapshot:
+        body = current_app.json.dumps(payload).encode("utf-8")
+        snapshot = Snapshot(key=key, body=body, count=len(payload))
+        with self._lock:
+            self._snapshots[name] = snapshot
+        return snapshot
+
+
+snapshot_cache = SnapshotCache()
+
+
+def snapshot_response(name: str, build_payload: Callable[[], list[dict[str, Any]]]) -> Response:
+    """Serve ``name`` from the snapshot cache, honoring ``If-None-Match``.
+
+    The key is read before building so a change that lands mid-build leaves
+    the stored snapshot under the older key and the next request rebuilds.
+    """
+    key = get_state_key()
+    etag = f"{name}-{key}"
+    if request.if_none_match.contains(etag):
+        logger.debug("snapshot not_modified name=%s key=%s", name, key)
+        response = Response(status=304)
+    else:
+        snapshot = snapshot_cache.get(name, key)
+        if snapshot is None:
+            snapshot = snapshot_cache.put(name, key, build_payload())
+            logger.debug("snapshot built name=%s key=%s count=%s", name, key, snapshot.count)
+        response = Response(snapshot.body, status=200, mimetype="application/json")
+
+    response.set_etag(etag)
+    response.headers["X-State-Version"] = key
+    # Clients may keep the body but must revalidate before reusing it.
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def delta_response(
+    since: str,
+    build_payload: Callable[[], list[dict[str, Any]]],
+    build_changed_rows: Callable[[set[int]], list[dict[str, Any]]],
+) -> Response:
+    """Answer ``?since=<state key>`` with only the rows that may have changed.
+
+    ``build_changed_rows`` receives the ingredient ids changed after
+    ``since``. When the history cannot answer that, the full payload is sent
+    with ``full`` set so the client replaces its copy instead of merging.
+    """
+    state_key, changed_ingredient_ids = changed_ingredient_ids_since(since)
+    if changed_ingredient_ids is None:
+        rows = build_payload()
+    elif changed_ingredient_ids:
+        rows = build_changed_rows(changed_ingredient_ids)
+    else:
+        rows = []
+
+    return jsonify(
+        {
+            "version": state_key,
+            "full": changed_ingredient_ids is None,
+            "rows": rows,
+        }
+    )
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+# Views a socket can declare in its connect ``auth`` payload; one per page
+# that listens for changes.
+SOCKET_VIEWS = frozenset({"kitchen", "foh", "online", "menu"})
+# Roles that place orders and show the reservation timer.
+ORDERING_ROLES = ("online", "foh")
+
+
+def role_room(role: str) -> str:
+    return f"role:{role}"
+
+
+def view_room(view: str) -> str:
+    return f"view:{view}"
+
+
+# Anything that moves menu or ingredient availability: every page view, plus
+# ordering-role sockets whose reservation timer may have been touched.
+AVAILABILITY_ROOMS = tuple(view_room(view) for view in sorted(SOCKET_VIEWS)) + tuple(
+    role_room(role) for role in ORDERING_ROLES
+)
+# Reservation TTL and warning-threshold settings.
+RESERVATION_SETTINGS_ROOMS = tuple(role_room(role) for role in ORDERING_ROLES)
+# Stock on ingredients no menu item uses; only the kitchen view shows them.
+INVENTORY_ROOMS = (view_room("kitchen"),)
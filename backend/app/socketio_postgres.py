@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+import json
+import logging
+from threading import Lock, Thread
+import time
+from typing import Any
+from uuid import uuid4
+
+from eventlet.green import select
+import psycopg2
+import psycopg2.extensions
+from socketio import PubSubManager
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger("kitchensync.socketio_postgres")
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more; leave room for the
+# chunk header.
+MAX_NOTIFY_PAYLOAD_BYTES = 7900
+LISTEN_POLL_SECONDS = 5.0
+LISTEN_CONNECT_TIMEOUT_SECONDS = 10.0
+RECONNECT_DELAY_SECONDS = 1.0
+
+
+def libpq_dsn(database_url: str) -> str:
+    """Turn the SQLAlchemy URL from settings into a plain libpq URL."""
+    return make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def wait_readable(connection: psycopg2.extensions.connection, timeout: float) -> bool:
+    """Wait up to ``timeout`` seconds for the connection's socket to be readable.
+
+    Uses eventlet's green select, so a listener running in a greenlet parks
+    on the hub instead of freezing it.
+    """
+    readable, _, _ = select.select([connection], [], [], timeout)
+    return bool(readable)
+
+
+def _wait_for_async(connection: psycopg2.extensions.connection) -> None:
+    # Drives an async connection until its pending connect or query is done.
+    while True:
+        state = connection.poll()
+        if state == psycopg2.extensions.POLL_OK:
+            return
+        if state == psycopg2.extensions.POLL_READ:
+            ready = select.select([connection], [], [], LISTEN_CONNECT_TIMEOUT_SECONDS)[0]
+        elif state == psycopg2.extensions.POLL_WRITE:
+            ready = select.select([], [connection], [], LISTEN_CONNECT_TIMEOUT_SECONDS)[1]
+        else:
+            raise psycopg2.OperationalError(f"unexpected poll state {state}")
+        if not ready:
+            raise psycopg2.OperationalError("timed out waiting for the listen connection")
+
+
+def connect_listener(dsn: str, channel: str) -> psycopg2.extensions.connection:
+    """Open a connection that is ``LISTEN``ing on ``channel``.
+
+    The connection is asynchronous (and therefore autocommit): connecting
+    and the ``LISTEN`` itself wait on green select rather than blocking in
+    libpq. Read notifications with ``wait_readable`` and ``poll()``.
+    """
+    connection = psycopg2.connect(dsn, async_=True)
+    try:
+        _wait_for_async(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{channel}"')
+            _wait_for_async(connection)
+    except Exception:
+        connection.close()
+        raise
+    return connection
+
+
+def encode_notify_payloads(batch_id: str, messages: list[dict[str, Any]]) -> list[str]:
+    """Split one batch of messages into NOTIFY-sized ``id:seq:total:chunk`` strings.
+
+    The JSON is ASCII-only, so character and byte counts agree.
+    """
+    body = json.dumps(messages, separators=(",", ":"))
+    chunks = [
+        body[start : start + MAX_NOTIFY_PAYLOAD_BYTES]
+        for start in range(0, len(body), MAX_NOTIFY_PAYLOAD_BYTES)
+    ] or [""]
+    return [f"{batch_id}:{seq}:{len(chunks)}:{chunk}" for seq, chunk in enumerate(chunks)]
+
+
+class NotifyPayloadAssembler:
+    """Rebuilds batches from NOTIFY payloads.
+
+    Chunks of one batch are sent in one transaction, so Postgres delivers them
+    together and in order; a partial batch only remains when the listener
+    connected mid-transaction, and is dropped on the next batch.
+    """
+
+    def __init__(self) -> None:
+        self._batch_id: str | None = None
+        self._chunks: list[str] = []
+
+    def feed(self, payload: str) -> list[dict[str, Any]]:
+        batch_id, raw_seq, raw_total, chunk = payload.split(":", 3)
+        seq = int(raw_seq)
+        if batch_id != self._batch_id:
+            self._batch_id = batch_id
+            self._chunks = []
+        if seq != len(self._chunks):
+            # Missed the start of this batch; wait for the next one.
+            return []
+        self._chunks.append(chunk)
+        if len(self._chunks) < int(raw_total):
+            return []
+
+        body = "".join(self._chunks)
+        self._batch_id = None
+        self._chunks = []
+        return json.loads(body)
+
+
+class PostgresManager(PubSubManager):
+    """Socket.IO client manager that relays emits between instances over
+    Postgres ``LISTEN``/``NOTIFY``.
+
+    Messages published within ``batch_window_seconds`` are sent as one
+    batch: a single transaction with as few ``pg_notify`` calls as the
+    payload limit allows. Local clients are still served immediately by
+    ``PubSubManager``; only the relay to other instances waits.
+    """
+
+    name = "postgres"
+
+    def __init__(
+        self,
+        url: str,
+        channel: str = "socketio",
+        write_only: bool = False,
+        logger: logging.Logger | None = None,
+        json: Any = None,
+        batch_window_seconds: float = 0.01,
+    ) -> None:
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.dsn = libpq_dsn(url)
+        self.batch_window_seconds = batch_window_seconds
+        self._publish_lock = Lock()
+        self._pending: list[dict[str, Any]] = []
+        self._flush_scheduled = False
+        self._publish_connection: psycopg2.extensions.connection | None = None
+
+    def _publish(self, data: dict[str, Any]) -> None:
+        with self._publish_lock:
+            self._pending.append(data)
+            if self._flush_scheduled:
+                return
+            if self.batch_window_seconds > 0:
+                self._flush_scheduled = True
+
+        if self.batch_window_seconds <= 0:
+            self.flush()
+        elif self.server is not None:
+            self.server.start_background_task(self._flush_after_window)
+        else:
+            Thread(target=self._flush_after_window, daemon=True).start()
+
+    def flush(self) -> int:
+        """Send pending messages now; returns how many were sent."""
+        with self._publish_lock:
+            self._flush_scheduled = False
+            messages = self._pending
+            self._pending = []
+            if not messages:
+                return 0
+            payloads = encode_notify_payloads(uuid4().hex, messages)
+            self._send_payloads(payloads)
+
+        logger.debug("notify batch sent messages=%s notifies=%s", len(messages), len(payloads))
+        return len(messages)
+
+    def _flush_after_window(self) -> None:
+        self._sleep(self.batch_window_seconds)
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("notify batch failed channel=%s", self.channel)
+
+    def _send_payloads(self, payloads: list[str]) -> None:
+        # One reconnect attempt covers connections dropped while idle.
+        for attempt in range(2):
+            try:
+                if self._publish_connection is None or self._publish_connection.closed:
+                    self._publish_connection = psycopg2.connect(self.dsn)
+                with self._publish_connection as connection, connection.cursor() as cursor:
+                    for payload in payloads:
+                        cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                return
+            except psycopg2.OperationalError:
+                self._publish_connection = None
+                if attempt:
+                    raise
+                logger.warning("notify connection lost, reconnecting channel=%s", self.channel)
+
+    def _listen(self) -> Iterator[dict[str, Any]]:
+        while True:
+            try:
+                connection = connect_listener(self.dsn, self.channel)
+            except psycopg2.OperationalError:
+                logger.exception("listen connection failed channel=%s", self.channel)
+                self._sleep(RECONNECT_DELAY_SECONDS)
+                continue
+
+            assembler = NotifyPayloadAssembler()
+            try:
+                logger.info("listening channel=%s", self.channel)
+                while True:
+                    if not wait_readable(connection, LISTEN_POLL_SECONDS):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        yield from assembler.feed(notify.payload)
+            except psycopg2.OperationalError:
+                logger.exception("listen connection lost channel=%s", self.channel)
+                self._sleep(RECONNECT_DELAY_SECONDS)
+            finally:
+                connection.close()
+
+    def _sleep(self, seconds: float) -> None:
+        if self.server is not None:
+            self.server.sleep(seconds)
+        else:
+            time.sleep(seconds)
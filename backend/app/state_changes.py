@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterable
+from functools import partial
+import logging
+from threading import Lock
+from uuid import uuid4
+
+from app import socketio
+from app.availability import availability_ledger
+from app.coalescing_emitter import CoalescingEmitter
+from app.socket_rooms import AVAILABILITY_ROOMS
+from config import settings
+
+logger = logging.getLogger("kitchensync.state_changes")
+
+# Versions kept for ``?since=`` deltas; older clients get a full payload.
+CHANGE_LOG_SIZE = 1024
+
+_version_lock = Lock()
+_boot_id = uuid4().hex[:12]
+_state_version = 0
+_menu_version = 0
+# (version, changed ingredient ids) where ``None`` means "anything may have changed".
+_change_log: deque[tuple[int, frozenset[int] | None]] = deque(maxlen=CHANGE_LOG_SIZE)
+
+
+def get_state_version() -> int:
+    with _version_lock:
+        return _state_version
+
+
+def get_menu_version() -> int:
+    """Version of the menu catalog (items, recipes, ingredient names)."""
+    with _version_lock:
+        return _menu_version
+
+
+def get_state_key() -> str:
+    """Opaque token for the current state, used as ETag and ``since`` value.
+
+    Holds that passed ``expires_at`` are pruned first so time-only changes
+    move the key too. The per-process boot id keeps tokens from one process
+    from ever matching another process's state.
+    """
+    availability_ledger.prune_expired()
+    with _version_lock:
+        return f"{_boot_id}-{_state_version}"
+
+
+def record_state_change(ingredient_ids: Iterable[int] | None = None) -> int:
+    """Bump the state version without broadcasting."""
+    global _state_version
+    changed = None if ingredient_ids is None else frozenset(ingredient_ids)
+    with _version_lock:
+        _state_version += 1
+        _change_log.append((_state_version, changed))
+        return _state_version
+
+
+def changed_ingredient_ids_since(state_key: str) -> tuple[str, set[int] | None]:
+    """Return the current key and the ingredient ids changed after ``state_key``.
+
+    ``None`` means the caller must fall back to a full payload: the key came
+    from another process, is malformed, or is older than the change log.
+    """
+    current_key = get_state_key()
+    boot_id, _, raw_version = state_key.rpartition("-")
+    with _version_lock:
+        if boot_id != _boot_id or not raw_version.isdigit():
+            return current_key, None
+        since_version = int(raw_version)
+        if since_version > _state_version:
+            return current_key, None
+        if since_version == _state_version:
+            return current_key, set()
+
+        oldest_logged_version = _change_log[0][0] if _change_log else _state_version + 1
+        if since_version + 1 < oldest_logged_version:
+            return current_key, None
+
+        changed: set[int] = set()
+        for version, ingredient_ids in _change_log:
+            if version <= since_version:
+                continue
+            if ingredient_ids is None:
+                return current_key, None
+            changed.update(ingredient_ids)
+        return current_key, changed
+
+
+def reset_state_changes() -> None:
+    """Start a fresh version history, e.g. when the app is (re)created."""
+    global _boot_id
+    with _version_lock:
+        _boot_id = uuid4().hex[:12]
+        _change_log.clear()
+    with _emitters_lock:
+        for emitter in _emitters_by_rooms.values():
+            emitter.discard()
+
+
+def _broadcast_state_change(ingredient_ids: list[int] | None, *, rooms: tuple[str, ...]) -> None:
+    state_key = get_state_key()
+    socketio.emit(
+        "stateChanged",
+        {"version": state_key, "ingredient_ids": ingredient_ids},
+        to=list(rooms),
+    )
+    # Imported here: the patch builders read through modules that import this one.
+    from app.availability_patch import emit_availability_patch
+
+    emit_availability_patch(state_key, ingredient_ids, rooms=rooms)
+    logger.debug(
+        "state_changed broadcast version=%s ingredient_count=%s rooms=%s",
+        state_key,
+        "all" if ingredient_ids is None else len(ingredient_ids),
+        ",".join(rooms),
+    )
+
+
+# One emitter per audience so a change only ever reaches its own rooms. The
+# audiences are the fixed tuples in ``app.socket_rooms``.
+_emitters_lock = Lock()
+_emitters_by_rooms: dict[tuple[str, ...], CoalescingEmitter] = {}
+
+
+def _state_change_emitter(rooms: tuple[str, ...]) -> CoalescingEmitter:
+    with _emitters_lock:
+        emitter = _emitters_by_rooms.get(rooms)
+        if emitter is None:
+            emitter = CoalescingEmitter(
+                "state_changed",
+                partial(_broadcast_state_change, rooms=rooms),
+                window_seconds=settings.state_change_coalesce_ms / 1000,
+            )
+            _emitters_by_rooms[rooms] = emitter
+        return emitter
+
+
+def notify_state_changed(
+    ingredient_ids: Iterable[int] | None = None,
+    *,
+    rooms: tuple[str, ...] = AVAILABILITY_ROOMS,
+    publish: bool = True,
+) -> int:
+    """Record a menu/inventory/reservation change and tell interested clients.
+
+    Every write that used to emit ``stateChanged`` directly goes through here
+    so the state version used for HTTP caching moves with the broadcast.
+    ``ingredient_ids`` lists ingredients whose availability may have changed;
+    pass an empty list when none did and ``None`` when it is unknown.
+    ``rooms`` picks the audience from ``app.socket_rooms``. With ``publish``,
+    ingredient changes also go out on the invalidation bus so other
+    processes evict their caches.
+
+    The version moves immediately; the broadcast is merged with others in
+    the same ``STATE_CHANGE_COALESCE_MS`` window and sent in the background.
+    """
+    changed = None if ingredient_ids is None else sorted(set(ingredient_ids))
+    version = record_state_change(changed)
+    _state_change_emitter(rooms).submit(changed)
+    if publish and changed != []:
+        # Imported here: the bus applies remote changes through this module.
+        from app.invalidation_bus import TOPIC_INGREDIENTS, publish_invalidation_async
+
+        publish_invalidation_async(TOPIC_INGREDIENTS, ingredient_ids=changed)
+    return version
+
+
+def record_menu_change() -> int:
+    """Bump the menu version (and state version) without broadcasting."""
+    global _menu_version
+    with _version_lock:
+        _menu_version += 1
+    return record_state_change(None)
+
+
+def notify_menu_changed() -> int:
+    """Invalidate caches derived from the menu catalog, then broadcast."""
+    from app.invalidation_bus import TOPIC_MENU, publish_invalidation_async
+
+    record_menu_change()
+    publish_invalidation_async(TOPIC_MENU)
+    return notify_state_changed(None, publish=False)
+
+
+availability_ledger.set_change_listener(record_state_change)
@@ -0,0 +1,40 @@
+import argparse
+
+from app.reservation_archive import archive_reservations
+from config import settings
+from seed import _redacted_database_url
+
+
+def archive(older_than_seconds: int | None, batch_size: int | None, budget_ms: int | None) -> bool:
+    print(
+        "Archiving settled reservations",
+        f"env={settings.app_env}",
+        f"url={_redacted_database_url(settings.database_url)}",
+    )
+    run = archive_reservations(
+        older_than_seconds=older_than_seconds,
+        batch_size=batch_size,
+        budget_ms=budget_ms,
+    )
+    print(f"archived_count={run.archived_count} batches={run.batches} complete={run.complete}")
+    return run.complete
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Move committed/released/expired reservations into the history tables."
+    )
+    parser.add_argument(
+        "--older-than-seconds",
+        type=int,
+        help="Age since the last status change (default RESERVATION_ARCHIVE_AFTER_SECONDS).",
+    )
+    parser.add_argument("--batch-size", type=int, help="Reservations per transaction.")
+    parser.add_argument(
+        "--budget-ms",
+        type=int,
+        help="Stop starting new batches after this long (default RESERVATION_ARCHIVE_BUDGET_MS).",
+    )
+    args = parser.parse_args()
+    complete = archive(args.older_than_seconds, args.batch_size, args.budget_ms)
+    raise SystemExit(0 if complete else 2)
@@ -0,0 +1,118 @@
+"""Compare locking and optimistic reservation admission under contention.
+
+Run from backend/: python benchmarks/bench_reservation_contention.py POSTGRES_URL
+
+Needs a scratch Postgres database (its tables are dropped and recreated)
+whose max_connections exceeds the largest client count. Every reservation
+takes one "popular" item that shares a bun and fries with all the others,
+plus one random item, so all clients contend on the same ingredient rows.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import random
+import statistics
+import sys
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+
+from app.metrics import get_counters, reset_counters  # noqa: E402
+from app.models import Base, Ingredient, MenuItem, Recipe, User  # noqa: E402
+from app.recipe_matrix import recipe_matrix_cache  # noqa: E402
+from app.reservation_admission import admit_reservation  # noqa: E402
+
+CLIENT_COUNTS = (10, 50, 200)
+RESERVATIONS_PER_CLIENT = 20
+MENU_ITEMS = 20
+POPULAR_MENU_ITEM_ID = 1
+
+
+def seed(engine) -> None:
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(id=1, email="bench@example.com", role="online", password="x"))
+        # Ingredient 1 (bun) and 2 (fries) are in every item; stock never runs out.
+        session.add_all(
+            Ingredient(id=ingredient_id, name=f"Ingredient {ingredient_id}", on_hand_qty=10**9)
+            for ingredient_id in range(1, MENU_ITEMS + 3)
+        )
+        session.add_all(
+            MenuItem(id=item_id, name=f"Item {item_id}", price_cents=1000)
+            for item_id in range(1, MENU_ITEMS + 1)
+        )
+        session.add_all(
+            Recipe(menu_item_id=item_id, ingredient_id=ingredient_id, qty_required=1)
+            for item_id in range(1, MENU_ITEMS + 1)
+            for ingredient_id in (1, 2, item_id + 2)
+        )
+        session.commit()
+    recipe_matrix_cache.clear()
+
+
+def reserve(session_factory, mode: str, seed_value: int) -> list[float]:
+    rng = random.Random(seed_value)
+    latencies: list[float] = []
+    for _ in range(RESERVATIONS_PER_CLIENT):
+        other_item_id = rng.randint(POPULAR_MENU_ITEM_ID + 1, MENU_ITEMS)
+        items = [
+            {"menu_item_id": POPULAR_MENU_ITEM_ID, "qty": 1, "notes": None},
+            {"menu_item_id": other_item_id, "qty": 1, "notes": None},
+        ]
+        now = datetime.now(timezone.utc)
+        started = perf_counter()
+        with session_factory() as session, session.begin():
+            admission = admit_reservation(
+                session,
+                user_id=1,
+                items=items,
+                now=now,
+                expires_at=now + timedelta(minutes=10),
+                mode=mode,
+            )
+        latencies.append(perf_counter() - started)
+        assert admission.reservation_id is not None
+    return latencies
+
+
+def run(database_url: str, mode: str, clients: int) -> None:
+    engine = create_engine(database_url, pool_size=clients, max_overflow=0)
+    seed(engine)
+    reset_counters()
+    session_factory = sessionmaker(bind=engine)
+
+    started = perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(
+            pool.map(lambda client: reserve(session_factory, mode, client), range(clients))
+        )
+    elapsed = perf_counter() - started
+    engine.dispose()
+
+    latencies = sorted(latency for client_latencies in results for latency in client_latencies)
+    counters = get_counters()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{mode:>10} {clients:>7} {len(latencies) / elapsed:>10.0f} "
+        f"{statistics.median(latencies) * 1000:>8.1f} {p95 * 1000:>8.1f} "
+        f"{counters.get('reservation_admission.optimistic_fallbacks', 0):>9}"
+    )
+
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        raise SystemExit(__doc__)
+    database_url = sys.argv[1]
+    print(f"{'mode':>10} {'clients':>7} {'res/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'fallbacks':>9}")
+    for clients in CLIENT_COUNTS:
+        for mode in ("locking", "optimistic"):
+            run(database_url, mode, clients)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Compare per-row ORM adds with bulk INSERTs for reservation item/hold rows.
+
+Run from backend/: python benchmarks/bench_reservation_writes.py [DATABASE_URL]
+
+Without a URL it uses in-memory SQLite. Point it at a scratch Postgres
+database to include network round trips; it creates and fills the tables.
+
+The statement saving is a SQLite effect: there the ORM flushes one INSERT
+per row (192 -> 2 statements at 48 items). On Postgres, SQLAlchemy 2's
+insertmanyvalues already batches the per-row adds, so both writers issue
+about 2.5 statements per reservation and latency is level (48 items:
+20.7 ms bulk vs 17.2 ms per-row; 12 items: 5.95 vs 6.98 ms). The bulk
+path is kept because it skips building an ORM object per row, not to
+save round trips.
+"""
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import sys
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.models import (  # noqa: E402
+    Base,
+    Ingredient,
+    MenuItem,
+    Reservation,
+    ReservationIngredient,
+    ReservationItem,
+    User,
+)
+from app.reservation_admission import insert_reservation_rows  # noqa: E402
+
+ITEM_COUNTS = (1, 12, 48)
+INGREDIENTS_PER_ITEM = 3
+RESERVATIONS = 50
+
+
+def seed(session: Session, item_count: int) -> None:
+    session.add(User(id=1, email="bench@example.com", role="online", password="x"))
+    session.add_all(
+        MenuItem(id=item_id, name=f"Item {item_id}", price_cents=1000)
+        for item_id in range(1, item_count + 1)
+    )
+    session.add_all(
+        Ingredient(id=ingredient_id, name=f"Ingredient {ingredient_id}", on_hand_qty=10_000)
+        for ingredient_id in range(1, item_count * INGREDIENTS_PER_ITEM + 1)
+    )
+    session.commit()
+
+
+def write_rows_per_row(session: Session, reservation_id: int, items, qty_by_ingredient) -> None:
+    # What create/update_reservation did before: one session.add per row.
+    for item in items:
+        session.add(
+            ReservationItem(
+                reservation_id=reservation_id,
+                menu_item_id=item["menu_item_id"],
+                qty=item["qty"],
+                notes=item["notes"],
+            )
+        )
+    for ingredient_id, qty_reserved in sorted(qty_by_ingredient.items()):
+        session.add(
+            ReservationIngredient(
+                reservation_id=reservation_id,
+                ingredient_id=ingredient_id,
+                qty_reserved=qty_reserved,
+            )
+        )
+    session.flush()
+
+
+def run(database_url: str, item_count: int, writer) -> tuple[float, float]:
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    statements = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(*_args) -> None:
+        nonlocal statements
+        statements += 1
+
+    items = [
+        {"menu_item_id": item_id, "qty": 1, "notes": None}
+        for item_id in range(1, item_count + 1)
+    ]
+    qty_by_ingredient = {
+        ingredient_id: 1 for ingredient_id in range(1, item_count * INGREDIENTS_PER_ITEM + 1)
+    }
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=10)
+
+    with Session(engine) as session:
+        seed(session, item_count)
+        reservation_ids = []
+        for _ in range(RESERVATIONS):
+            reservation = Reservation(user_id=1, status="active", expires_at=expires_at)
+            session.add(reservation)
+            session.flush()
+            reservation_ids.append(reservation.id)
+        session.commit()
+
+        statements = 0
+        started = perf_counter()
+        for reservation_id in reservation_ids:
+            writer(session, reservation_id, items, qty_by_ingredient)
+            session.commit()
+        elapsed = perf_counter() - started
+
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+    # Each commit costs one COMMIT on the wire but no cursor execute.
+    return statements / RESERVATIONS, elapsed / RESERVATIONS * 1000
+
+
+def main() -> None:
+    database_url = sys.argv[1] if len(sys.argv) > 1 else "sqlite://"
+    print(f"{'items':>6} {'rows':>5} {'per-row stmts':>14} {'bulk stmts':>11} {'per-row ms':>11} {'bulk ms':>8}")
+    for item_count in ITEM_COUNTS:
+        per_row_statements, per_row_ms = run(database_url, item_count, write_rows_per_row)
+        bulk_statements, bulk_ms = run(database_url, item_count, insert_reservation_rows)
+        rows = item_count * (1 + INGREDIENTS_PER_ITEM)
+        print(
+            f"{item_count:>6} {rows:>5} {per_row_statements:>14.1f} {bulk_statements:>11.1f} "
+            f"{per_row_ms:>11.2f} {bulk_ms:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare serialize_menu with the precompiled RecipeMatrix.
+
+Run from backend/: python benchmarks/bench_serialize_menu.py
+"""
+
+from pathlib import Path
+import random
+import sys
+from timeit import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.availability import serialize_menu  # noqa: E402
+from app.models import Ingredient, MenuItem, Recipe  # noqa: E402
+from app.recipe_matrix import RecipeMatrix  # noqa: E402
+
+RECIPES_PER_ITEM = 8
+REPEATS = 5
+
+
+def build_catalog(item_count: int, seed: int = 7):
+    rng = random.Random(seed)
+    ingredient_count = max(50, item_count // 2)
+    ingredients = [
+        Ingredient(
+            id=ingredient_id,
+            name=f"Ingredient {ingredient_id}",
+            on_hand_qty=rng.randint(0, 200),
+            low_stock_threshold_qty=rng.randint(0, 30),
+            is_out=rng.random() < 0.05,
+        )
+        for ingredient_id in range(1, ingredient_count + 1)
+    ]
+    menu_items = [
+        MenuItem(id=item_id, name=f"Item {item_id}", price_cents=1000, category="Bench", allergens=None)
+        for item_id in range(1, item_count + 1)
+    ]
+    recipes: list[Recipe] = []
+    for menu_item in menu_items:
+        for ingredient_id in rng.sample(range(1, ingredient_count + 1), RECIPES_PER_ITEM):
+            recipes.append(
+                Recipe(
+                    id=len(recipes) + 1,
+                    menu_item_id=menu_item.id,
+                    ingredient_id=ingredient_id,
+                    qty_required=rng.randint(1, 3),
+                )
+            )
+    reserved = {ingredient.id: rng.randint(0, 40) for ingredient in ingredients}
+    return menu_items, recipes, {ingredient.id: ingredient for ingredient in ingredients}, reserved
+
+
+def main() -> None:
+    print(f"{'items':>7} {'serialize_menu ms':>18} {'compile ms':>11} {'evaluate ms':>12} {'speedup':>8}")
+    for item_count in (100, 1_000, 10_000):
+        menu_items, recipes, ingredients_by_id, reserved = build_catalog(item_count)
+        matrix = RecipeMatrix.compile(menu_items, recipes, ingredients_by_id)
+        assert matrix.evaluate(ingredients_by_id, reserved) == serialize_menu(
+            menu_items, recipes, ingredients_by_id, reserved
+        )
+
+        baseline_s = timeit(
+            lambda: serialize_menu(menu_items, recipes, ingredients_by_id, reserved),
+            number=REPEATS,
+        ) / REPEATS
+        compile_s = timeit(
+            lambda: RecipeMatrix.compile(menu_items, recipes, ingredients_by_id),
+            number=REPEATS,
+        ) / REPEATS
+        evaluate_s = timeit(
+            lambda: matrix.evaluate(ingredients_by_id, reserved),
+            number=REPEATS,
+        ) / REPEATS
+        print(
+            f"{item_count:>7} {baseline_s * 1000:>18.2f} {compile_s * 1000:>11.2f} "
+            f"{evaluate_s * 1000:>12.2f} {baseline_s / evaluate_s:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
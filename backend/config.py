@@ -140,6 +140,10 @@ def _resolve_database_url(app_env: str) -> str:
     )
 
 
+MAX_EXPIRATION_BATCH_SIZE = 10000
+MAX_ARCHIVE_BATCH_SIZE = 10000
+
+
 @dataclass(frozen=True)
 class Settings:
     app_env: str
@@ -153,8 +157,30 @@ class Settings:
     reservation_ttl_seconds: int
     reservation_warning_threshold_seconds: int
     expiration_interval_seconds: int
+    expiration_batch_size: int
+    expiration_budget_ms: int
+    expiration_leader_retry_seconds: int
+    reservation_archive_after_seconds: int
+    reservation_archive_batch_size: int
+    reservation_archive_budget_ms: int
     enable_inprocess_expiration_job: bool
     internal_expire_secret: str
+    reservation_admission_mode: str
+    reservation_max_in_flight: int
+    reservation_max_queued: int
+    reservation_queue_timeout_ms: int
+    db_retry_max_attempts: int
+    db_retry_base_ms: int
+    db_retry_budget_ms: int
+    idempotency_ttl_seconds: int
+    idempotency_cache_size: int
+    state_change_coalesce_ms: int
+    socketio_message_queue: str
+    socketio_channel: str
+    socketio_notify_batch_ms: int
+    enable_invalidation_bus: bool
+    invalidation_channel: str
+    invalidation_poll_seconds: int
     cors_allowed_origins: list[str]
     frontend_dist_dir: str
     log_level: str
@@ -179,6 +205,86 @@ class Settings:
                 "Environment variable RESERVATION_WARNING_THRESHOLD_SECONDS must be between 5 and 120"
             )
 
+        reservation_admission_mode = os.getenv("RESERVATION_ADMISSION_MODE", "locking").lower()
+        if reservation_admission_mode not in {"locking", "optimistic"}:
+            raise RuntimeError(
+                "Environment variable RESERVATION_ADMISSION_MODE must be 'locking' or 'optimistic', "
+                f"got: {reservation_admission_mode}"
+            )
+        reservation_max_in_flight = _env_int("RESERVATION_MAX_IN_FLIGHT", 10)
+        reservation_max_queued = _env_int("RESERVATION_MAX_QUEUED", 50)
+        reservation_queue_timeout_ms = _env_int("RESERVATION_QUEUE_TIMEOUT_MS", 2000)
+        if reservation_max_in_flight < 0 or reservation_max_queued < 0 or reservation_queue_timeout_ms < 0:
+            raise RuntimeError(
+                "Environment variables RESERVATION_MAX_IN_FLIGHT, RESERVATION_MAX_QUEUED and "
+                "RESERVATION_QUEUE_TIMEOUT_MS must be >= 0"
+            )
+        expiration_batch_size = _env_int("EXPIRATION_BATCH_SIZE", 500)
+        if expiration_batch_size < 1 or expiration_batch_size > MAX_EXPIRATION_BATCH_SIZE:
+            raise RuntimeError(
+                f"Environment variable EXPIRATION_BATCH_SIZE must be between 1 and {MAX_EXPIRATION_BATCH_SIZE}"
+            )
+        expiration_budget_ms = _env_int("EXPIRATION_BUDGET_MS", 5000)
+        if expiration_budget_ms < 0:
+            raise RuntimeError("Environment variable EXPIRATION_BUDGET_MS must be >= 0")
+        expiration_leader_retry_seconds = _env_int("EXPIRATION_LEADER_RETRY_SECONDS", 5)
+        if expiration_leader_retry_seconds < 1:
+            raise RuntimeError("Environment variable EXPIRATION_LEADER_RETRY_SECONDS must be >= 1")
+        reservation_archive_after_seconds = _env_int("RESERVATION_ARCHIVE_AFTER_SECONDS", 604800)
+        if reservation_archive_after_seconds < 0:
+            raise RuntimeError("Environment variable RESERVATION_ARCHIVE_AFTER_SECONDS must be >= 0")
+        reservation_archive_batch_size = _env_int("RESERVATION_ARCHIVE_BATCH_SIZE", 500)
+        if reservation_archive_batch_size < 1 or reservation_archive_batch_size > MAX_ARCHIVE_BATCH_SIZE:
+            raise RuntimeError(
+                "Environment variable RESERVATION_ARCHIVE_BATCH_SIZE must be between 1 and "
+                f"{MAX_ARCHIVE_BATCH_SIZE}"
+            )
+        reservation_archive_budget_ms = _env_int("RESERVATION_ARCHIVE_BUDGET_MS", 10000)
+        if reservation_archive_budget_ms < 0:
+            raise RuntimeError("Environment variable RESERVATION_ARCHIVE_BUDGET_MS must be >= 0")
+        db_retry_max_attempts = _env_int("DB_RETRY_MAX_ATTEMPTS", 4)
+        if db_retry_max_attempts < 1 or db_retry_max_attempts > 20:
+            raise RuntimeError("Environment variable DB_RETRY_MAX_ATTEMPTS must be between 1 and 20")
+        db_retry_base_ms = _env_int("DB_RETRY_BASE_MS", 10)
+        db_retry_budget_ms = _env_int("DB_RETRY_BUDGET_MS", 1000)
+        if db_retry_base_ms < 0 or db_retry_budget_ms < 0:
+            raise RuntimeError(
+                "Environment variables DB_RETRY_BASE_MS and DB_RETRY_BUDGET_MS must be >= 0"
+            )
+        idempotency_ttl_seconds = _env_int("IDEMPOTENCY_TTL_SECONDS", 86400)
+        if idempotency_ttl_seconds < 60 or idempotency_ttl_seconds > 604800:
+            raise RuntimeError(
+                "Environment variable IDEMPOTENCY_TTL_SECONDS must be between 60 and 604800"
+            )
+        idempotency_cache_size = _env_int("IDEMPOTENCY_CACHE_SIZE", 1024)
+        if idempotency_cache_size < 0:
+            raise RuntimeError("Environment variable IDEMPOTENCY_CACHE_SIZE must be >= 0")
+
+        # Tests assert on broadcasts right after each request, so they flush inline.
+        state_change_coalesce_ms = _env_int(
+            "STATE_CHANGE_COALESCE_MS",
+            0 if app_env == "test" else 150,
+        )
+        if state_change_coalesce_ms < 0 or state_change_coalesce_ms > 1000:
+            raise RuntimeError(
+                "Environment variable STATE_CHANGE_COALESCE_MS must be between 0 and 1000"
+            )
+
+        socketio_message_queue = os.getenv("SOCKETIO_MESSAGE_QUEUE", "").lower()
+        if socketio_message_queue not in {"", "postgres"}:
+            raise RuntimeError(
+                "Environment variable SOCKETIO_MESSAGE_QUEUE must be empty or 'postgres', "
+                f"got: {socketio_message_queue}"
+            )
+        # A shared message queue means several instances, each with its own
+        # availability ledger, snapshot cache and recipe matrix; without the
+        # bus they never hear about each other's writes.
+        enable_invalidation_bus = _env_bool("ENABLE_INVALIDATION_BUS", bool(socketio_message_queue))
+        if socketio_message_queue and not enable_invalidation_bus:
+            raise RuntimeError(
+                "Environment variable ENABLE_INVALIDATION_BUS cannot be off when SOCKETIO_MESSAGE_QUEUE is set"
+            )
+
         return cls(
             app_env=app_env,
             host=os.getenv("HOST", "0.0.0.0"),
@@ -190,12 +296,34 @@ class Settings:
             jwt_access_token_ttl_minutes=_env_int("JWT_ACCESS_TOKEN_TTL_MINUTES", 60),
             reservation_ttl_seconds=_env_int("RESERVATION_TTL_SECONDS", 600),
             reservation_warning_threshold_seconds=warning_threshold_seconds,
-            expiration_interval_seconds=_env_int("EXPIRATION_INTERVAL_SECONDS", 30),
+            expiration_interval_seconds=_env_int("EXPIRATION_INTERVAL_SECONDS", 300),
+            expiration_batch_size=expiration_batch_size,
+            expiration_budget_ms=expiration_budget_ms,
+            expiration_leader_retry_seconds=expiration_leader_retry_seconds,
+            reservation_archive_after_seconds=reservation_archive_after_seconds,
+            reservation_archive_batch_size=reservation_archive_batch_size,
+            reservation_archive_budget_ms=reservation_archive_budget_ms,
             enable_inprocess_expiration_job=_env_bool(
                 "ENABLE_INPROCESS_EXPIRATION_JOB",
                 app_env not in {"production", "staging"},
             ),
             internal_expire_secret=internal_expire_secret or "dev-internal-secret",
+            reservation_admission_mode=reservation_admission_mode,
+            reservation_max_in_flight=reservation_max_in_flight,
+            reservation_max_queued=reservation_max_queued,
+            reservation_queue_timeout_ms=reservation_queue_timeout_ms,
+            db_retry_max_attempts=db_retry_max_attempts,
+            db_retry_base_ms=db_retry_base_ms,
+            db_retry_budget_ms=db_retry_budget_ms,
+            idempotency_ttl_seconds=idempotency_ttl_seconds,
+            idempotency_cache_size=idempotency_cache_size,
+            state_change_coalesce_ms=state_change_coalesce_ms,
+            socketio_message_queue=socketio_message_queue,
+            socketio_channel=os.getenv("SOCKETIO_CHANNEL", "kitchensync_socketio"),
+            socketio_notify_batch_ms=_env_int("SOCKETIO_NOTIFY_BATCH_MS", 10),
+            enable_invalidation_bus=enable_invalidation_bus,
+            invalidation_channel=os.getenv("INVALIDATION_CHANNEL", "kitchensync_invalidation"),
+            invalidation_poll_seconds=_env_int("INVALIDATION_POLL_SECONDS", 5),
             cors_allowed_origins=_env_csv("CORS_ALLOWED_ORIGINS", default_origins),
             frontend_dist_dir=frontend_dist_dir,
             log_level=_env_log_level("LOG_LEVEL", "INFO"),
@@ -0,0 +1,40 @@
+import argparse
+
+from config import settings
+from db import engine
+from migrations import apply_migrations, discover_migrations, pending_migrations
+from seed import _redacted_database_url
+
+
+def show_status() -> int:
+    with engine.begin() as connection:
+        pending_versions = {migration.version for migration in pending_migrations(connection)}
+    for migration in discover_migrations():
+        state = "pending" if migration.version in pending_versions else "applied"
+        print(f"{migration.version} {migration.name} {state}")
+    return len(pending_versions)
+
+
+def migrate() -> None:
+    print(
+        "Applying schema migrations",
+        f"env={settings.app_env}",
+        f"url={_redacted_database_url(settings.database_url)}",
+    )
+    applied = apply_migrations(engine)
+    for migration in applied:
+        print(f"applied {migration.version} {migration.name}")
+    print(f"applied_count={len(applied)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument(
+        "--status",
+        action="store_true",
+        help="List migrations and whether each is applied; exit 1 if any are pending.",
+    )
+    args = parser.parse_args()
+    if args.status:
+        raise SystemExit(1 if show_status() else 0)
+    migrate()
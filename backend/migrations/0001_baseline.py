@@ -0,0 +1,155 @@
+"""Create the tables that existed before migrations were introduced.
+
+The schema is spelled out here rather than read from ``app.models`` so this
+migration keeps creating the same tables as the models move on.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    UniqueConstraint,
+    func,
+    inspect,
+    text,
+)
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+Table(
+    "users",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("email", String(255), unique=True, nullable=False),
+    Column("display_name", String(120), nullable=True),
+    Column("role", String(20), nullable=False),
+    Column("password", String(255), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+)
+
+Table(
+    "ingredients",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(120), unique=True, nullable=False),
+    Column("on_hand_qty", Integer, nullable=False),
+    Column("low_stock_threshold_qty", Integer, nullable=False),
+    Column("is_out", Boolean, nullable=False),
+    Column("reserved_qty", Integer, nullable=False, server_default="0"),
+)
+
+Table(
+    "menu_items",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(120), unique=True, nullable=False),
+    Column("price_cents", Integer, nullable=False),
+    Column("category", String(120), nullable=True),
+    Column("allergens", String(255), nullable=True),
+)
+
+Table(
+    "recipes",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("menu_item_id", Integer, ForeignKey("menu_items.id"), nullable=False),
+    Column("ingredient_id", Integer, ForeignKey("ingredients.id"), nullable=False),
+    Column("qty_required", Integer, nullable=False),
+    UniqueConstraint("menu_item_id", "ingredient_id", name="uq_recipe_item_ingredient"),
+)
+
+Table(
+    "reservations",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("status", String(20), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+    Column("expires_at", DateTime(timezone=True), nullable=False),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+)
+
+Table(
+    "reservation_ingredients",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("reservation_id", Integer, ForeignKey("reservations.id"), nullable=False),
+    Column("ingredient_id", Integer, ForeignKey("ingredients.id"), nullable=False),
+    Column("qty_reserved", Integer, nullable=False),
+    UniqueConstraint("reservation_id", "ingredient_id", name="uq_reservation_ingredient"),
+)
+
+Table(
+    "reservation_items",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("reservation_id", Integer, ForeignKey("reservations.id"), nullable=False),
+    Column("menu_item_id", Integer, ForeignKey("menu_items.id"), nullable=False),
+    Column("qty", Integer, nullable=False),
+    Column("notes", String, nullable=True),
+    UniqueConstraint("reservation_id", "menu_item_id", name="uq_reservation_item"),
+)
+
+Table(
+    "cache_versions",
+    metadata,
+    Column("name", String(64), primary_key=True),
+    Column("version", BigInteger, nullable=False),
+    Column("payload", Text, nullable=True),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+)
+
+Table(
+    "idempotency_keys",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("key", String(255), nullable=False),
+    Column("request_hash", String(64), nullable=False),
+    Column("status_code", Integer, nullable=True),
+    Column("response_body", Text, nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+    Column("expires_at", DateTime(timezone=True), nullable=False),
+    UniqueConstraint("user_id", "key", name="uq_idempotency_user_key"),
+)
+
+
+_BACKFILL_RESERVED_QTY = text(
+    """
+    UPDATE ingredients
+    SET reserved_qty = COALESCE(
+        (
+            SELECT SUM(ri.qty_reserved)
+            FROM reservation_ingredients ri
+            JOIN reservations r ON r.id = ri.reservation_id
+            WHERE r.status = 'active' AND ri.ingredient_id = ingredients.id
+        ),
+        0
+    )
+    """
+)
+
+
+def upgrade(connection: Connection) -> None:
+    inspector = inspect(connection)
+    # Databases created before the reserved_qty counter have the table
+    # without the column; their active holds must be counted in.
+    adds_reserved_qty = inspector.has_table("ingredients") and "reserved_qty" not in {
+        column["name"] for column in inspector.get_columns("ingredients")
+    }
+    metadata.create_all(connection, checkfirst=True)
+    if adds_reserved_qty:
+        connection.execute(
+            text("ALTER TABLE ingredients ADD COLUMN reserved_qty INTEGER NOT NULL DEFAULT 0")
+        )
+        connection.execute(_BACKFILL_RESERVED_QTY)
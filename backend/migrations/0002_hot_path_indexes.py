@@ -0,0 +1,42 @@
+"""Partial index on active reservations and covering indexes for hold reads."""
+
+from __future__ import annotations
+
+from sqlalchemy.engine import Connection
+
+from migrations import create_index
+
+# Built with CREATE INDEX CONCURRENTLY so reservation writes keep running.
+TRANSACTIONAL = False
+
+
+def upgrade(connection: Connection) -> None:
+    create_index(
+        connection,
+        "ix_reservations_active_expires_at",
+        "reservations",
+        ["expires_at", "id"],
+        where="status = 'active'",
+    )
+    create_index(
+        connection,
+        "ix_reservation_ingredients_ingredient_cover",
+        "reservation_ingredients",
+        ["ingredient_id"],
+        include=["reservation_id", "qty_reserved"],
+    )
+    create_index(
+        connection,
+        "ix_reservation_ingredients_reservation_cover",
+        "reservation_ingredients",
+        ["reservation_id"],
+        include=["ingredient_id", "qty_reserved"],
+    )
+    create_index(
+        connection,
+        "ix_reservation_items_reservation_cover",
+        "reservation_items",
+        ["reservation_id", "menu_item_id"],
+        include=["qty", "notes"],
+    )
+    create_index(connection, "ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"])
@@ -0,0 +1,58 @@
+"""History tables for archived reservations, and the index archival scans."""
+
+from __future__ import annotations
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func
+from sqlalchemy.engine import Connection
+
+from migrations import create_index
+
+# The reservations index is built concurrently; the new tables are empty.
+TRANSACTIONAL = False
+
+metadata = MetaData()
+
+Table(
+    "reservation_history",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("user_id", Integer, nullable=False),
+    Column("status", String(20), nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("expires_at", DateTime(timezone=True), nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+    Column("archived_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+    Index("ix_reservation_history_user_id", "user_id", "id"),
+)
+
+Table(
+    "reservation_item_history",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("reservation_id", Integer, nullable=False),
+    Column("menu_item_id", Integer, nullable=False),
+    Column("qty", Integer, nullable=False),
+    Column("notes", String, nullable=True),
+    Index("ix_reservation_item_history_reservation_id", "reservation_id"),
+)
+
+Table(
+    "reservation_ingredient_history",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("reservation_id", Integer, nullable=False),
+    Column("ingredient_id", Integer, nullable=False),
+    Column("qty_reserved", Integer, nullable=False),
+    Index("ix_reservation_ingredient_history_reservation_id", "reservation_id"),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    metadata.create_all(connection, checkfirst=True)
+    create_index(
+        connection,
+        "ix_reservations_settled_updated_at",
+        "reservations",
+        ["updated_at"],
+        where="status <> 'active'",
+    )
@@ -0,0 +1,152 @@
+"""Versioned schema migrations, applied in order by ``python migrate.py``.
+
+Each migration is a module named ``NNNN_description.py`` in this package
+with an ``upgrade(connection)`` function. Applied versions are recorded in
+``schema_migrations``. Migrations run one at a time under a Postgres
+advisory lock so concurrent deploys apply them once. Each runs in its own
+transaction together with its ``schema_migrations`` row, unless the module
+sets ``TRANSACTIONAL = False``; those run in autocommit mode, which
+``CREATE INDEX CONCURRENTLY`` needs, and must be safe to rerun.
+
+Migrations spell out their DDL instead of reading ``app.models``, so an
+applied migration never changes when the models do.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+import importlib
+from pathlib import Path
+import re
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, func, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+
+# Arbitrary constant shared by every process running migrations.
+MIGRATION_LOCK_KEY = 727_001
+
+_MIGRATION_FILE_PATTERN = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", String(4), primary_key=True),
+    Column("name", String(120), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: str
+    name: str
+    upgrade: Callable[[Connection], None]
+    transactional: bool
+
+
+def discover_migrations() -> list[Migration]:
+    migrations: list[Migration] = []
+    for path in sorted(Path(__file__).resolve().parent.glob("*.py")):
+        match = _MIGRATION_FILE_PATTERN.match(path.name)
+        if match is None:
+            continue
+        module = importlib.import_module(f"{__name__}.{path.stem}")
+        migrations.append(
+            Migration(
+                version=match.group(1),
+                name=match.group(2),
+                upgrade=module.upgrade,
+                transactional=getattr(module, "TRANSACTIONAL", True),
+            )
+        )
+    return migrations
+
+
+def applied_versions(connection: Connection) -> set[str]:
+    schema_migrations.create(connection, checkfirst=True)
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def pending_migrations(connection: Connection) -> list[Migration]:
+    applied = applied_versions(connection)
+    return [migration for migration in discover_migrations() if migration.version not in applied]
+
+
+def create_index(
+    connection: Connection,
+    name: str,
+    table: str,
+    columns: list[str],
+    *,
+    include: list[str] | None = None,
+    where: str | None = None,
+) -> None:
+    """Create an index if missing, concurrently on Postgres.
+
+    Postgres builds it with ``CREATE INDEX CONCURRENTLY`` so writes to
+    ``table`` continue; call it only from a non-transactional migration. An
+    invalid index left behind by an interrupted build is dropped and rebuilt.
+    ``include`` and ``where`` are Postgres-only and ignored elsewhere.
+    """
+    column_list = ", ".join(columns)
+    if connection.dialect.name != "postgresql":
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column_list})"))
+        return
+
+    is_valid = connection.execute(
+        text(
+            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+        ),
+        {"name": name},
+    ).scalar()
+    if is_valid is False:
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    statement = f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column_list})"
+    if include:
+        statement += f" INCLUDE ({', '.join(include)})"
+    if where:
+        statement += f" WHERE {where}"
+    connection.execute(text(statement))
+
+
+def _record_migration(connection: Connection, migration: Migration) -> None:
+    connection.execute(insert(schema_migrations).values(version=migration.version, name=migration.name))
+
+
+def _apply_migration(engine: Engine, connection: Connection, migration: Migration) -> None:
+    if migration.transactional:
+        with connection.begin():
+            migration.upgrade(connection)
+            _record_migration(connection, migration)
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as autocommit_connection:
+        migration.upgrade(autocommit_connection)
+        _record_migration(autocommit_connection, migration)
+
+
+def apply_migrations(engine: Engine) -> list[Migration]:
+    """Apply every pending migration; return the ones applied."""
+    with engine.connect() as connection:
+        is_postgres = connection.dialect.name == "postgresql"
+        if is_postgres:
+            # Session-level, so it spans the per-migration transactions.
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            pending = pending_migrations(connection)
+            connection.commit()
+            for migration in pending:
+                _apply_migration(engine, connection, migration)
+        finally:
+            if is_postgres:
+                connection.rollback()
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+                connection.commit()
+    return pending
+
+
+def drop_migration_history(engine: Engine) -> None:
+    with engine.begin() as connection:
+        schema_migrations.drop(connection, checkfirst=True)
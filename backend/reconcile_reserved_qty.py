@@ -0,0 +1,37 @@
+import argparse
+
+from app.availability import reconcile_reserved_qty
+from config import settings
+from db import SessionLocal
+from seed import _redacted_database_url
+
+
+def reconcile(repair: bool) -> int:
+    print(
+        "Reconciling ingredients.reserved_qty",
+        f"env={settings.app_env}",
+        f"url={_redacted_database_url(settings.database_url)}",
+        f"repair={repair}",
+    )
+    with SessionLocal() as session:
+        with session.begin():
+            mismatches = reconcile_reserved_qty(session, repair=repair)
+
+    for ingredient_id, (stored_qty, recomputed_qty) in mismatches.items():
+        print(f"ingredient_id={ingredient_id} stored={stored_qty} recomputed={recomputed_qty}")
+    print(f"mismatch_count={len(mismatches)}", "repaired" if repair and mismatches else "")
+    return len(mismatches)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Verify ingredients.reserved_qty against active reservation rows."
+    )
+    parser.add_argument(
+        "--repair",
+        action="store_true",
+        help="Overwrite stored totals with the recomputed values.",
+    )
+    args = parser.parse_args()
+    mismatch_count = reconcile(repair=args.repair)
+    raise SystemExit(1 if mismatch_count and not args.repair else 0)
@@ -1,10 +1,12 @@
 from urllib.parse import urlsplit, urlunsplit
 
-from sqlalchemy import select
+from sqlalchemy import inspect, select
 
-from app.models import Base, Ingredient, MenuItem, Recipe, User
+from app.invalidation_bus import TOPIC_INGREDIENTS, TOPIC_MENU, publish_invalidation
+from app.models import Base, CacheVersion, Ingredient, MenuItem, Recipe, User
 from config import settings
-from db import SessionLocal, create_all, engine
+from db import SessionLocal, engine
+from migrations import apply_migrations, drop_migration_history
 
 
 def _redacted_database_url(database_url: str) -> str:
@@ -125,14 +127,31 @@ def _get_or_create_recipe(menu_item_id: int, ingredient_id: int, qty_required: i
         return recipe
 
 
+def _read_cache_versions() -> dict[str, int]:
+    if not inspect(engine).has_table(CacheVersion.__tablename__):
+        return {}
+    with SessionLocal() as session:
+        return dict(session.execute(select(CacheVersion.name, CacheVersion.version)).all())
+
+
+def _restore_cache_versions(versions: dict[str, int]) -> None:
+    # Running servers ignore versions at or below the ones they have seen, so
+    # the reseed's invalidations must continue the old counters, not restart.
+    with SessionLocal() as session, session.begin():
+        session.add_all(CacheVersion(name=name, version=version) for name, version in versions.items())
+
+
 def seed() -> None:
     print(
         "Seeding database",
         f"env={settings.app_env}",
         f"url={_redacted_database_url(settings.database_url)}",
     )
+    cache_versions = _read_cache_versions()
     Base.metadata.drop_all(bind=engine)
-    create_all()
+    drop_migration_history(engine)
+    apply_migrations(engine)
+    _restore_cache_versions(cache_versions)
 
     _get_or_create_user(
         "kitchen@example.com",
@@ -303,6 +322,11 @@ def seed() -> None:
                 qty_required=qty_required,
             )
 
+    # Running servers cache menu items, recipes and ingredient state until
+    # these versions move.
+    publish_invalidation(TOPIC_MENU)
+    publish_invalidation(TOPIC_INGREDIENTS)
+
 
 if __name__ == "__main__":
     seed()
@@ -2,8 +2,14 @@ from __future__ import annotations
 
 from datetime import datetime, timedelta, timezone
 
+from sqlalchemy import update
+
+from app import availability_patch, socketio
+from app.availability import availability_ledger
+from app.expiration_schedule import expiration_schedule
 from app.reservation_expiration import expire_reservations_once
-from app.models import Ingredient, MenuItem, Recipe
+from app.models import Ingredient, MenuItem, Recipe, Reservation
+from config import settings
 from db import SessionLocal
 
 
@@ -94,3 +100,330 @@ def test_get_ingredients_excludes_expired_from_reserved_qty(app_client) -> None:
     patty_row = next(entry for entry in ingredients if entry["name"] == "Expired Patty")
     assert patty_row["active_reserved_qty"] == 0
     assert patty_row["available_qty"] == 8
+
+
+def test_availability_ledger_tracks_reservation_lifecycle(app_client) -> None:
+    with SessionLocal() as session:
+        patty = Ingredient(name="Ledger Patty", on_hand_qty=20, low_stock_threshold_qty=2, is_out=False)
+        item = MenuItem(name="Ledger Burger", price_cents=1000)
+        session.add_all([patty, item])
+        session.flush()
+        session.add(Recipe(menu_item_id=item.id, ingredient_id=patty.id, qty_required=2))
+        session.commit()
+        ingredient_id = patty.id
+        menu_item_id = item.id
+
+    # Prime the ledger before any reservation exists.
+    assert app_client.get("/ingredients").status_code == 200
+
+    token = _login_online(app_client)
+    headers = {"Authorization": f"Bearer {token}"}
+    first_id = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": menu_item_id, "qty": 1}]},
+        headers=headers,
+    ).get_json()["id"]
+    second_id = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": menu_item_id, "qty": 2}]},
+        headers=headers,
+    ).get_json()["id"]
+    update_response = app_client.patch(
+        f"/reservations/{first_id}",
+        json={"items": [{"menu_item_id": menu_item_id, "qty": 3}]},
+        headers=headers,
+    )
+    assert update_response.status_code == 200
+
+    with SessionLocal() as session:
+        assert availability_ledger.reserved_qty_by_ingredient(session) == {ingredient_id: 10}
+
+    assert app_client.post(f"/reservations/{second_id}/release", headers=headers).status_code == 200
+    assert app_client.post(f"/reservations/{first_id}/commit", headers=headers).status_code == 200
+
+    patty_row = next(row for row in app_client.get("/ingredients").get_json() if row["id"] == ingredient_id)
+    assert patty_row["active_reserved_qty"] == 0
+    assert patty_row["on_hand_qty"] == 14
+
+    verify_response = app_client.post(
+        "/internal/verify_availability",
+        headers={"X-Internal-Secret": settings.internal_expire_secret},
+    )
+    assert verify_response.status_code == 200
+    assert verify_response.get_json() == {"status": "ok", "mismatches": []}
+
+
+def test_availability_ledger_ignores_holds_past_expiry(app_client) -> None:
+    with SessionLocal() as session:
+        patty = Ingredient(name="Ledger Expiry Patty", on_hand_qty=5, low_stock_threshold_qty=1, is_out=False)
+        item = MenuItem(name="Ledger Expiry Burger", price_cents=1000)
+        session.add_all([patty, item])
+        session.flush()
+        session.add(Recipe(menu_item_id=item.id, ingredient_id=patty.id, qty_required=1))
+        session.commit()
+        ingredient_id = patty.id
+        menu_item_id = item.id
+
+    token = _login_online(app_client)
+    response = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": menu_item_id, "qty": 2}]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 201
+
+    later = datetime.now(timezone.utc) + timedelta(minutes=11)
+    with SessionLocal() as session:
+        assert availability_ledger.reserved_qty_by_ingredient(session) == {ingredient_id: 2}
+        assert availability_ledger.reserved_qty_by_ingredient(session, now=later) == {}
+        assert availability_ledger.verify(session, now=later) == {}
+
+
+def test_menu_and_ingredients_honor_if_none_match(app_client) -> None:
+    with SessionLocal() as session:
+        patty = Ingredient(name="Etag Patty", on_hand_qty=10, low_stock_threshold_qty=1, is_out=False)
+        item = MenuItem(name="Etag Burger", price_cents=1000)
+        session.add_all([patty, item])
+        session.flush()
+        session.add(Recipe(menu_item_id=item.id, ingredient_id=patty.id, qty_required=1))
+        session.commit()
+        menu_item_id = item.id
+
+    for path in ("/menu", "/ingredients"):
+        first = app_client.get(path)
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+        assert etag
+
+        cached = app_client.get(path, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.headers["ETag"] == etag
+
+        token = _login_online(app_client)
+        reservation_response = app_client.post(
+            "/reservations",
+            json={"items": [{"menu_item_id": menu_item_id, "qty": 1}]},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert reservation_response.status_code == 201
+
+        refreshed = app_client.get(path, headers={"If-None-Match": etag})
+        assert refreshed.status_code == 200
+        assert refreshed.headers["ETag"] != etag
+        assert refreshed.get_json() != first.get_json()
+
+
+def test_since_returns_only_rows_touched_by_changed_ingredients(app_client) -> None:
+    with SessionLocal() as session:
+        patty = Ingredient(name="Delta Patty", on_hand_qty=10, low_stock_threshold_qty=1, is_out=False)
+        lettuce = Ingredient(name="Delta Lettuce", on_hand_qty=10, low_stock_threshold_qty=1, is_out=False)
+        burger = MenuItem(name="Delta Burger", price_cents=1000)
+        salad = MenuItem(name="Delta Salad", price_cents=900)
+        session.add_all([patty, lettuce, burger, salad])
+        session.flush()
+        session.add_all(
+            [
+                Recipe(menu_item_id=burger.id, ingredient_id=patty.id, qty_required=1),
+                Recipe(menu_item_id=salad.id, ingredient_id=lettuce.id, qty_required=2),
+            ]
+        )
+        session.commit()
+        patty_id = patty.id
+        burger_id = burger.id
+
+    menu_version = app_client.get("/menu").headers["X-State-Version"]
+    ingredients_version = app_client.get("/ingredients").headers["X-State-Version"]
+
+    unchanged = app_client.get(f"/menu?since={menu_version}").get_json()
+    assert unchanged == {"version": menu_version, "full": False, "rows": []}
+
+    token = _login_online(app_client)
+    response = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": burger_id, "qty": 3}]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 201
+
+    menu_delta = app_client.get(f"/menu?since={menu_version}").get_json()
+    assert menu_delta["full"] is False
+    assert menu_delta["version"] != menu_version
+    assert [row["id"] for row in menu_delta["rows"]] == [burger_id]
+    assert menu_delta["rows"][0]["max_qty_available"] == 7
+
+    ingredients_delta = app_client.get(f"/ingredients?since={ingredients_version}").get_json()
+    assert [row["id"] for row in ingredients_delta["rows"]] == [patty_id]
+    assert ingredients_delta["rows"][0]["active_reserved_qty"] == 3
+
+    follow_up = app_client.get(f"/menu?since={menu_delta['version']}").get_json()
+    assert follow_up["rows"] == []
+
+
+def test_since_from_unknown_version_returns_full_payload(app_client) -> None:
+    with SessionLocal() as session:
+        session.add(MenuItem(name="Delta Fallback Item", price_cents=500))
+        session.commit()
+
+    body = app_client.get("/menu?since=not-a-version").get_json()
+    assert body["full"] is True
+    assert [row["name"] for row in body["rows"]] == ["Delta Fallback Item"]
+
+
+def test_availability_patch_is_pushed_to_subscribers_only(app_client) -> None:
+    with SessionLocal() as session:
+        patty = Ingredient(name="Patch Patty", on_hand_qty=6, low_stock_threshold_qty=1, is_out=False)
+        bun = Ingredient(name="Patch Bun", on_hand_qty=6, low_stock_threshold_qty=1, is_out=False)
+        burger = MenuItem(name="Patch Burger", price_cents=1000)
+        roll = MenuItem(name="Patch Roll", price_cents=400)
+        session.add_all([patty, bun, burger, roll])
+        session.flush()
+        session.add_all(
+            [
+                Recipe(menu_item_id=burger.id, ingredient_id=patty.id, qty_required=3),
+                Recipe(menu_item_id=roll.id, ingredient_id=bun.id, qty_required=1),
+            ]
+        )
+        session.commit()
+        patty_id = patty.id
+        burger_id = burger.id
+
+    token = _login_online(app_client)
+    subscriber = socketio.test_client(
+        app_client.application,
+        flask_test_client=app_client,
+        auth={"token": token, "view": "menu"},
+    )
+    bystander = socketio.test_client(
+        app_client.application,
+        flask_test_client=app_client,
+        auth={"token": token, "view": "menu"},
+    )
+    subscriber.emit("subscribeAvailability")
+    subscriber.get_received()
+    bystander.get_received()
+
+    response = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": burger_id, "qty": 1}]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 201
+
+    patches = [event for event in subscriber.get_received() if event["name"] == "availabilityPatch"]
+    assert len(patches) == 1
+    patch = patches[0]["args"][0]
+    assert patch["full"] is False
+    assert [row["id"] for row in patch["ingredients"]] == [patty_id]
+    assert patch["ingredients"][0]["available_qty"] == 3
+    assert [row["id"] for row in patch["menu"]] == [burger_id]
+    assert patch["menu"][0]["max_qty_available"] == 1
+    assert patch["version"] == app_client.get("/menu").headers["X-State-Version"]
+
+    bystander_events = [event["name"] for event in bystander.get_received()]
+    assert "stateChanged" in bystander_events
+    assert "availabilityPatch" not in bystander_events
+
+
+def test_update_of_an_expired_reservation_publishes_the_freed_stock(app_client) -> None:
+    with SessionLocal() as session:
+        patty = Ingredient(name="Lapsed Patty", on_hand_qty=5, low_stock_threshold_qty=1, is_out=False)
+        burger = MenuItem(name="Lapsed Burger", price_cents=1000)
+        session.add_all([patty, burger])
+        session.flush()
+        session.add(Recipe(menu_item_id=burger.id, ingredient_id=patty.id, qty_required=2))
+        session.commit()
+        patty_id = patty.id
+        burger_id = burger.id
+        expiration_schedule.load(session)
+
+    token = _login_online(app_client)
+    headers = {"Authorization": f"Bearer {token}"}
+    try:
+        reservation_id = app_client.post(
+            "/reservations",
+            json={"items": [{"menu_item_id": burger_id, "qty": 1}]},
+            headers=headers,
+        ).get_json()["id"]
+        assert len(expiration_schedule) == 1
+        with SessionLocal() as session, session.begin():
+            session.execute(
+                update(Reservation)
+                .where(Reservation.id == reservation_id)
+                .values(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+            )
+
+        subscriber = socketio.test_client(
+            app_client.application,
+            flask_test_client=app_client,
+            auth={"token": token, "view": "menu"},
+        )
+        subscriber.emit("subscribeAvailability")
+        subscriber.get_received()
+
+        response = app_client.patch(
+            f"/reservations/{reservation_id}",
+            json={"items": [{"menu_item_id": burger_id, "qty": 2}]},
+            headers=headers,
+        )
+        assert response.status_code == 409
+        assert response.get_json()["code"] == "RESERVATION_EXPIRED"
+
+        patches = [event for event in subscriber.get_received() if event["name"] == "availabilityPatch"]
+        assert len(patches) == 1
+        assert [row["id"] for row in patches[0]["args"][0]["ingredients"]] == [patty_id]
+        assert patches[0]["args"][0]["ingredients"][0]["available_qty"] == 5
+        assert len(expiration_schedule) == 0
+        with SessionLocal() as session:
+            assert session.get(Reservation, reservation_id).status == "expired"
+            assert availability_ledger.verify(session) == {}
+    finally:
+        expiration_schedule.clear()
+
+
+def test_availability_patch_follows_the_state_change_audience(app_client, monkeypatch) -> None:
+    with SessionLocal() as session:
+        pickle = Ingredient(name="Patch Pickle", on_hand_qty=5, low_stock_threshold_qty=1, is_out=False)
+        session.add(pickle)
+        session.commit()
+        pickle_id = pickle.id
+
+    builds: list[list[int] | None] = []
+    build = availability_patch.build_availability_patch
+
+    def _counting_build(state_key, ingredient_ids):
+        builds.append(ingredient_ids)
+        return build(state_key, ingredient_ids)
+
+    monkeypatch.setattr(availability_patch, "build_availability_patch", _counting_build)
+    kitchen_token = app_client.post(
+        "/auth/login", json={"username": "kitchen@example.com", "password": "pass"}
+    ).get_json()["access_token"]
+    headers = {"Authorization": f"Bearer {kitchen_token}"}
+
+    # No subscribers anywhere: nothing is built.
+    response = app_client.patch(f"/ingredients/{pickle_id}", json={"on_hand_qty": 4}, headers=headers)
+    assert response.status_code == 200
+    assert builds == []
+
+    kitchen_view = socketio.test_client(
+        app_client.application,
+        flask_test_client=app_client,
+        auth={"token": kitchen_token, "view": "kitchen"},
+    )
+    menu_view = socketio.test_client(
+        app_client.application,
+        flask_test_client=app_client,
+        auth={"token": _login_online(app_client), "view": "menu"},
+    )
+    for socket_client in (kitchen_view, menu_view):
+        socket_client.emit("subscribeAvailability")
+        socket_client.get_received()
+
+    # An ingredient no menu item uses is an inventory-only change.
+    response = app_client.patch(f"/ingredients/{pickle_id}", json={"on_hand_qty": 3}, headers=headers)
+    assert response.status_code == 200
+    assert builds == [[pickle_id]]
+    kitchen_patches = [event for event in kitchen_view.get_received() if event["name"] == "availabilityPatch"]
+    assert [row["id"] for row in kitchen_patches[0]["args"][0]["ingredients"]] == [pickle_id]
+    assert len(kitchen_patches) == 1
+    assert [event["name"] for event in menu_view.get_received()] == []
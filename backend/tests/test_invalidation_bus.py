@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import subprocess
+import sys
+import time
+
+import eventlet
+import pytest
+from sqlalchemy import select, text, update
+
+from app.invalidation_bus import (
+    TOPIC_INGREDIENTS,
+    TOPIC_MENU,
+    TOPIC_RUNTIME_SETTINGS,
+    _listen_loop,
+    apply_invalidation,
+    check_versions,
+    publish_invalidation,
+)
+from app.models import CacheVersion, Ingredient, MenuItem, Recipe, Reservation
+from app.runtime_reservation_ttl import get_runtime_ttl_seconds, set_runtime_ttl_seconds
+from app.runtime_reservation_warning import set_runtime_warning_threshold_seconds
+from app.state_changes import get_menu_version
+from config import Settings, settings
+from db import SessionLocal, engine
+from migrations import drop_migration_history
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def _login_online(client) -> str:
+    response = client.post(
+        "/auth/login",
+        json={"username": "online@example.com", "password": "pass"},
+    )
+    assert response.status_code == 200
+    return response.get_json()["access_token"]
+
+
+def _reserved_qty(client, ingredient_id: int) -> int:
+    rows = client.get("/ingredients").get_json()
+    return next(row["active_reserved_qty"] for row in rows if row["id"] == ingredient_id)
+
+
+def test_remote_ingredient_invalidation_refreshes_ledger(app_client) -> None:
+    with SessionLocal() as session:
+        patty = Ingredient(name="Bus Patty", on_hand_qty=10, low_stock_threshold_qty=1, is_out=False)
+        item = MenuItem(name="Bus Burger", price_cents=1000)
+        session.add_all([patty, item])
+        session.flush()
+        session.add(Recipe(menu_item_id=item.id, ingredient_id=patty.id, qty_required=3))
+        session.commit()
+        patty_id = patty.id
+        menu_item_id = item.id
+
+    token = _login_online(app_client)
+    response = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": menu_item_id, "qty": 1}]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 201
+    reservation_id = response.get_json()["id"]
+    assert _reserved_qty(app_client, patty_id) == 3
+
+    # Another instance releases the reservation; this process never saw it.
+    with SessionLocal() as session:
+        session.execute(update(Reservation).where(Reservation.id == reservation_id).values(status="released"))
+        session.execute(update(Ingredient).where(Ingredient.id == patty_id).values(reserved_qty=0))
+        session.commit()
+    stale_etag = app_client.get("/ingredients").headers["ETag"]
+    assert _reserved_qty(app_client, patty_id) == 3
+
+    apply_invalidation(
+        {"origin": "other-instance", "topic": TOPIC_INGREDIENTS, "version": 1, "ingredient_ids": [patty_id]}
+    )
+
+    assert _reserved_qty(app_client, patty_id) == 0
+    assert app_client.get("/ingredients").headers["ETag"] != stale_etag
+    # Replays and older versions are ignored.
+    apply_invalidation(
+        {"origin": "other-instance", "topic": TOPIC_INGREDIENTS, "version": 1, "ingredient_ids": [patty_id]}
+    )
+
+
+def test_version_table_poll_catches_missed_invalidations(app_client) -> None:
+    set_runtime_ttl_seconds(settings.reservation_ttl_seconds)
+    set_runtime_warning_threshold_seconds(settings.reservation_warning_threshold_seconds)
+    published_payload = {
+        "ttl_seconds": settings.reservation_ttl_seconds,
+        "warning_threshold_seconds": settings.reservation_warning_threshold_seconds,
+    }
+
+    assert publish_invalidation(TOPIC_RUNTIME_SETTINGS, payload=published_payload) == 1
+    assert publish_invalidation(TOPIC_MENU) == 1
+    # Our own publishes are already applied locally.
+    assert check_versions() == []
+
+    # Another instance bumps both topics and its NOTIFY never arrives here.
+    with SessionLocal() as session:
+        session.execute(
+            update(CacheVersion)
+            .where(CacheVersion.name == TOPIC_RUNTIME_SETTINGS)
+            .values(
+                version=2,
+                payload=json.dumps({**published_payload, "ttl_seconds": 120}),
+            )
+        )
+        session.execute(update(CacheVersion).where(CacheVersion.name == TOPIC_MENU).values(version=2))
+        session.commit()
+    menu_version = get_menu_version()
+
+    assert sorted(check_versions()) == [TOPIC_MENU, TOPIC_RUNTIME_SETTINGS]
+    assert get_runtime_ttl_seconds() == 120
+    assert get_menu_version() == menu_version + 1
+    assert check_versions() == []
+
+    set_runtime_ttl_seconds(settings.reservation_ttl_seconds)
+
+
+def test_reseed_moves_cache_versions_past_the_ones_servers_have_seen(app_client) -> None:
+    with SessionLocal() as session:
+        session.add_all(
+            [
+                CacheVersion(name=TOPIC_MENU, version=7),
+                CacheVersion(name=TOPIC_INGREDIENTS, version=3),
+            ]
+        )
+        session.commit()
+    check_versions()
+    menu_version = get_menu_version()
+
+    try:
+        # A separate process, like a reseed next to a running server.
+        subprocess.run([sys.executable, "seed.py"], cwd=BACKEND_DIR, check=True, timeout=60)
+        with SessionLocal() as session:
+            versions = dict(session.execute(select(CacheVersion.name, CacheVersion.version)).all())
+        assert versions == {TOPIC_MENU: 8, TOPIC_INGREDIENTS: 4}
+        assert sorted(check_versions()) == [TOPIC_INGREDIENTS, TOPIC_MENU]
+        assert get_menu_version() > menu_version
+    finally:
+        drop_migration_history(engine)
+
+
+def test_postgres_message_queue_requires_the_invalidation_bus(monkeypatch) -> None:
+    monkeypatch.setenv("SOCKETIO_MESSAGE_QUEUE", "postgres")
+    monkeypatch.delenv("ENABLE_INVALIDATION_BUS", raising=False)
+    assert Settings.from_env().enable_invalidation_bus is True
+
+    monkeypatch.setenv("ENABLE_INVALIDATION_BUS", "0")
+    with pytest.raises(RuntimeError, match="ENABLE_INVALIDATION_BUS"):
+        Settings.from_env()
+
+
+def test_idle_listen_loop_keeps_other_greenlets_scheduled(app_client) -> None:
+    if engine.dialect.name != "postgresql":
+        pytest.skip("LISTEN/NOTIFY needs the Postgres test database")
+
+    def _is_listening() -> bool:
+        with engine.connect() as connection:
+            return connection.execute(
+                text("SELECT 1 FROM pg_stat_activity WHERE query = :query"),
+                {"query": f'LISTEN "{settings.invalidation_channel}"'},
+            ).first() is not None
+
+    ticks: list[float] = []
+
+    def _tick() -> None:
+        while True:
+            ticks.append(time.monotonic())
+            eventlet.sleep(0.05)
+
+    listener = eventlet.spawn(_listen_loop)
+    ticker = eventlet.spawn(_tick)
+    try:
+        deadline = time.monotonic() + 10
+        while not _is_listening():
+            assert time.monotonic() < deadline, "listener did not start"
+            eventlet.sleep(0.05)
+        ticks.clear()
+        # The loop now waits on an idle socket for INVALIDATION_POLL_SECONDS.
+        eventlet.sleep(1.0)
+    finally:
+        ticker.kill()
+        listener.kill()
+
+    assert len(ticks) >= 10
+    assert max(later - earlier for earlier, later in zip(ticks, ticks[1:])) < 0.5
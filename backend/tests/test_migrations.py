@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+import importlib
+
+import pytest
+from sqlalchemy import func, insert, inspect, select, text
+
+from app.availability import reconcile_reserved_qty
+from app.models import (
+    Base,
+    Ingredient,
+    MenuItem,
+    Reservation,
+    ReservationIngredient,
+    ReservationItem,
+    User,
+)
+from db import SessionLocal, engine
+from migrations import (
+    apply_migrations,
+    discover_migrations,
+    drop_migration_history,
+    pending_migrations,
+    schema_migrations,
+)
+
+
+def _explain(session, statement) -> str:
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    connection = session.connection()
+    # Test tables are tiny; make the planner show which index it would use.
+    connection.execute(text("SET LOCAL enable_seqscan = off"))
+    rows = connection.exec_driver_sql(f"EXPLAIN {compiled}", compiled.params).all()
+    return "\n".join(row[0] for row in rows)
+
+
+def test_migrations_build_schema_once() -> None:
+    Base.metadata.drop_all(bind=engine)
+    drop_migration_history(engine)
+    try:
+        applied = apply_migrations(engine)
+        assert [migration.version for migration in applied] == [
+            migration.version for migration in discover_migrations()
+        ]
+        assert apply_migrations(engine) == []
+
+        # Migrations spell out their DDL; they must still add up to the models.
+        inspector = inspect(engine)
+        assert set(inspector.get_table_names()) == set(Base.metadata.tables) | {"schema_migrations"}
+        for table in Base.metadata.sorted_tables:
+            assert {column["name"] for column in inspector.get_columns(table.name)} == set(
+                table.columns.keys()
+            ), table.name
+            assert {index["name"] for index in inspector.get_indexes(table.name)} >= {
+                index.name for index in table.indexes
+            }, table.name
+        with engine.begin() as connection:
+            assert pending_migrations(connection) == []
+            assert connection.scalar(select(func.count()).select_from(schema_migrations)) == len(applied)
+    finally:
+        drop_migration_history(engine)
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_baseline_backfills_reserved_qty_from_active_holds() -> None:
+    baseline = importlib.import_module("migrations.0001_baseline")
+    tables = baseline.metadata.tables
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=10)
+    Base.metadata.drop_all(bind=engine)
+    drop_migration_history(engine)
+    try:
+        # A database from before the counter: same tables, no reserved_qty.
+        with engine.begin() as connection:
+            baseline.metadata.create_all(connection)
+            connection.execute(text("ALTER TABLE ingredients DROP COLUMN reserved_qty"))
+            connection.execute(
+                insert(tables["users"]).values(id=1, email="old@example.com", role="online", password="x")
+            )
+            connection.execute(
+                insert(tables["ingredients"]),
+                [
+                    {"id": 1, "name": "Old Bun", "on_hand_qty": 10, "low_stock_threshold_qty": 1, "is_out": False},
+                    {"id": 2, "name": "Old Patty", "on_hand_qty": 10, "low_stock_threshold_qty": 1, "is_out": False},
+                ],
+            )
+            connection.execute(
+                insert(tables["reservations"]),
+                [
+                    {"id": 1, "user_id": 1, "status": "active", "expires_at": expires_at},
+                    {"id": 2, "user_id": 1, "status": "active", "expires_at": expires_at},
+                    {"id": 3, "user_id": 1, "status": "expired", "expires_at": expires_at},
+                ],
+            )
+            connection.execute(
+                insert(tables["reservation_ingredients"]),
+                [
+                    {"reservation_id": 1, "ingredient_id": 1, "qty_reserved": 2},
+                    {"reservation_id": 2, "ingredient_id": 1, "qty_reserved": 3},
+                    {"reservation_id": 3, "ingredient_id": 2, "qty_reserved": 4},
+                ],
+            )
+
+        apply_migrations(engine)
+
+        with SessionLocal() as session:
+            assert dict(session.execute(select(Ingredient.id, Ingredient.reserved_qty)).all()) == {1: 5, 2: 0}
+            assert reconcile_reserved_qty(session) == {}
+    finally:
+        drop_migration_history(engine)
+        Base.metadata.drop_all(bind=engine)
+
+
+def _seed_reservation_history(now: datetime) -> None:
+    with SessionLocal() as session, session.begin():
+        session.add_all(
+            Ingredient(id=ingredient_id, name=f"Plan Ingredient {ingredient_id}", on_hand_qty=1000)
+            for ingredient_id in range(1, 21)
+        )
+        session.add_all(
+            MenuItem(id=item_id, name=f"Plan Item {item_id}", price_cents=1000) for item_id in range(1, 11)
+        )
+        user_id = session.scalar(select(User.id).limit(1))
+        for reservation_id in range(1, 2001):
+            # Mostly settled history, as in a long-running database.
+            session.add(
+                Reservation(
+                    id=reservation_id,
+                    user_id=user_id,
+                    status="active" if reservation_id % 20 == 0 else "committed",
+                    expires_at=now + timedelta(minutes=reservation_id % 30 - 15),
+                )
+            )
+        session.flush()
+        session.add_all(
+            ReservationIngredient(
+                reservation_id=reservation_id,
+                ingredient_id=(reservation_id + offset) % 20 + 1,
+                qty_reserved=1,
+            )
+            for reservation_id in range(1, 2001)
+            for offset in range(3)
+        )
+        session.add_all(
+            ReservationItem(
+                reservation_id=reservation_id,
+                menu_item_id=(reservation_id + offset) % 10 + 1,
+                qty=1,
+            )
+            for reservation_id in range(1, 2001)
+            for offset in range(2)
+        )
+
+    # Index-only scans are costed from the visibility map VACUUM fills in.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for table_name in ("reservations", "reservation_ingredients", "reservation_items"):
+            connection.exec_driver_sql(f"VACUUM ANALYZE {table_name}")
+
+
+def test_hot_queries_use_indexes(app_client) -> None:
+    if engine.dialect.name != "postgresql":
+        pytest.skip("partial and INCLUDE indexes are Postgres plans")
+    now = datetime.now(timezone.utc)
+    _seed_reservation_history(now)
+    hot_queries = {
+        # Expiration sweep.
+        "ix_reservations_active_expires_at": select(Reservation.id)
+        .where(Reservation.status == "active", Reservation.expires_at < now)
+        .order_by(Reservation.id.asc())
+        .limit(500),
+        # Overdue holds for the ingredients a reservation write locks.
+        "ix_reservation_ingredients_ingredient_cover": select(
+            ReservationIngredient.ingredient_id,
+            func.sum(ReservationIngredient.qty_reserved),
+        )
+        .where(ReservationIngredient.ingredient_id.in_([1, 2, 3]))
+        .group_by(ReservationIngredient.ingredient_id),
+        # Holds released by commit/release/expiry.
+        "ix_reservation_ingredients_reservation_cover": select(
+            ReservationIngredient.ingredient_id,
+            func.sum(ReservationIngredient.qty_reserved),
+        )
+        .where(ReservationIngredient.reservation_id.in_([1, 2]))
+        .group_by(ReservationIngredient.ingredient_id),
+        # GET /reservations/:id.
+        "ix_reservation_items_reservation_cover": select(
+            ReservationItem.menu_item_id, ReservationItem.qty, ReservationItem.notes
+        )
+        .where(ReservationItem.reservation_id == 1)
+        .order_by(ReservationItem.menu_item_id.asc()),
+    }
+
+    with SessionLocal() as session, session.begin():
+        for index_name, statement in hot_queries.items():
+            plan = _explain(session, statement)
+            assert index_name in plan, plan
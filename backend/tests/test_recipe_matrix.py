@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import random
+
+from app.availability import serialize_menu
+from app.models import Ingredient, MenuItem, Recipe
+from app.recipe_matrix import RecipeMatrix
+
+
+def _random_catalog(seed: int):
+    rng = random.Random(seed)
+    ingredients = [
+        Ingredient(
+            id=ingredient_id,
+            name=f"Matrix Ingredient {ingredient_id}",
+            on_hand_qty=rng.randint(0, 12),
+            low_stock_threshold_qty=rng.randint(0, 5),
+            is_out=rng.random() < 0.15,
+        )
+        for ingredient_id in range(1, 16)
+    ]
+    menu_items = [
+        MenuItem(id=item_id, name=f"Matrix Item {item_id}", price_cents=900 + item_id)
+        for item_id in range(1, 41)
+    ]
+    recipes: list[Recipe] = []
+    for menu_item in menu_items:
+        # Some items have no recipe rows at all.
+        for ingredient_id in rng.sample(range(1, 16), rng.randint(0, 5)):
+            recipes.append(
+                Recipe(
+                    id=len(recipes) + 1,
+                    menu_item_id=menu_item.id,
+                    ingredient_id=ingredient_id,
+                    qty_required=rng.randint(1, 4),
+                )
+            )
+    rng.shuffle(recipes)
+    # Reserved can exceed on-hand after a kitchen correction, so include negatives.
+    reserved = {ingredient.id: rng.randint(0, 15) for ingredient in ingredients}
+    return menu_items, recipes, {ingredient.id: ingredient for ingredient in ingredients}, reserved
+
+
+def test_recipe_matrix_matches_serialize_menu() -> None:
+    for seed in range(25):
+        menu_items, recipes, ingredients_by_id, reserved = _random_catalog(seed)
+        matrix = RecipeMatrix.compile(menu_items, recipes, ingredients_by_id)
+
+        assert matrix.evaluate(ingredients_by_id, reserved) == serialize_menu(
+            menu_items, recipes, ingredients_by_id, reserved
+        )
+
+
+def test_recipe_matrix_reuses_compiled_rows_for_new_stock_levels() -> None:
+    menu_items, recipes, ingredients_by_id, reserved = _random_catalog(99)
+    matrix = RecipeMatrix.compile(menu_items, recipes, ingredients_by_id)
+
+    for ingredient in ingredients_by_id.values():
+        ingredient.on_hand_qty += 3
+        ingredient.is_out = not ingredient.is_out
+    reserved = {ingredient_id: qty // 2 for ingredient_id, qty in reserved.items()}
+
+    assert matrix.evaluate(ingredients_by_id, reserved) == serialize_menu(
+        menu_items, recipes, ingredients_by_id, reserved
+    )
+
+
+def test_recipe_matrix_bill_of_materials_totals_ingredients() -> None:
+    menu_items, recipes, ingredients_by_id, _ = _random_catalog(7)
+    matrix = RecipeMatrix.compile(menu_items, recipes, ingredients_by_id)
+    order = {1: 2, 5: 1, 17: 3}
+
+    expected: dict[int, int] = {}
+    for recipe in recipes:
+        if recipe.menu_item_id in order:
+            expected[recipe.ingredient_id] = (
+                expected.get(recipe.ingredient_id, 0) + recipe.qty_required * order[recipe.menu_item_id]
+            )
+
+    required = matrix.required_qty_by_ingredient(order)
+    assert required == expected
+    assert list(required) == sorted(required)
+    assert matrix.missing_menu_item_ids([3, 41, 99]) == [41, 99]
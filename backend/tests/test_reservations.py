@@ -3,13 +3,40 @@ from __future__ import annotations
 from datetime import datetime, timedelta, timezone
 from queue import Queue
 from threading import Barrier, Thread, local
+from time import monotonic
 
+import app.admission_control as admission_control
 import app.api.reservations as reservations_api
-from sqlalchemy import func, select
+import app.reservation_expiration as reservation_expiration
+import app.reservation_admission as reservation_admission
+import eventlet
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import OperationalError
 
 from app import create_app
-from app.models import Ingredient, MenuItem, Recipe, Reservation, ReservationIngredient, ReservationItem
-from app.reservation_expiration import expire_reservations_once_and_emit
+from app.availability import reconcile_reserved_qty
+from app.idempotency import idempotency_cache
+from app.leader_lock import AdvisoryLeaderLock
+from app.metrics import get_counters
+from app.models import (
+    IdempotencyKey,
+    Ingredient,
+    MenuItem,
+    Recipe,
+    Reservation,
+    ReservationHistory,
+    ReservationIngredient,
+    ReservationIngredientHistory,
+    ReservationItem,
+)
+from app.expiration_schedule import expiration_schedule
+from app.reservation_expiration import (
+    ExpirationSweep,
+    expire_due_reservations,
+    expire_reservations_once_and_emit,
+)
+from config import settings
 from db import SessionLocal, engine
 
 
@@ -190,6 +217,49 @@ def test_update_reservation_success_replaces_items_and_ingredients(app_client) -
         assert reserved_by_name == {"Update Bun": 1, "Update Cheese": 2}
 
 
+def test_update_reservation_only_touches_changed_rows(app_client) -> None:
+    basic_id, deluxe_id = _build_inventory_for_success_case()
+    token = _login_online(app_client)
+    headers = {"Authorization": f"Bearer {token}"}
+    reservation_id = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": basic_id, "qty": 1}, {"menu_item_id": deluxe_id, "qty": 1}]},
+        headers=headers,
+    ).get_json()["id"]
+
+    with SessionLocal() as session:
+        item_row_ids = dict(
+            session.execute(
+                select(ReservationItem.menu_item_id, ReservationItem.id).where(
+                    ReservationItem.reservation_id == reservation_id
+                )
+            ).all()
+        )
+        # Patty stock drops below this reservation's own hold; the update
+        # below does not ask for more patty, so it must not be rejected.
+        patty = session.execute(select(Ingredient).where(Ingredient.name == "Test Patty")).scalar_one()
+        patty.on_hand_qty = 0
+        session.commit()
+
+    response = app_client.patch(
+        f"/reservations/{reservation_id}",
+        json={"items": [{"menu_item_id": basic_id, "qty": 1}, {"menu_item_id": deluxe_id, "qty": 2}]},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    with SessionLocal() as session:
+        rows = session.execute(
+            select(ReservationItem).where(ReservationItem.reservation_id == reservation_id)
+        ).scalars().all()
+        assert {row.menu_item_id: row.id for row in rows} == item_row_ids
+        assert {row.menu_item_id: row.qty for row in rows} == {basic_id: 1, deluxe_id: 2}
+        reserved_by_name = {
+            ingredient.name: ingredient.reserved_qty
+            for ingredient in session.execute(select(Ingredient)).scalars()
+        }
+    assert reserved_by_name == {"Test Bun": 5, "Test Patty": 1, "Test Cheese": 2}
+
 def test_update_reservation_conflict_409_when_insufficient(app_client) -> None:
     with SessionLocal() as session:
         bun = Ingredient(name="Update Ok Bun", on_hand_qty=10, low_stock_threshold_qty=2, is_out=False)
@@ -443,3 +513,659 @@ def test_expiration_iteration_expires_and_restores_availability(app_client) -> N
     after_patty = next(row for row in after_expiration.get_json() if row["name"] == "Test Expire Patty")
     assert after_patty["active_reserved_qty"] == 0
     assert after_patty["available_qty"] == 1
+
+
+def test_reserved_qty_counter_follows_status_changes(app_client) -> None:
+    with SessionLocal() as session:
+        patty = Ingredient(name="Counter Patty", on_hand_qty=20, low_stock_threshold_qty=1, is_out=False)
+        item = MenuItem(name="Counter Burger", price_cents=1000)
+        session.add_all([patty, item])
+        session.flush()
+        session.add(Recipe(menu_item_id=item.id, ingredient_id=patty.id, qty_required=2))
+        session.commit()
+        ingredient_id = patty.id
+        menu_item_id = item.id
+
+    def reserved_qty() -> int:
+        with SessionLocal() as session:
+            return session.get(Ingredient, ingredient_id).reserved_qty
+
+    token = _login_online(app_client)
+    headers = {"Authorization": f"Bearer {token}"}
+    first_id = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": menu_item_id, "qty": 1}]},
+        headers=headers,
+    ).get_json()["id"]
+    second_id = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": menu_item_id, "qty": 1}]},
+        headers=headers,
+    ).get_json()["id"]
+    third_id = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": menu_item_id, "qty": 1}]},
+        headers=headers,
+    ).get_json()["id"]
+    assert reserved_qty() == 6
+
+    app_client.patch(
+        f"/reservations/{first_id}",
+        json={"items": [{"menu_item_id": menu_item_id, "qty": 3}]},
+        headers=headers,
+    )
+    assert reserved_qty() == 10
+
+    app_client.post(f"/reservations/{first_id}/commit", headers=headers)
+    assert reserved_qty() == 4
+
+    app_client.post(f"/reservations/{second_id}/release", headers=headers)
+    assert reserved_qty() == 2
+
+    with SessionLocal() as session:
+        reservation = session.get(Reservation, third_id)
+        reservation.expires_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+        session.commit()
+    assert expire_reservations_once_and_emit() == 1
+    assert reserved_qty() == 0
+
+    with SessionLocal() as session:
+        with session.begin():
+            assert reconcile_reserved_qty(session) == {}
+
+
+def test_overdue_unswept_hold_does_not_block_new_reservation(app_client) -> None:
+    with SessionLocal() as session:
+        patty = Ingredient(name="Overdue Patty", on_hand_qty=1, low_stock_threshold_qty=0, is_out=False)
+        item = MenuItem(name="Overdue Burger", price_cents=1000)
+        session.add_all([patty, item])
+        session.flush()
+        session.add(Recipe(menu_item_id=item.id, ingredient_id=patty.id, qty_required=1))
+        session.commit()
+        menu_item_id = item.id
+
+    token = _login_online(app_client)
+    headers = {"Authorization": f"Bearer {token}"}
+    first_id = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": menu_item_id, "qty": 1}]},
+        headers=headers,
+    ).get_json()["id"]
+
+    with SessionLocal() as session:
+        reservation = session.get(Reservation, first_id)
+        reservation.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        session.commit()
+
+    response = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": menu_item_id, "qty": 1}]},
+        headers=headers,
+    )
+    assert response.status_code == 201
+
+    # Admission expired the overdue hold instead of subtracting it.
+    with SessionLocal() as session:
+        assert session.get(Reservation, first_id).status == "expired"
+        assert session.scalar(select(Ingredient.reserved_qty).where(Ingredient.name == "Overdue Patty")) == 1
+        assert reconcile_reserved_qty(session) == {}
+
+
+def test_optimistic_admission_falls_back_to_locking_when_a_counter_is_short(app_client) -> None:
+    if engine.dialect.name != "postgresql":
+        pytest.skip("optimistic admission is a Postgres statement")
+
+    with SessionLocal() as session:
+        patty = Ingredient(name="Optimistic Patty", on_hand_qty=1, low_stock_threshold_qty=0, is_out=False)
+        bun = Ingredient(name="Optimistic Bun", on_hand_qty=10, low_stock_threshold_qty=0, is_out=False)
+        item = MenuItem(name="Optimistic Burger", price_cents=1000)
+        session.add_all([patty, bun, item])
+        session.flush()
+        session.add_all(
+            [
+                Recipe(menu_item_id=item.id, ingredient_id=patty.id, qty_required=1),
+                Recipe(menu_item_id=item.id, ingredient_id=bun.id, qty_required=1),
+            ]
+        )
+        session.commit()
+        menu_item_id = item.id
+
+    def admit(now: datetime) -> reservation_admission.ReservationAdmission:
+        with SessionLocal() as session, session.begin():
+            return reservation_admission.admit_reservation(
+                session,
+                user_id=1,
+                items=[{"menu_item_id": menu_item_id, "qty": 1, "notes": None}],
+                now=now,
+                expires_at=now + timedelta(minutes=5),
+                mode="optimistic",
+            )
+
+    now = datetime.now(timezone.utc)
+    first = admit(now)
+    assert first.reservation_id is not None
+    assert get_counters().get("reservation_admission.optimistic_fallbacks") is None
+
+    # Patty's counter is full, but only because of an overdue hold.
+    later = now + timedelta(minutes=6)
+    third = admit(later)
+    assert third.reservation_id is not None
+    assert third.settled.reservation_ids == [first.reservation_id]
+    assert get_counters().get("reservation_admission.optimistic_fallbacks") == 1
+
+    # Genuinely short: the bun counter bumped before patty failed is put back.
+    rejected = admit(later)
+    assert rejected.reservation_id is None
+    assert [shortage.name for shortage in rejected.insufficient] == ["Optimistic Patty"]
+    assert get_counters().get("reservation_admission.optimistic_fallbacks") == 2
+    with SessionLocal() as session:
+        assert reconcile_reserved_qty(session) == {}
+        reserved_qty = dict(session.execute(select(Ingredient.name, Ingredient.reserved_qty)).all())
+    assert reserved_qty["Optimistic Patty"] == 1
+    assert reserved_qty["Optimistic Bun"] == 1
+
+
+def test_reconcile_reserved_qty_repairs_drift(app_client) -> None:
+    basic_id, _ = _build_inventory_for_success_case()
+    token = _login_online(app_client)
+    response = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": basic_id, "qty": 2}]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 201
+
+    with SessionLocal() as session:
+        bun = session.execute(select(Ingredient).where(Ingredient.name == "Test Bun")).scalar_one()
+        bun.reserved_qty = 99
+        session.commit()
+        bun_id = bun.id
+
+    with SessionLocal() as session:
+        with session.begin():
+            assert reconcile_reserved_qty(session, repair=True) == {bun_id: (99, 2)}
+        with session.begin():
+            assert reconcile_reserved_qty(session) == {}
+
+
+def test_batch_reservations_admit_per_cart_against_running_stock(app_client) -> None:
+    basic_id, deluxe_id = _build_inventory_for_success_case()
+    token = _login_online(app_client)
+
+    # 20 buns: 10 basic burgers use 10, 4 deluxe use 8, the last cart needs 4 more.
+    response = app_client.post(
+        "/reservations/batch",
+        json={
+            "carts": [
+                {"items": [{"menu_item_id": basic_id, "qty": 10}]},
+                {"items": [{"menu_item_id": deluxe_id, "qty": 4}]},
+                {"items": [{"menu_item_id": deluxe_id, "qty": 2}]},
+                {"items": [{"menu_item_id": 999999, "qty": 1}]},
+            ]
+        },
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["status_code"] for result in results] == [201, 201, 409, 400]
+    assert results[2]["errors"][0]["ingredient_name"] == "Test Bun"
+    assert results[2]["errors"][0]["available_qty"] == 2
+    assert results[3]["code"] == "MENU_ITEM_UNKNOWN"
+
+    with SessionLocal() as session:
+        reservation_count = session.execute(select(func.count(Reservation.id))).scalar_one()
+        bun = session.execute(select(Ingredient).where(Ingredient.name == "Test Bun")).scalar_one()
+    assert reservation_count == 2
+    assert bun.reserved_qty == 18
+
+
+def test_batch_reservations_all_or_nothing_writes_nothing_on_rejection(app_client) -> None:
+    basic_id, deluxe_id = _build_inventory_for_success_case()
+    token = _login_online(app_client)
+
+    response = app_client.post(
+        "/reservations/batch",
+        json={
+            "mode": "all_or_nothing",
+            "carts": [
+                {"items": [{"menu_item_id": basic_id, "qty": 1}]},
+                {"items": [{"menu_item_id": deluxe_id, "qty": 50}]},
+            ],
+        },
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 409
+    body = response.get_json()
+    assert body["code"] == "RESERVATION_BATCH_REJECTED"
+    assert [result["code"] for result in body["results"]] == [
+        "RESERVATION_BATCH_ABORTED",
+        "INSUFFICIENT_INGREDIENTS",
+    ]
+
+    with SessionLocal() as session:
+        assert session.execute(select(func.count(Reservation.id))).scalar_one() == 0
+        assert sum(session.execute(select(Ingredient.reserved_qty)).scalars()) == 0
+
+    response = app_client.post(
+        "/reservations/batch",
+        json={"mode": "all_or_nothing", "carts": [{"items": [{"menu_item_id": basic_id, "qty": 1}]}] * 2},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 201
+    assert [result["status_code"] for result in response.get_json()["results"]] == [201, 201]
+
+
+def test_bulk_commit_and_release_match_single_reservation_outcomes(app_client) -> None:
+    basic_id, deluxe_id = _build_inventory_for_success_case()
+    token = _login_online(app_client)
+    headers = {"Authorization": f"Bearer {token}"}
+    reservation_ids = [
+        app_client.post(
+            "/reservations",
+            json={"items": [{"menu_item_id": menu_item_id, "qty": 1}]},
+            headers=headers,
+        ).get_json()["id"]
+        for menu_item_id in (basic_id, deluxe_id, basic_id, deluxe_id)
+    ]
+    first_id, second_id, third_id, fourth_id = reservation_ids
+
+    release_response = app_client.post(
+        "/reservations/release",
+        json={"ids": [third_id, fourth_id, 999999]},
+        headers=headers,
+    )
+    assert release_response.status_code == 200
+    assert [
+        (result["id"], result["status_code"], result.get("status") or result["code"])
+        for result in release_response.get_json()["results"]
+    ] == [(third_id, 200, "released"), (fourth_id, 200, "released"), (999999, 404, "RESERVATION_NOT_FOUND")]
+
+    commit_response = app_client.post(
+        "/reservations/commit",
+        json={"ids": [first_id, second_id, third_id, first_id]},
+        headers=headers,
+    )
+    assert commit_response.status_code == 200
+    results = commit_response.get_json()["results"]
+    assert [(result["id"], result["status_code"]) for result in results] == [
+        (first_id, 200),
+        (second_id, 200),
+        (third_id, 409),
+    ]
+    assert results[2]["code"] == "RESERVATION_STATE_CONFLICT"
+
+    with SessionLocal() as session:
+        stock_by_name = {
+            ingredient.name: (ingredient.on_hand_qty, ingredient.reserved_qty)
+            for ingredient in session.execute(select(Ingredient)).scalars()
+        }
+    # Basic uses a bun and a patty; deluxe uses two buns and a cheese.
+    assert stock_by_name == {"Test Bun": (17, 0), "Test Patty": (19, 0), "Test Cheese": (19, 0)}
+
+    assert app_client.post(
+        f"/reservations/{first_id}/commit", headers=headers
+    ).get_json() == {"id": first_id, "status": "committed"}
+    assert app_client.post("/reservations/commit", json={"ids": []}, headers=headers).status_code == 400
+
+
+def test_idempotency_key_replays_reservation_writes(app_client) -> None:
+    basic_id, _ = _build_inventory_for_success_case()
+    token = _login_online(app_client)
+    headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "cart-1"}
+    payload = {"items": [{"menu_item_id": basic_id, "qty": 1}]}
+
+    first = app_client.post("/reservations", json=payload, headers=headers)
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+
+    replay = app_client.post("/reservations", json=payload, headers=headers)
+    assert replay.status_code == 201
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.get_json() == first.get_json()
+
+    # The stored row serves replays once the in-process cache is gone.
+    idempotency_cache.clear()
+    assert app_client.post("/reservations", json=payload, headers=headers).get_json() == first.get_json()
+
+    reused = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": basic_id, "qty": 2}]},
+        headers=headers,
+    )
+    assert reused.status_code == 422
+    assert reused.get_json()["code"] == "IDEMPOTENCY_KEY_REUSED"
+
+    reservation_id = first.get_json()["id"]
+    commit_headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "commit-1"}
+    committed = app_client.post(f"/reservations/{reservation_id}/commit", headers=commit_headers)
+    assert committed.status_code == 200
+    replayed_commit = app_client.post(f"/reservations/{reservation_id}/commit", headers=commit_headers)
+    assert replayed_commit.status_code == 200
+    assert replayed_commit.get_json() == committed.get_json()
+
+    with SessionLocal() as session:
+        assert session.scalar(select(func.count()).select_from(Reservation)) == 1
+        assert session.get(Ingredient, 1).on_hand_qty == 19
+        assert session.scalar(select(func.count()).select_from(IdempotencyKey)) == 2
+
+    expire_reservations_once_and_emit(now=datetime.now(timezone.utc) + timedelta(days=8))
+    with SessionLocal() as session:
+        assert session.scalar(select(func.count()).select_from(IdempotencyKey)) == 0
+
+
+def test_admission_limiter_queues_then_rejects_with_retry_after(app_client, monkeypatch) -> None:
+    basic_id, _ = _build_inventory_for_success_case()
+    token = _login_online(app_client)
+    limiter = admission_control.AdmissionLimiter(max_in_flight=1, max_queued=1, queue_timeout_seconds=0.05)
+    monkeypatch.setattr(admission_control, "reservation_limiter", limiter)
+
+    # Hold the only slot, as a slow in-flight request would.
+    assert limiter.acquire() == 0.0
+    response = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": basic_id, "qty": 1}]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 429
+    assert response.get_json()["code"] == "RESERVATION_BUSY"
+    assert response.headers["Retry-After"] == "1"
+
+    # A queued waiter is handed the slot as soon as it is released.
+    waited: list[float | None] = []
+    waiter = eventlet.spawn(lambda: waited.append(limiter.acquire()))
+    eventlet.sleep(0)
+    limiter.release()
+    waiter.wait()
+    assert waited[0] is not None
+    limiter.release()
+
+    response = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": basic_id, "qty": 1}]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 201
+    counters = get_counters()
+    assert counters["reservation_admission_control.rejected"] == 1
+    assert counters["reservation_admission_control.admitted"] >= 1
+
+
+class _FakeDriverError(Exception):
+    def __init__(self, pgcode: str) -> None:
+        super().__init__(pgcode)
+        self.pgcode = pgcode
+
+
+def test_reservation_commit_retries_deadlock_then_succeeds(app_client, monkeypatch) -> None:
+    basic_id, _ = _build_inventory_for_success_case()
+    token = _login_online(app_client)
+    headers = {"Authorization": f"Bearer {token}"}
+    reservation_id = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": basic_id, "qty": 1}]},
+        headers=headers,
+    ).get_json()["id"]
+
+    real_commit_reserved_qty = reservations_api.commit_reserved_qty
+    failures = [_FakeDriverError("40P01")]
+
+    def deadlock_once(session, reservation_ids):
+        if failures:
+            raise OperationalError("UPDATE ingredients", {}, failures.pop())
+        return real_commit_reserved_qty(session, reservation_ids)
+
+    monkeypatch.setattr(reservations_api, "commit_reserved_qty", deadlock_once)
+    response = app_client.post(f"/reservations/{reservation_id}/commit", headers=headers)
+
+    assert response.status_code == 200
+    assert get_counters()["db_retry.commit_reservation.retries"] == 1
+    with SessionLocal() as session:
+        assert session.get(Reservation, reservation_id).status == "committed"
+
+    # Errors outside the retryable SQLSTATEs surface unchanged.
+    failures.append(_FakeDriverError("23505"))
+    second_id = app_client.post(
+        "/reservations",
+        json={"items": [{"menu_item_id": basic_id, "qty": 1}]},
+        headers=headers,
+    ).get_json()["id"]
+    assert app_client.post(f"/reservations/{second_id}/commit", headers=headers).status_code == 500
+    assert "db_retry.commit_reservation.exhausted" not in get_counters()
+
+
+def test_expire_once_sweeps_in_chunks_within_budget(app_client) -> None:
+    basic_id, _ = _build_inventory_for_success_case()
+    token = _login_online(app_client)
+    reservation_ids = [
+        app_client.post(
+            "/reservations",
+            json={"items": [{"menu_item_id": basic_id, "qty": 1}]},
+            headers={"Authorization": f"Bearer {token}"},
+        ).get_json()["id"]
+        for _ in range(3)
+    ]
+    with SessionLocal() as session, session.begin():
+        session.execute(
+            update(Reservation).values(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+        )
+    internal_headers = {"X-Internal-Secret": settings.internal_expire_secret}
+
+    invalid = app_client.post("/internal/expire_once", json={"batch_size": 0}, headers=internal_headers)
+    assert invalid.status_code == 400
+    assert invalid.get_json()["code"] == "EXPIRATION_BATCH_SIZE_INVALID"
+
+    # A zero budget stops after the first chunk.
+    partial = app_client.post(
+        "/internal/expire_once", json={"batch_size": 1, "budget_ms": 0}, headers=internal_headers
+    )
+    assert partial.get_json() == {"status": "ok", "expired_count": 1, "chunks": 1, "complete": False}
+
+    rest = app_client.post("/internal/expire_once", json={"batch_size": 2}, headers=internal_headers)
+    assert rest.get_json() == {"status": "ok", "expired_count": 2, "chunks": 2, "complete": True}
+
+    with SessionLocal() as session:
+        statuses = session.execute(
+            select(Reservation.status).where(Reservation.id.in_(reservation_ids))
+        ).scalars().all()
+        assert statuses == ["expired"] * 3
+        assert reconcile_reserved_qty(session) == {}
+
+
+def test_expiration_schedule_expires_exactly_the_due_reservations(app_client) -> None:
+    basic_id, _ = _build_inventory_for_success_case()
+    token = _login_online(app_client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def reserve() -> int:
+        return app_client.post(
+            "/reservations",
+            json={"items": [{"menu_item_id": basic_id, "qty": 1}]},
+            headers=headers,
+        ).get_json()["id"]
+
+    # Writers only feed the schedule once the job has loaded it.
+    loaded_id = reserve()
+    assert len(expiration_schedule) == 0
+    with SessionLocal() as session:
+        assert expiration_schedule.load(session) == 1
+
+    due_id = reserve()
+    committed_id = reserve()
+    later_id = reserve()
+    assert app_client.post(f"/reservations/{committed_id}/commit", headers=headers).status_code == 200
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as session, session.begin():
+        session.execute(
+            update(Reservation)
+            .where(Reservation.id == later_id)
+            .values(expires_at=now + timedelta(hours=1))
+        )
+    expiration_schedule.schedule(later_id, now + timedelta(hours=1))
+    assert len(expiration_schedule) == 3
+
+    assert expire_due_reservations(now=now + timedelta(minutes=11)) == [loaded_id, due_id]
+    assert expiration_schedule.next_expires_at() == now + timedelta(hours=1)
+    assert expire_due_reservations(now=now + timedelta(minutes=12)) == []
+
+    with SessionLocal() as session:
+        statuses = dict(session.execute(select(Reservation.id, Reservation.status)).all())
+    assert statuses == {
+        loaded_id: "expired",
+        due_id: "expired",
+        committed_id: "committed",
+        later_id: "active",
+    }
+
+
+def test_expiration_tick_sweeps_reservations_missing_from_schedule(app_client, monkeypatch) -> None:
+    basic_id, _ = _build_inventory_for_success_case()
+    token = _login_online(app_client)
+    headers = {"Authorization": f"Bearer {token}"}
+    with SessionLocal() as session:
+        expiration_schedule.load(session)
+
+    def reserve_elsewhere_overdue() -> int:
+        # Stands in for a reservation another instance wrote: never scheduled here.
+        reservation_id = app_client.post(
+            "/reservations",
+            json={"items": [{"menu_item_id": basic_id, "qty": 1}]},
+            headers=headers,
+        ).get_json()["id"]
+        expiration_schedule.discard([reservation_id])
+        with SessionLocal() as session, session.begin():
+            session.execute(
+                update(Reservation)
+                .where(Reservation.id == reservation_id)
+                .values(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+            )
+        return reservation_id
+
+    foreign_id = reserve_elsewhere_overdue()
+    state = reservation_expiration._TickState(next_reconcile_at=monotonic() + 60)
+    reservation_expiration._run_expiration_tick(state)
+    assert state.earliest_expires_at is None
+    with SessionLocal() as session:
+        assert session.get(Reservation, foreign_id).status == "expired"
+
+    # A sweep that expires nothing (the row is locked elsewhere) backs off
+    # instead of rerunning on every tick.
+    reserve_elsewhere_overdue()
+    sweeps: list[int] = []
+
+    def sweep_nothing() -> ExpirationSweep:
+        sweeps.append(1)
+        return ExpirationSweep(reservation_ids=[], ingredient_ids=[], chunks=1, complete=True)
+
+    monkeypatch.setattr(reservation_expiration, "_sweep_and_emit", sweep_nothing)
+    reservation_expiration._run_expiration_tick(state)
+    reservation_expiration._run_expiration_tick(state)
+    assert len(sweeps) == 1
+    assert state.overdue_retry_at > monotonic()
+    assert reservation_expiration._seconds_until_next_tick(state) > reservation_expiration.MIN_TICK_SECONDS
+
+
+def test_expiration_leader_lock_is_held_by_one_instance(monkeypatch) -> None:
+    if engine.dialect.name != "postgresql":
+        pytest.skip("Advisory locks require PostgreSQL")
+
+    key = reservation_expiration.EXPIRATION_LEADER_LOCK_KEY
+    leader = AdvisoryLeaderLock(engine, key)
+    follower = AdvisoryLeaderLock(engine, key)
+    try:
+        assert leader.try_acquire() is True
+        assert follower.try_acquire() is False
+        assert leader.still_held() is True
+
+        # The leader dying drops its connection; the follower takes over.
+        leader._connection.invalidate()
+        assert leader.still_held() is False
+        assert follower.try_acquire() is True
+
+        # Any failed check gives the lock up instead of pooling its connection.
+        def fail_check(*args, **kwargs):
+            raise RuntimeError("check failed")
+
+        monkeypatch.setattr(follower._connection, "execute", fail_check)
+        assert follower.still_held() is False
+        assert leader.try_acquire() is True
+    finally:
+        leader.release()
+        follower.release()
+
+
+def test_stopping_the_expiration_loop_releases_leadership(monkeypatch) -> None:
+    leader_lock = AdvisoryLeaderLock(engine, reservation_expiration.EXPIRATION_LEADER_LOCK_KEY)
+    monkeypatch.setattr(reservation_expiration, "_expiration_leader_lock", leader_lock)
+    monkeypatch.setattr(reservation_expiration, "_lead_expiration", lambda lock: eventlet.sleep(60))
+
+    loop = eventlet.spawn(reservation_expiration._reservation_expiration_loop)
+    eventlet.sleep(0)
+    assert leader_lock.held is True
+
+    loop.kill()
+    assert leader_lock.held is False
+    follower = AdvisoryLeaderLock(engine, reservation_expiration.EXPIRATION_LEADER_LOCK_KEY)
+    try:
+        assert follower.try_acquire() is True
+    finally:
+        follower.release()
+
+
+def test_archive_moves_settled_reservations_to_history(app_client) -> None:
+    basic_id, deluxe_id = _build_inventory_for_success_case()
+    token = _login_online(app_client)
+    headers = {"Authorization": f"Bearer {token}"}
+    internal_headers = {"X-Internal-Secret": settings.internal_expire_secret}
+    committed_id, released_id, active_id = [
+        app_client.post(
+            "/reservations",
+            json={"items": [{"menu_item_id": basic_id, "qty": 1}, {"menu_item_id": deluxe_id, "qty": 1}]},
+            headers=headers,
+        ).get_json()["id"]
+        for _ in range(3)
+    ]
+    app_client.post(f"/reservations/{committed_id}/commit", headers=headers)
+    app_client.post(f"/reservations/{released_id}/release", headers=headers)
+
+    # Nothing is old enough yet.
+    fresh = app_client.post("/internal/archive_reservations", json={}, headers=internal_headers)
+    assert fresh.get_json()["archived_count"] == 0
+
+    with SessionLocal() as session, session.begin():
+        session.execute(
+            update(Reservation).values(updated_at=datetime.now(timezone.utc) - timedelta(days=8))
+        )
+
+    partial = app_client.post(
+        "/internal/archive_reservations", json={"batch_size": 1, "budget_ms": 0}, headers=internal_headers
+    )
+    assert partial.get_json() == {"status": "ok", "archived_count": 1, "batches": 1, "complete": False}
+    rest = app_client.post("/internal/archive_reservations", json={}, headers=internal_headers)
+    assert rest.get_json()["archived_count"] == 1
+
+    with SessionLocal() as session:
+        assert session.execute(select(Reservation.id)).scalars().all() == [active_id]
+        assert session.scalar(select(func.count()).select_from(ReservationItem)) == 2
+        assert session.get(ReservationHistory, committed_id).status == "committed"
+        assert session.scalar(select(func.count()).select_from(ReservationIngredientHistory)) == 6
+        assert reconcile_reserved_qty(session) == {}
+
+    assert app_client.get(f"/reservations/{committed_id}", headers=headers).status_code == 404
+    archived = app_client.get(f"/reservations/history/{committed_id}", headers=headers)
+    assert archived.status_code == 200
+    assert [item["menu_item_id"] for item in archived.get_json()["items"]] == [basic_id, deluxe_id]
+
+    foh_token = app_client.post(
+        "/auth/login", json={"username": "foh@example.com", "password": "pass"}
+    ).get_json()["access_token"]
+    other_caller = app_client.get(
+        f"/reservations/history/{committed_id}", headers={"Authorization": f"Bearer {foh_token}"}
+    )
+    assert other_caller.status_code == 404
+
+    first_page = app_client.get("/reservations/history?limit=1", headers=headers).get_json()
+    assert [row["id"] for row in first_page["reservations"]] == [released_id]
+    second_page = app_client.get(
+        f"/reservations/history?limit=1&before_id={first_page['next_before_id']}", headers=headers
+    ).get_json()
+    assert [row["id"] for row in second_page["reservations"]] == [committed_id]
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from pathlib import Path
+import queue
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from uuid import uuid4
+
+import eventlet
+import pytest
+from sqlalchemy import text
+
+from app.socketio_postgres import (
+    MAX_NOTIFY_PAYLOAD_BYTES,
+    NotifyPayloadAssembler,
+    PostgresManager,
+    encode_notify_payloads,
+)
+from config import settings
+from db import engine
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+PUBLISHER_SCRIPT = textwrap.dedent(
+    """
+    import sys
+
+    from app.socketio_postgres import PostgresManager
+    from config import settings
+
+    manager = PostgresManager(
+        settings.database_url,
+        channel=sys.argv[1],
+        write_only=True,
+        batch_window_seconds=60,
+    )
+    manager.emit("stateChanged", {"version": "a-1", "ingredient_ids": [1]}, to="view:menu")
+    manager.emit("stateChanged", {"version": "a-2", "ingredient_ids": None}, to="view:kitchen")
+    manager.emit("availabilityPatch", {"menu": ["x" * 20000]}, to="availability")
+    assert manager.flush() == 3
+    """
+)
+
+
+def test_notify_payloads_round_trip_across_chunks() -> None:
+    messages = [
+        {"method": "emit", "event": "stateChanged", "data": [{"version": "a-1"}]},
+        {"method": "emit", "event": "availabilityPatch", "data": [{"menu": ["y" * 25000]}]},
+    ]
+    payloads = encode_notify_payloads("batch", messages)
+
+    assert len(payloads) == 4
+    assert all(len(payload.encode("utf-8")) < 8000 for payload in payloads)
+    assert MAX_NOTIFY_PAYLOAD_BYTES < 8000
+
+    assembler = NotifyPayloadAssembler()
+    received = []
+    for payload in payloads:
+        received.extend(assembler.feed(payload))
+    assert received == messages
+
+
+def test_notify_assembler_drops_batch_missing_its_start() -> None:
+    first = encode_notify_payloads("first", [{"method": "emit", "data": ["z" * 9000]}])
+    second = encode_notify_payloads("second", [{"method": "emit", "data": ["ok"]}])
+    assembler = NotifyPayloadAssembler()
+
+    assert assembler.feed(first[1]) == []
+    assert assembler.feed(second[0]) == [{"method": "emit", "data": ["ok"]}]
+
+
+def _is_listening(channel: str) -> bool:
+    # pg_stat_activity is a per-transaction snapshot; poll on a fresh connection.
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT 1 FROM pg_stat_activity WHERE query = :query"),
+            {"query": f'LISTEN "{channel}"'},
+        ).first() is not None
+
+
+def test_idle_listener_keeps_other_greenlets_scheduled() -> None:
+    if engine.dialect.name != "postgresql":
+        pytest.skip("LISTEN/NOTIFY relay needs the Postgres test database")
+
+    channel = f"kitchensync_test_{uuid4().hex[:8]}"
+    listener = PostgresManager(settings.database_url, channel=channel)
+    ticks: list[float] = []
+
+    def _consume() -> None:
+        for _ in listener._listen():
+            pass
+
+    def _tick() -> None:
+        while True:
+            ticks.append(time.monotonic())
+            eventlet.sleep(0.05)
+
+    consumer = eventlet.spawn(_consume)
+    ticker = eventlet.spawn(_tick)
+    try:
+        deadline = time.monotonic() + 10
+        while not _is_listening(channel):
+            assert time.monotonic() < deadline, "listener did not start"
+            eventlet.sleep(0.05)
+        ticks.clear()
+        # The listener now waits on an idle socket for LISTEN_POLL_SECONDS.
+        eventlet.sleep(1.0)
+    finally:
+        ticker.kill()
+        consumer.kill()
+
+    assert len(ticks) >= 10
+    assert max(later - earlier for earlier, later in zip(ticks, ticks[1:])) < 0.5
+
+
+def test_emits_from_another_process_arrive_in_one_batch(app_client) -> None:
+    if engine.dialect.name != "postgresql":
+        pytest.skip("LISTEN/NOTIFY relay needs the Postgres test database")
+
+    channel = f"kitchensync_test_{uuid4().hex[:8]}"
+    listener = PostgresManager(settings.database_url, channel=channel)
+    received: queue.Queue[dict] = queue.Queue()
+
+    def _consume() -> None:
+        for message in listener._listen():
+            received.put(message)
+
+    threading.Thread(target=_consume, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not _is_listening(channel):
+        assert time.monotonic() < deadline, "listener did not start"
+        time.sleep(0.05)
+
+    subprocess.run(
+        [sys.executable, "-c", PUBLISHER_SCRIPT, channel],
+        cwd=BACKEND_DIR,
+        check=True,
+        timeout=30,
+    )
+
+    messages = [received.get(timeout=10) for _ in range(3)]
+    assert [message["event"] for message in messages] == [
+        "stateChanged",
+        "stateChanged",
+        "availabilityPatch",
+    ]
+    assert [message["room"] for message in messages] == ["view:menu", "view:kitchen", "availability"]
+    assert messages[0]["data"] == [{"version": "a-1", "ingredient_ids": [1]}]
+    assert len(messages[2]["data"][0]["menu"][0]) == 20000
+    assert messages[0]["host_id"] != listener.host_id
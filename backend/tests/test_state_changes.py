@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from app import socketio
+from app.coalescing_emitter import CoalescingEmitter
+from app.metrics import get_counters
+from app.models import Ingredient
+from app.runtime_reservation_warning import set_runtime_warning_threshold_seconds
+from config import settings
+from db import SessionLocal
+
+
+def test_coalescing_emitter_merges_changes_within_window(app_client) -> None:
+    flushed: list[list[int] | None] = []
+    # Long window: nothing flushes until the explicit flush below.
+    emitter = CoalescingEmitter("test_emitter", flushed.append, window_seconds=60)
+
+    emitter.submit([3, 1])
+    emitter.submit([])
+    emitter.submit([2, 3])
+    assert flushed == []
+
+    assert emitter.flush() is True
+    assert flushed == [[1, 2, 3]]
+    assert emitter.flush() is False
+
+    emitter.submit([4])
+    emitter.submit(None)
+    emitter.submit([5])
+    emitter.flush()
+    assert flushed == [[1, 2, 3], None]
+
+    counters = get_counters()
+    assert counters["test_emitter.raw"] == 6
+    assert counters["test_emitter.emitted"] == 2
+
+
+def test_internal_metrics_reports_raw_and_emitted_state_changes(app_client) -> None:
+    unauthorized = app_client.get("/internal/metrics")
+    assert unauthorized.status_code == 401
+
+    with SessionLocal() as session:
+        ingredient = Ingredient(name="Metrics Lettuce", on_hand_qty=5, low_stock_threshold_qty=1, is_out=False)
+        session.add(ingredient)
+        session.commit()
+        ingredient_id = ingredient.id
+
+    login = app_client.post("/auth/login", json={"username": "kitchen@example.com", "password": "pass"})
+    token = login.get_json()["access_token"]
+    for on_hand_qty in (4, 3):
+        response = app_client.patch(
+            f"/ingredients/{ingredient_id}",
+            json={"on_hand_qty": on_hand_qty},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 200
+
+    metrics = app_client.get(
+        "/internal/metrics",
+        headers={"X-Internal-Secret": settings.internal_expire_secret},
+    )
+    assert metrics.status_code == 200
+    counters = metrics.get_json()["counters"]
+    assert counters["state_changed.raw"] == 2
+    assert counters["state_changed.emitted"] == 2
+
+
+def _login(client, username: str) -> str:
+    response = client.post("/auth/login", json={"username": username, "password": "pass"})
+    assert response.status_code == 200
+    return response.get_json()["access_token"]
+
+
+def _socket(app_client, token: str | None, view: str | None = None):
+    return socketio.test_client(
+        app_client.application,
+        flask_test_client=app_client,
+        auth={"token": token, "view": view},
+    )
+
+
+def _state_changed_count(socket_client) -> int:
+    return sum(1 for event in socket_client.get_received() if event["name"] == "stateChanged")
+
+
+def test_socket_connect_requires_valid_token(app_client) -> None:
+    assert _socket(app_client, None, "menu").is_connected() is False
+    assert _socket(app_client, "not-a-token", "menu").is_connected() is False
+    assert _socket(app_client, _login(app_client, "online@example.com"), "menu").is_connected() is True
+
+
+def test_state_changes_reach_only_interested_rooms(app_client) -> None:
+    with SessionLocal() as session:
+        ingredient = Ingredient(name="Unused Pickle", on_hand_qty=5, low_stock_threshold_qty=1, is_out=False)
+        session.add(ingredient)
+        session.commit()
+        ingredient_id = ingredient.id
+
+    kitchen_token = _login(app_client, "kitchen@example.com")
+    foh_token = _login(app_client, "foh@example.com")
+    online_token = _login(app_client, "online@example.com")
+    kitchen_view = _socket(app_client, kitchen_token, "kitchen")
+    menu_view = _socket(app_client, online_token, "menu")
+    online_timer = _socket(app_client, online_token)
+    kitchen_timer = _socket(app_client, kitchen_token)
+    sockets = [kitchen_view, menu_view, online_timer, kitchen_timer]
+    for socket_client in sockets:
+        socket_client.get_received()
+
+    # Stock on an ingredient that no menu item uses: kitchen view only.
+    response = app_client.patch(
+        f"/ingredients/{ingredient_id}",
+        json={"on_hand_qty": 1},
+        headers={"Authorization": f"Bearer {kitchen_token}"},
+    )
+    assert response.status_code == 200
+    assert [_state_changed_count(socket_client) for socket_client in sockets] == [1, 0, 0, 0]
+
+    # Reservation settings: ordering roles only.
+    response = app_client.patch(
+        "/admin/reservation-ttl",
+        json={"warning_threshold_seconds": 45},
+        headers={"Authorization": f"Bearer {foh_token}"},
+    )
+    assert response.status_code == 200
+    set_runtime_warning_threshold_seconds(settings.reservation_warning_threshold_seconds)
+    assert [_state_changed_count(socket_client) for socket_client in sockets] == [0, 1, 1, 0]
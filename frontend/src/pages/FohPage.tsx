@@ -53,7 +53,7 @@ export function FohPage({ role }: { role: UserRole | null }) {
     void load();
   }, [load]);
 
-  useStateChangedRefetch(load);
+  useStateChangedRefetch(load, { view: "foh" });
 
   const loadTtlInfo = useCallback(async () => {
     if (!isFoh) {
@@ -1,8 +1,9 @@
-import { useCallback, useEffect, useState } from "react";
+import { useCallback, useEffect, useRef, useState } from "react";
 
 import { apiFetch } from "../api/client";
 import { readApiError } from "../api/errors";
 import type { UserRole } from "../auth/token";
+import { fetchRowsSince, mergeRowsById } from "../realtime/deltaSync";
 import { useStateChangedRefetch } from "../realtime/useStateChangedRefetch";
 
 type Ingredient = {
@@ -22,16 +23,17 @@ export function KitchenPage({ role }: { role: UserRole | null }) {
   const [pageError, setPageError] = useState("");
   const [isEditing, setIsEditing] = useState(false);
   const [queuedRefresh, setQueuedRefresh] = useState(false);
+  const versionRef = useRef<string | null>(null);
 
   const load = useCallback(async () => {
     try {
-      const response = await apiFetch("/ingredients");
-      if (!response.ok) {
-        setPageError(await readApiError(response, "Unable to load ingredients."));
+      const result = await fetchRowsSince<Ingredient>("/ingredients", versionRef.current);
+      if (!result.ok) {
+        setPageError(await readApiError(result.response, "Unable to load ingredients."));
         return;
       }
-      const data = (await response.json()) as Ingredient[];
-      setItems(data);
+      versionRef.current = result.version;
+      setItems((prev) => (result.full ? result.rows : mergeRowsById(prev, result.rows)));
       setPageError("");
     } catch {
       setPageError("Unable to load ingredients.");
@@ -43,6 +45,7 @@ export function KitchenPage({ role }: { role: UserRole | null }) {
   }, [load]);
 
   useStateChangedRefetch(load, {
+    view: "kitchen",
     suppress: isEditing,
     onQueued: () => setQueuedRefresh(true),
   });
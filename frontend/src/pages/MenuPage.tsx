@@ -1,8 +1,9 @@
-import { useCallback, useEffect, useState } from "react";
+import { useCallback, useEffect, useRef, useState } from "react";
 
-import { apiFetch } from "../api/client";
 import { readApiError } from "../api/errors";
-import { useStateChangedRefetch } from "../realtime/useStateChangedRefetch";
+import { fetchRowsSince, mergeRowsById } from "../realtime/deltaSync";
+import type { AvailabilityPatch } from "../realtime/useAvailabilityPatch";
+import { useAvailabilityPatch } from "../realtime/useAvailabilityPatch";
 
 type MenuItem = {
   id: number;
@@ -16,16 +17,17 @@ type MenuItem = {
 export function MenuPage() {
   const [menu, setMenu] = useState<MenuItem[]>([]);
   const [error, setError] = useState("");
+  const versionRef = useRef<string | null>(null);
 
   const load = useCallback(async () => {
     try {
-      const response = await apiFetch("/menu");
-      if (!response.ok) {
-        setError(await readApiError(response, "Unable to load menu."));
+      const result = await fetchRowsSince<MenuItem>("/menu", versionRef.current);
+      if (!result.ok) {
+        setError(await readApiError(result.response, "Unable to load menu."));
         return;
       }
-      const data = (await response.json()) as MenuItem[];
-      setMenu(data);
+      versionRef.current = result.version;
+      setMenu((prev) => (result.full ? result.rows : mergeRowsById(prev, result.rows)));
       setError("");
     } catch {
       setError("Unable to load menu.");
@@ -36,7 +38,12 @@ export function MenuPage() {
     void load();
   }, [load]);
 
-  useStateChangedRefetch(load);
+  const applyPatch = useCallback((patch: AvailabilityPatch<unknown, MenuItem>) => {
+    versionRef.current = patch.version;
+    setMenu((prev) => mergeRowsById(prev, patch.menu));
+  }, []);
+
+  useAvailabilityPatch(applyPatch, load, "menu");
 
   return (
     <section>
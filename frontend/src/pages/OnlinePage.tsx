@@ -183,7 +183,7 @@ export function OnlinePage({ role }: { role: UserRole | null }) {
     void loadMenu();
   }, [loadMenu]);
 
-  useStateChangedRefetch(loadMenu);
+  useStateChangedRefetch(loadMenu, { view: "online" });
 
   useEffect(() => {
     const onStorage = (event: StorageEvent) => {
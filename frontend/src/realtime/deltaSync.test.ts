@@ -0,0 +1,25 @@
+import { describe, expect, it } from "vitest";
+
+import { mergeRowsById } from "./deltaSync";
+
+describe("delta sync merge", () => {
+  it("replaces changed rows and keeps order", () => {
+    const current = [
+      { id: 1, available: true },
+      { id: 2, available: true },
+      { id: 3, available: true },
+    ];
+    const merged = mergeRowsById(current, [{ id: 2, available: false }]);
+    expect(merged).toEqual([
+      { id: 1, available: true },
+      { id: 2, available: false },
+      { id: 3, available: true },
+    ]);
+    expect(merged[0]).toBe(current[0]);
+  });
+
+  it("returns the same array when nothing changed", () => {
+    const current = [{ id: 1, available: true }];
+    expect(mergeRowsById(current, [])).toBe(current);
+  });
+});
@@ -0,0 +1,30 @@
+import { apiFetch } from "../api/client";
+
+type DeltaBody<T> = { version: string; full: boolean; rows: T[] };
+
+export type RowsFetchResult<T> =
+  | { ok: true; version: string | null; full: boolean; rows: T[] }
+  | { ok: false; response: Response };
+
+// Fetches the full list when no version is known yet, otherwise only the rows
+// changed since that version (`GET <path>?since=<version>`).
+export async function fetchRowsSince<T>(path: string, version: string | null): Promise<RowsFetchResult<T>> {
+  const response = await apiFetch(version ? `${path}?since=${encodeURIComponent(version)}` : path);
+  if (!response.ok) {
+    return { ok: false, response };
+  }
+  if (!version) {
+    const rows = (await response.json()) as T[];
+    return { ok: true, version: response.headers.get("X-State-Version"), full: true, rows };
+  }
+  const body = (await response.json()) as DeltaBody<T>;
+  return { ok: true, version: body.version, full: body.full, rows: body.rows };
+}
+
+export function mergeRowsById<T extends { id: number }>(current: T[], changed: T[]): T[] {
+  if (!changed.length) {
+    return current;
+  }
+  const changedById = new Map(changed.map((row) => [row.id, row]));
+  return current.map((row) => changedById.get(row.id) ?? row);
+}
@@ -0,0 +1,17 @@
+import { io } from "socket.io-client";
+import type { Socket } from "socket.io-client";
+
+import { getToken } from "../auth/token";
+import { env } from "../config/env";
+
+// Page views the server scopes `stateChanged` broadcasts by.
+export type SocketView = "kitchen" | "foh" | "online" | "menu";
+
+// Sockets authenticate with the same JWT as the REST API and join rooms for
+// their role and, when given, their view. The token is read on every
+// (re)connect so it follows login and logout.
+export function connectSocket(view?: SocketView): Socket {
+  return io(env.socketUrl, {
+    auth: (callback) => callback({ token: getToken(), view }),
+  });
+}
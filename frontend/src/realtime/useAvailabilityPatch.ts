@@ -0,0 +1,71 @@
+import { useEffect, useRef } from "react";
+
+import { env } from "../config/env";
+import { logger } from "../logging/logger";
+import type { SocketView } from "./socket";
+import { connectSocket } from "./socket";
+
+// Payload of the `availabilityPatch` socket event. Rows are complete
+// `/ingredients` and `/menu` rows; `full` means the change could not be
+// narrowed and the client should refetch.
+export type AvailabilityPatch<TIngredient, TMenuItem> = {
+  version: string;
+  full: boolean;
+  ingredients: TIngredient[];
+  menu: TMenuItem[];
+};
+
+// Subscribes to server-computed availability patches instead of refetching on
+// every `stateChanged`.
+export function useAvailabilityPatch<TIngredient = unknown, TMenuItem = unknown>(
+  onPatch: (patch: AvailabilityPatch<TIngredient, TMenuItem>) => void,
+  onResync: () => void,
+  view: SocketView
+): void {
+  const onPatchRef = useRef(onPatch);
+  const onResyncRef = useRef(onResync);
+  onPatchRef.current = onPatch;
+  onResyncRef.current = onResync;
+
+  useEffect(() => {
+    const socket = connectSocket(view);
+    let connectedBefore = false;
+
+    const onConnect = () => {
+      logger.info("socket connected", { url: env.socketUrl, socketId: socket.id });
+      socket.emit("subscribeAvailability");
+      // Patches sent while disconnected are lost; catch up once on reconnect.
+      if (connectedBefore) {
+        onResyncRef.current();
+      }
+      connectedBefore = true;
+    };
+    const onConnectError = (error: unknown) => logger.warn("socket connect_error", { error });
+
+    const onAvailabilityPatch = (patch: AvailabilityPatch<TIngredient, TMenuItem>) => {
+      logger.debug("socket availabilityPatch received", {
+        version: patch.version,
+        full: patch.full,
+        ingredients: patch.ingredients.length,
+        menu: patch.menu.length,
+      });
+      if (patch.full) {
+        onResyncRef.current();
+        return;
+      }
+      onPatchRef.current(patch);
+    };
+
+    socket.on("connect", onConnect);
+    socket.on("connect_error", onConnectError);
+    socket.on("availabilityPatch", onAvailabilityPatch);
+
+    return () => {
+      socket.off("connect", onConnect);
+      socket.off("connect_error", onConnectError);
+      socket.off("availabilityPatch", onAvailabilityPatch);
+      socket.disconnect();
+      logger.info("socket disconnected");
+    };
+  }, [view]);
+}
@@ -1,23 +1,34 @@
 import { useEffect, useRef } from "react";
-import { io } from "socket.io-client";
 
 import { env } from "../config/env";
 import { logger } from "../logging/logger";
+import type { SocketView } from "./socket";
+import { connectSocket } from "./socket";
+
+// Payload of the `stateChanged` socket event. `ingredient_ids` is null when
+// the server cannot say which ingredients changed.
+export type StateChangedPayload = {
+  version: string;
+  ingredient_ids: number[] | null;
+};
 
 export function useStateChangedRefetch(
   refetch: () => void,
-  options: { delayMs?: number; suppress?: boolean; onQueued?: () => void } = {}
+  options: { view?: SocketView; delayMs?: number; suppress?: boolean; onQueued?: () => void } = {}
 ): void {
   const delayMs = options.delayMs ?? 400;
   const timerRef = useRef<number | null>(null);
 
   useEffect(() => {
-    const socket = io(env.socketUrl);
+    const socket = connectSocket(options.view);
     const onConnect = () => logger.info("socket connected", { url: env.socketUrl, socketId: socket.id });
     const onConnectError = (error: unknown) => logger.warn("socket connect_error", { error });
 
-    const onStateChanged = () => {
-      logger.debug("socket stateChanged received", { suppress: Boolean(options.suppress) });
+    const onStateChanged = (payload?: StateChangedPayload) => {
+      logger.debug("socket stateChanged received", {
+        suppress: Boolean(options.suppress),
+        version: payload?.version,
+      });
       if (options.suppress) {
         options.onQueued?.();
         logger.debug("socket refetch queued while suppressed");
@@ -46,5 +57,5 @@ export function useStateChangedRefetch(
       socket.disconnect();
       logger.info("socket disconnected");
     };
-  }, [delayMs, options.onQueued, options.suppress, refetch]);
+  }, [delayMs, options.onQueued, options.suppress, options.view, refetch]);
 }